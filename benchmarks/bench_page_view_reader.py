@@ -0,0 +1,69 @@
+"""
+Compare the block-splitting PageViewReader with a csv.reader loop, which
+keeps every field as a string until the timestamp is converted.
+
+    python bench_page_view_reader.py --rows 10000000
+"""
+
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src/"))
+
+from page_view_reader import PageViewReader
+from synthetic_page_views import generate_page_views
+
+
+def read_with_csv_module(csv_file: str) -> int:
+    """Read rows the way validate_data did, converting timestamps after."""
+
+    accepted = 0
+    with open(csv_file, mode="r", encoding="utf-8") as data:
+        for row in csv.reader(data):
+            if row[0] != "" and row[1] != "" and row[3] != "":
+                int(row[0])
+                accepted += 1
+    return accepted
+
+
+def read_with_page_view_reader(csv_file: str) -> int:
+    page_views = PageViewReader(csv_file)
+    for _ in page_views:
+        pass
+    return page_views.accepted
+
+
+def time_reader(reader, csv_file: str, repeat: int):
+    """Return the best time of a reader over several runs, and its row count."""
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = reader(csv_file)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark page view readers.")
+    parser.add_argument("--rows", type=int, default=10000000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="page-views-bench-") as folder:
+        csv_file = os.path.join(folder, "page-views.csv")
+        generate_page_views(csv_file, args.rows)
+        print("{:,} rows, {:.1f} MB".format(args.rows, os.path.getsize(csv_file) / 2**20))
+
+        baseline = None
+        for name, reader in [("csv.reader", read_with_csv_module),
+                             ("PageViewReader", read_with_page_view_reader)]:
+            elapsed, rows = time_reader(reader, csv_file, args.repeat)
+            baseline = baseline or elapsed
+            print("{:<16}{:>8.2f} s {:>12,.0f} rows/s {:>6.2f}x".format(
+                name, elapsed, rows / elapsed, baseline / elapsed))
@@ -0,0 +1,278 @@
+"""
+Time each stage of the aggregation and insights pipelines on synthetic page
+views, and record the results as JSON so commits can be compared.
+
+Stages run in pipeline order, each on the output of the one before:
+
+    validate_data, find_unique_attributes, create_dictionary,
+    aggregated_dictionary and write_data_to_csv (the dict engine),
+    StreamAggregator (the stream engine, reading the file again),
+    write_data_to_binary, pull_csv_insights and pull_binary_insights.
+
+With --stages, the stages before the last one chosen still run, untimed,
+to produce its input, except that the dict engine is skipped unless one of
+its stages is chosen. It keeps every row in lists, so at 50M rows it needs
+tens of GB of memory; run only the later stages there. It also assumes
+each session's rows are written together and in time order, and that
+every search has at least one click (create_dictionary fails on a search
+without clicks), so its stages are skipped when --interleave is above 1,
+--disorder is above 0 or the smallest --clicks is 0. That is why --clicks
+defaults to 1 3, unlike the generator's 0 3.
+
+    python bench_pipeline.py --sizes 10000 1000000
+    python bench_pipeline.py --sizes 50000000 --stages StreamAggregator
+    python bench_pipeline.py --compare results/bench-pipeline-0c432c7.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../src/"))
+
+import page_views_insights
+from aggregate_page_views import (aggregated_dictionary, create_dictionary,
+                                  find_unique_attributes, validate_data,
+                                  write_data_to_binary, write_data_to_csv)
+from page_view_reader import PageViewReader
+from stream_aggregator import StreamAggregator
+from synthetic_page_views import generate_page_views
+
+RESULTS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+SIZES = [10000, 1000000]
+DICT_STAGES = ["validate_data", "find_unique_attributes", "create_dictionary",
+               "aggregated_dictionary", "write_data_to_csv"]
+STAGES = DICT_STAGES + ["StreamAggregator", "write_data_to_binary",
+                        "pull_csv_insights", "pull_binary_insights"]
+
+
+def git_commit() -> Optional[str]:
+    """Return the short hash of the checked out commit, if in a git repository."""
+
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))
+                              ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def pipeline_stages(csv_file: str, output_folder: str) -> List[tuple]:
+    """
+    Return (name, function) pairs that run the pipeline in order. Each
+    function takes the results of earlier stages and adds its own.
+    """
+
+    processed_folder = output_folder + "processed-data/"
+
+    def run_validate(results):
+        results["data"] = validate_data(csv_file, output_folder=output_folder)
+
+    def run_unique(results):
+        terms, results["unique terms"] = find_unique_attributes(results["data"], 1)
+        results["counts"] = Counter(terms)
+        find_unique_attributes(results["data"], 3, path=False)
+
+    def run_create(results):
+        results["query table"] = create_dictionary(results["data"],
+                                                   results["unique terms"])
+
+    def run_aggregate(results):
+        results["summary"] = aggregated_dictionary(
+            results["query table"], results["counts"], results["unique terms"])
+
+    def run_write_csv(results):
+        write_data_to_csv(results["summary"], output_folder)
+
+    def run_stream(results):
+        aggregator = StreamAggregator().consume(PageViewReader(csv_file))
+        results["summary"] = aggregator.summary_table()
+        if "data" not in results:
+            write_data_to_csv(results["summary"], output_folder)
+
+    def run_write_binary(results):
+        write_data_to_binary(results["summary"], output_folder)
+
+    def run_csv_insights(results):
+        page_views_insights.pull_csv_insights(
+            processed_folder + "aggregated-page-views.csv")
+
+    def run_binary_insights(results):
+        page_views_insights.pull_binary_insights(
+            processed_folder + "aggregated-page-views.bin")
+
+    return [("validate_data", run_validate),
+            ("find_unique_attributes", run_unique),
+            ("create_dictionary", run_create),
+            ("aggregated_dictionary", run_aggregate),
+            ("write_data_to_csv", run_write_csv),
+            ("StreamAggregator", run_stream),
+            ("write_data_to_binary", run_write_binary),
+            ("pull_csv_insights", run_csv_insights),
+            ("pull_binary_insights", run_binary_insights)]
+
+
+def time_stage(function: Callable[[Dict[str, Any]], None],
+               results: Dict[str, Any], repeat: int) -> float:
+    """Return the best time of a stage over several runs, hiding its prints."""
+
+    best = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            function(results)
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_benchmarks(sizes: List[int], stages: List[str], repeat: int,
+                   generator_options: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Generate data of each size and time the chosen stages on it."""
+
+    reasons = []
+    if generator_options["interleave"] > 1 or generator_options["disorder"] > 0:
+        reasons.append("grouped, time-ordered sessions")
+    if generator_options["clicks"][0] == 0:
+        reasons.append("a click after every search")
+    if reasons:
+        skipped = [stage for stage in stages if stage in DICT_STAGES]
+        if skipped:
+            print("Skipping {}, which need {}.".format(", ".join(skipped),
+                                                      " and ".join(reasons)))
+        stages = [stage for stage in stages if stage not in DICT_STAGES]
+    if not stages:
+        return []
+
+    #  Stages to run, timed or not, in pipeline order
+    last = max(STAGES.index(stage) for stage in stages)
+    needed = STAGES[:last + 1]
+    if not any(stage in DICT_STAGES for stage in stages):
+        needed = [stage for stage in needed if stage not in DICT_STAGES]
+
+    records = []
+    for num_rows in sizes:
+        with tempfile.TemporaryDirectory(prefix="page-views-bench-") as folder:
+            output_folder = os.path.join(folder, "output", "")
+            os.makedirs(output_folder + "processed-data")
+            os.makedirs(output_folder + "failed")
+            csv_file = os.path.join(folder, "page-views.csv")
+
+            start = time.perf_counter()
+            rows_written = generate_page_views(csv_file, num_rows, **generator_options)
+            print("{:,} rows, {:.1f} MB, generated in {:.1f} s".format(
+                rows_written, os.path.getsize(csv_file) / 2**20,
+                time.perf_counter() - start))
+
+            results = {}
+            for name, function in pipeline_stages(csv_file, output_folder):
+                if name not in needed:
+                    continue
+                if name not in stages:
+                    time_stage(function, results, 1)
+                    continue
+                elapsed = time_stage(function, results, repeat)
+                records.append({"rows": rows_written, "stage": name,
+                                "seconds": elapsed,
+                                "rows per second": rows_written / elapsed})
+                print("    {:<24}{:>10.3f} s {:>14,.0f} rows/s".format(
+                    name, elapsed, rows_written / elapsed))
+    return records
+
+
+def compare(records: List[Dict[str, Any]], generator: Dict[str, Any],
+            baseline_file: str, tolerance: float) -> List[str]:
+    """
+    Return a description of each stage that is slower than in a baseline
+    result file by more than the tolerance, e.g., 0.1 for 10%.
+    """
+
+    with open(baseline_file, mode="r") as data:
+        saved = json.load(data)
+    if saved["generator"] != generator:
+        print("The baseline was run on different data: {}".format(saved["generator"]))
+    baseline = {(record["rows"], record["stage"]): record["seconds"]
+                for record in saved["results"]}
+
+    regressions = []
+    for record in records:
+        before = baseline.get((record["rows"], record["stage"]))
+        if before is None:
+            continue
+        change = record["seconds"] / before - 1
+        print("    {:<24}{:>12,} rows {:>+8.1%}".format(record["stage"],
+                                                      record["rows"], change))
+        if change > tolerance:
+            regressions.append("{} at {:,} rows: {:.3f} s, was {:.3f} s".format(
+                record["stage"], record["rows"], record["seconds"], before))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES,
+                        help="rows to generate, e.g., 10000 1000000 50000000")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per stage, the best is recorded")
+    parser.add_argument("--queries", type=int, default=10000)
+    parser.add_argument("--clients", type=int, default=100000)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--clicks", type=int, nargs=2, default=[1, 3],
+                        metavar=("MIN", "MAX"),
+                        help="results clicked per search (default: 1 3, as the "
+                             "dict engine stages are skipped if MIN is 0)")
+    parser.add_argument("--interleave", type=int, default=1)
+    parser.add_argument("--disorder", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None,
+                        help="result file (default: results/bench-pipeline-<commit>.json)")
+    parser.add_argument("--compare", default=None, metavar="BASELINE",
+                        help="result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="slowdown reported as a regression (default: 0.1)")
+    args = parser.parse_args()
+
+    #  Number of insight results, which the script defines when run
+    page_views_insights.N = 5
+
+    generator_options = {"num_queries": args.queries, "num_clients": args.clients,
+                         "seed": args.seed, "zipf": args.zipf,
+                         "clicks": tuple(args.clicks),
+                         "interleave": args.interleave, "disorder": args.disorder}
+    records = run_benchmarks(args.sizes, args.stages, args.repeat, generator_options)
+    generator = dict(generator_options, clicks=list(args.clicks))
+
+    commit = git_commit()
+    output_file = args.output
+    if output_file is None:
+        os.makedirs(RESULTS_FOLDER, exist_ok=True)
+        output_file = os.path.join(RESULTS_FOLDER, "bench-pipeline-{}.json".format(
+            commit or time.strftime("%Y%m%d%H%M%S")))
+    with open(output_file, mode="w") as output_data:
+        json.dump({"commit": commit,
+                   "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                   "python": platform.python_version(),
+                   "platform": platform.platform(),
+                   "repeat": args.repeat,
+                   "generator": generator,
+                   "results": records}, output_data, indent=2)
+    print("Results written to {}".format(output_file))
+
+    if args.compare is not None:
+        regressions = compare(records, generator, args.compare, args.tolerance)
+        if regressions:
+            print("Slower than {}:".format(args.compare))
+            for regression in regressions:
+                print("    " + regression)
+            sys.exit(1)
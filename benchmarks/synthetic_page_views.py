@@ -0,0 +1,145 @@
+"""
+Generate synthetic page view csv files shaped like the real input: each
+client searches a query and clicks a few results. The output depends only
+on the arguments and seed, so benchmark runs on different commits read
+the same data.
+
+Queries are drawn from a Zipf distribution over num_queries terms. With
+interleave 1 each session's rows are written together, like the sample
+input; larger values keep that many sessions open at once, so rows from
+different clients interleave. A disorder fraction of rows is written up
+to max_delay seconds late, out of timestamp order.
+
+    python synthetic_page_views.py page-views.csv --rows 1000000 --interleave 100
+"""
+
+import argparse
+import heapq
+import itertools
+import random
+from typing import Tuple
+
+START_TIME = 1496200000
+
+
+def zipf_weights(num_items: int, exponent: float):
+    """Return cumulative Zipf weights, 1 / rank ** exponent."""
+
+    return list(itertools.accumulate(1 / rank ** exponent
+                                     for rank in range(1, num_items + 1)))
+
+
+def generate_page_views(output_file: str,
+                        num_rows: int,
+                        num_queries: int = 10000,
+                        num_clients: int = 100000,
+                        seed: int = 0,
+                        zipf: float = 1.1,
+                        clicks: Tuple[int, int] = (0, 3),
+                        interleave: int = 1,
+                        disorder: float = 0.0,
+                        max_delay: int = 60) -> int:
+    """
+    Write about num_rows page views to a csv file, and return the number
+    of rows written. Sessions are completed, so a few more rows than
+    asked for may be written.
+
+    ARGUMENTS
+    ---------
+        output_file : str
+        num_rows : int
+        num_queries : int
+            Distinct query terms.
+        num_clients : int
+            Distinct client ids.
+        seed : int
+        zipf : float
+            Exponent of the query popularity distribution.
+        clicks : tuple
+            Smallest and largest number of results clicked per search.
+        interleave : int
+            Sessions open at once.
+        disorder : float
+            Fraction of rows written late.
+        max_delay : int
+            Most seconds a late row is delayed by.
+    """
+
+    rng = random.Random(seed)
+    queries = ["query{}".format(i) for i in range(num_queries)]
+    cum_weights = zipf_weights(num_queries, zipf)
+    timestamp = START_TIME
+    rows_written = 0
+
+    #  [search path, cid, clicks left] per open session
+    sessions = []
+
+    #  (release time, sequence, line) of rows held back to arrive late
+    delayed = []
+    sequence = itertools.count()
+
+    with open(output_file, mode="w", encoding="utf-8", newline="") as output_data:
+        lines = []
+
+        def emit(line):
+            if disorder and rng.random() < disorder:
+                heapq.heappush(delayed, (timestamp + rng.randint(1, max_delay),
+                                         next(sequence), line))
+            else:
+                lines.append(line)
+
+        while rows_written < num_rows or sessions:
+            timestamp += rng.randrange(3)
+            while delayed and delayed[0][0] <= timestamp:
+                lines.append(heapq.heappop(delayed)[2])
+
+            if len(sessions) < interleave and rows_written < num_rows:
+                query = rng.choices(queries, cum_weights=cum_weights)[0]
+                session = ["/search?q=" + query, rng.randrange(num_clients),
+                           rng.randint(*clicks)]
+                sessions.append(session)
+                emit("{},{},,{}\n".format(timestamp, session[0], session[1]))
+            else:
+                i = rng.randrange(len(sessions))
+                session = sessions[i]
+                if session[2] == 0:
+                    sessions[i] = sessions[-1]
+                    sessions.pop()
+                    continue
+                session[2] -= 1
+                emit("{},/repository/{},{},{}\n".format(
+                    timestamp, rng.randrange(10000), session[0], session[1]))
+            rows_written += 1
+
+            if len(lines) >= 10000:
+                output_data.writelines(lines)
+                lines = []
+
+        lines.extend(line for _, _, line in sorted(delayed))
+        output_data.writelines(lines)
+    return rows_written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic page views.")
+    parser.add_argument("output_file")
+    parser.add_argument("--rows", type=int, default=10000000)
+    parser.add_argument("--queries", type=int, default=10000)
+    parser.add_argument("--clients", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--zipf", type=float, default=1.1,
+                        help="exponent of the query popularity distribution")
+    parser.add_argument("--clicks", type=int, nargs=2, default=[0, 3],
+                        metavar=("MIN", "MAX"),
+                        help="results clicked per search")
+    parser.add_argument("--interleave", type=int, default=1,
+                        help="sessions open at once")
+    parser.add_argument("--disorder", type=float, default=0.0,
+                        help="fraction of rows written late")
+    parser.add_argument("--max-delay", type=int, default=60,
+                        help="most seconds a late row is delayed by")
+    args = parser.parse_args()
+
+    generate_page_views(args.output_file, args.rows, args.queries, args.clients,
+                        args.seed, args.zipf, tuple(args.clicks), args.interleave,
+                        args.disorder, args.max_delay)
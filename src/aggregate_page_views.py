@@ -46,51 +46,53 @@ OUTPUTS
 """
 
 #  Standard Python library imports
-import csv
-import sys
+import argparse
+import os
 import time
-from typing import List, Dict, Tuple, Any
-import string
+from functools import partial
+from typing import List, Dict, Tuple, Any, Callable
 from collections import Counter
 
 #   Companion scripts
 from exception_handler import exception_handler
 from write_to_csv import write_to_csv
-from retrieve_csv import retrive_csv_file
-
-
-def validate_data(csv_file: str,
-                  header: bool = False,
-                  output_filename: str = None,
-                  output_folder: str = None) -> List[List[str]]:
+from retrieve_csv import (retrive_csv_file, retrieve_csv_files, compression_of,
+                          is_parquet)
+from page_view_reader import PageViewReader
+from stream_aggregator import SESSION_TIMEOUT, StreamAggregator, aggregate_rows
+from parallel_aggregator import parallel_aggregate
+from reorder_buffer import ReorderBuffer
+from external_sort import sort_by_client
+from aggregation_state import AggregationState
+from summary_binary import write_summary_binary
+from page_view_columns import PageViewColumns
+from numpy_engine import aggregate_columns, require_numpy
+from query_normalizer import QueryNormalizer
+from heavy_hitters import SKETCH_SIZE, SketchAggregator
+from distinct_counter import HLL_PRECISION, HyperLogLog
+from partition_page_views import TimeRangeReader, parse_time
+from async_pipeline import CONCURRENCY, aggregate_files
+from instrumentation import PROFILE_MODES, instrument, profiled, write_metrics
+
+#  Shared normalizer, so repeated search paths are only parsed once
+query_normalizer = QueryNormalizer()
+
+
+def report_validation(rows_read: int,
+                      accepted: int,
+                      output_folder: str = None):
     """
-    Pull data from csv and store as a list of lists. If any of the following
-    columns are missing data: timestamp, search path, or client id, then that
-    row will not be included in the final list.
+    Report the number of lines accepted and rejected. If no data could be
+    pulled, write out an empty failed report file.
     """
-    page_views_lst = []
-
-    # Initialize counter
-    rows_read = 0
-
-    with open(csv_file, mode="r", encoding="utf-8") as data:
-        read_data = csv.reader(data)
-        for row in read_data:
-            rows_read += 1
-
-            #  Skip rows with missing data
-            if row[0] != "" and row[1] != "" and row[3] != "":
-                page_views_lst.append(row)
-
 
-    accepted = len(page_views_lst)
-    rejected = rows_read - len(page_views_lst)
+    rejected = rows_read - accepted
     print("""
           Out of {:,} lines read, {:,} lines were accepted and {:,} lines were rejected.
           """.format(rows_read, accepted, rejected))
 
     #  If no data can be pulled, write out a failed report file
-    if len(page_views_lst) == 0:
+    if accepted == 0:
 
         datestamp = time.strftime("%Y%m%d")
         failed_report_folder = output_folder + "failed/"
@@ -98,12 +100,30 @@ def validate_data(csv_file: str,
 
         write_to_csv(output_filename=output_filename,
                      output_folder=failed_report_folder,
-                     output=page_views_lst)
+                     output=[])
 
         print("No valid data to pull. Failed report generated.")
 
-    if header:
-        return page_views_lst[1:]
+
+@instrument(rows=len)
+def validate_data(csv_file: str,
+                  header: bool = False,
+                  output_filename: str = None,
+                  output_folder: str = None) -> List[List[Any]]:
+    """
+    Pull data from csv and store as a list of lists, with integer timestamps.
+    If any of the following columns are missing data: timestamp, search path,
+    or client id, then that row will not be included in the final list.
+    A header row has no integer timestamp, so it is never included either,
+    and if header is True it is not counted as a rejected line.
+    """
+    page_views = open_page_views(csv_file)
+    page_views_lst = list(page_views)
+
+    rows_read = page_views.rows_read
+    if header and rows_read:
+        rows_read -= 1
+    report_validation(rows_read, len(page_views_lst), output_folder)
 
     return page_views_lst
 
@@ -111,17 +131,14 @@ def validate_data(csv_file: str,
 def clean_query(path: str) -> str:
     """Take a path and extract and clean query keyword."""
 
-    punctuation = string.punctuation
     #  Remove punctuation and return lowercase term
     if "search" in path:
-        term = path.split('=')[1]
-        term = term.lower()
-        term = term.translate(str.maketrans("", "", punctuation))
-        return term
+        return query_normalizer(path)
     else:
         print("The path should contain a search key.")
 
 
+@instrument(rows=lambda result: len(result[0]))
 def find_unique_attributes(dataset: List[List[str]],
                            column: int,
                            path: bool = True) -> Tuple[List[str], List[str]]:
@@ -138,11 +155,12 @@ def find_unique_attributes(dataset: List[List[str]],
     else:
         for row in dataset:
             all_items.append(row[column])
-            unique_items = list(set(all_items))
+        unique_items = list(set(all_items))
 
     return all_items, unique_items
 
 
+@instrument()
 def create_dictionary(dataset: List[List[str]],
                       unique_terms: List[str]) -> Dict[str, Dict[str, Any]]:
     """Compile search data using query keyword and group by user client id."""
@@ -182,6 +200,7 @@ def create_dictionary(dataset: List[List[str]],
     return query_table
 
 
+@instrument()
 def aggregated_dictionary(compiled_dict: Dict[str, Dict[str, Any]],
                           freq_table: Dict[str, int],
                           unique_terms: List[str]) -> Dict[str, Dict[str, Any]]:
@@ -218,32 +237,409 @@ def aggregated_dictionary(compiled_dict: Dict[str, Dict[str, Any]],
     return summary_table
  
 
+@instrument()
 def write_data_to_csv(compiled_dict: Dict[str, Dict[str, Any]],
-                      output_folder: str):
-    """Pull data from aggregated dict and store in a csv."""
-
-    output = []
-
-    #  Order and sort data into output container
-    for key, val in compiled_dict.items():
-        output.append([key,
-                       val["num queries"],
-                       val["total time"],
-                       val["num users"],
-                       val["results clicked"],
-                       val["av clicks per user"],
-                       val["av time per click"]])
-
-    output.sort(key=lambda header: header[0])
+                      output_folder: str,
+                      compression: str = None,
+                      output_filename: str = 'aggregated-page-views.csv'):
+    """
+    Pull data from aggregated dict and store in a csv, compressed with
+    "gzip", "zstd" or "lz4" if given. Rows are streamed to the writer and
+    sorted by query with a merge sort that spills to disk if they do not
+    fit into its memory budget.
+    """
+
+    #  Order data into output rows
+    output = ([key,
+               val["num queries"],
+               val["total time"],
+               val["num users"],
+               val["results clicked"],
+               val["av clicks per user"],
+               val["av time per click"]]
+              for key, val in compiled_dict.items())
+
     processed_folder = output_folder + 'processed-data/'
-    output_filename = 'aggregated-page-views.csv'
+    output_filename = output_filename + COMPRESSION_SUFFIXES.get(compression, "")
     write_to_csv(output_filename=output_filename,
                  output_folder=processed_folder,
-                 output=output)
+                 output=output,
+                 sort_key=lambda header: header[0])
+
+
+def report_late_rows(late_rows: List[List[str]],
+                     output_folder: str = None):
+    """
+    Report the number of rows that arrived later than the reorder watermark,
+    and write them out to a failed report file.
+    """
+
+    if not late_rows:
+        return
+
+    print("{:,} rows arrived too late to reorder and were not aggregated.".format(
+        len(late_rows)))
+
+    datestamp = time.strftime("%Y%m%d")
+    failed_report_folder = output_folder + "failed/"
+    output_filename = "failed_late_rows_{}.csv".format(datestamp)
+    write_to_csv(output_filename=output_filename,
+                 output_folder=failed_report_folder,
+                 output=(row[:4] for row in late_rows))
+
+
+def open_page_views(csv_file: str, since: int = None, until: int = None):
+    """Open a reader for a csv or Parquet page view file."""
+
+    if is_parquet(csv_file):
+        from page_views_parquet import ParquetPageViewReader
+        return ParquetPageViewReader(csv_file, since, until)
+    return PageViewReader(csv_file)
+
+
+def read_page_views(csv_file: str,
+                    max_lateness: int = None,
+                    sort_memory: int = None,
+                    since: int = None,
+                    until: int = None,
+                    partition_folder: str = None):
+    """
+    Open a page view reader, optionally restricted to a time range, and
+    behind a reorder buffer or an external sort by client id and timestamp.
+
+    ARGUMENTS
+    ---------
+        csv_file : str
+        max_lateness : int
+            Reorder rows by timestamp, allowing them to arrive this many
+            seconds late.
+        sort_memory : int
+            Sort rows by (cid, timestamp), holding about this many MB of
+            rows in memory and spilling sorted runs to disk.
+        since, until : int
+            Only read rows with since <= timestamp < until, from the
+            partitions overlapping the range if partition_folder holds a
+            partition index, or else from the input file. Parquet
+            files skip the row groups outside the range.
+        partition_folder : str
+            e.g., "../input/partitions/"
+
+    RETURNS
+    -------
+        rows : iterable
+            Valid rows. If reordered or sorted, they carry their input
+            position as a fifth field.
+        page_views : PageViewReader, ParquetPageViewReader or TimeRangeReader
+            Counts the lines read and accepted.
+        reorder_buffer : ReorderBuffer
+            Holds the rows that arrived late, or None.
+    """
+
+    page_views = open_page_views(csv_file, since, until)
+    if not is_parquet(csv_file) and (since is not None or until is not None):
+        page_views = TimeRangeReader(csv_file, since, until, partition_folder)
+    if sort_memory is not None:
+        rows = sort_by_client(page_views, memory_budget=sort_memory * 2**20)
+        return rows, page_views, None
+    if max_lateness is None:
+        return page_views, page_views, None
+
+    #  Keep each row's input position, which orders sessions
+    rows = (row[:4] + [position] for position, row in enumerate(page_views))
+    reorder_buffer = ReorderBuffer(max_lateness)
+    return reorder_buffer.reorder(rows), page_views, reorder_buffer
+
+
+@instrument()
+def write_data_to_binary(compiled_dict: Dict[str, Dict[str, Any]],
+                         output_folder: str,
+                         compression: str = None):
+    """
+    Pull data from aggregated dict and store in a binary summary file. The
+    summary is memory-mapped by readers, so it is never compressed.
+    """
+
+    processed_folder = output_folder + 'processed-data/'
+    output_file = processed_folder + 'aggregated-page-views.bin'
+    write_summary_binary(compiled_dict, output_file)
+    print(output_file)
+
+
+@instrument()
+def write_data_to_parquet(compiled_dict: Dict[str, Dict[str, Any]],
+                          output_folder: str,
+                          compression: str = None):
+    """
+    Pull data from aggregated dict and store in a Parquet file, with a
+    dictionary-encoded query column and typed numeric columns. Parquet
+    compresses its own pages, so the compression option is not used.
+    """
+
+    from page_views_parquet import write_summary_parquet
+
+    processed_folder = output_folder + 'processed-data/'
+    output_file = processed_folder + 'aggregated-page-views.parquet'
+    write_summary_parquet(compiled_dict, output_file)
+    print(output_file)
+
+
+#  File name suffixes of the compressions selectable with --compression
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst", "lz4": ".lz4"}
+
+#  Summary writers selectable with --output-format. Each takes the summary
+#  table, output folder and compression.
+OUTPUT_FORMATS = {"csv": [write_data_to_csv],
+                  "binary": [write_data_to_binary],
+                  "both": [write_data_to_csv, write_data_to_binary],
+                  "parquet": [write_data_to_parquet]}
+
+
+@instrument(rows=lambda aggregator: aggregator.rows)
+def stream_aggregate(csv_file: str,
+                     workers: int = 1,
+                     timeout: int = SESSION_TIMEOUT,
+                     aggregator_factory: Callable[..., StreamAggregator] = StreamAggregator,
+                     **read_options) -> StreamAggregator:
+    """
+    Aggregate in a single streaming pass, or across worker processes, and
+    return the aggregator. The factory creates each aggregator from a
+    timeout keyword.
+    """
+
+    if workers > 1 and compression_of(csv_file) is not None:
+        print("Compressed input cannot be split. Using one process.")
+        workers = 1
+    if workers > 1 and is_parquet(csv_file):
+        print("Parquet input is read in one process.")
+        workers = 1
+    if workers > 1 and (read_options.get("since") is not None
+                        or read_options.get("until") is not None):
+        print("Time ranges are read in one process.")
+        workers = 1
+
+    if workers > 1:
+        #  Split the file across processes, sharded by client id
+        if read_options.get("sort_memory") is not None:
+            print("Sorting by client id is not supported with workers.")
+        aggregator, rows_read, accepted, late_rows = parallel_aggregate(
+            csv_file, workers, timeout, read_options.get("max_lateness"),
+            aggregator_factory)
+    else:
+        #  Read the file once, updating per-query totals row by row
+        rows, page_views, reorder_buffer = read_page_views(csv_file,
+                                                           **read_options)
+        grouped = read_options.get("sort_memory") is not None
+        aggregator = aggregate_rows(rows,
+                                    aggregator=aggregator_factory(
+                                        normalize=query_normalizer,
+                                        timeout=timeout),
+                                    grouped_by_client=grouped)
+        rows_read, accepted = page_views.rows_read, page_views.accepted
+        late_rows = reorder_buffer.late_rows if reorder_buffer else []
+
+    report_validation(rows_read, accepted, output_folder)
+    report_late_rows(late_rows, output_folder)
+
+    print("There are {} unique client ids out of {}.".format(len(aggregator.cids), aggregator.rows))
+
+    if workers <= 1:
+        cache = query_normalizer.cache_info()
+        print("Query cache: {:,} hits, {:,} misses ({:.1%} hit rate).".format(
+            cache.hits, cache.misses, query_normalizer.hit_rate))
+
+    return aggregator
+
+
+def run_stream_engine(csv_file: str,
+                      workers: int = 1,
+                      timeout: int = SESSION_TIMEOUT,
+                      aggregator_factory: Callable[..., StreamAggregator] = StreamAggregator,
+                      **read_options) -> Dict[str, Dict[str, Any]]:
+    """Aggregate in a single streaming pass, or across worker processes."""
+
+    aggregator = stream_aggregate(csv_file, workers, timeout,
+                                  aggregator_factory, **read_options)
+
+    num_terms = sum(query.num_queries for query in aggregator.queries.values())
+    print("There are {} unique search keywords out of {}.".format(len(aggregator.queries), num_terms))
+
+    return aggregator.summary_table()
+
+
+def run_dict_engine(csv_file: str,
+                    workers: int = 1,
+                    timeout: int = SESSION_TIMEOUT,
+                    **read_options) -> Dict[str, Dict[str, Any]]:
+    """
+    Aggregate with the list-based nested dictionary pipeline. This engine
+    assumes rows are grouped by session, and ignores the session timeout
+    and read options.
+    """
+
+    page_views_data = validate_data(csv_file,
+                                    header=False,
+                                    output_filename=None,
+                                    output_folder=output_folder)
+
+    terms, unique_terms = find_unique_attributes(page_views_data, 1)
+    print("There are {} unique search keywords out of {}.".format(len(unique_terms), len(terms)))
+
+    count_queries = Counter(terms)
+
+    cids, unique_cids = find_unique_attributes(page_views_data, 3, path=False)
+    print("There are {} unique client ids out of {}.".format(len(unique_cids), len(cids)))
+
+    query_table = create_dictionary(page_views_data, unique_terms)
+
+    return aggregated_dictionary(query_table, count_queries, unique_terms)
+
+
+@instrument()
+def run_numpy_engine(csv_file: str,
+                     workers: int = 1,
+                     timeout: int = SESSION_TIMEOUT,
+                     **read_options) -> Dict[str, Dict[str, Any]]:
+    """Load the file into columns and aggregate them with NumPy."""
+
+    require_numpy()
+    rows, page_views, reorder_buffer = read_page_views(csv_file, **read_options)
+    columns = PageViewColumns.from_rows(rows, query_normalizer)
+    report_validation(page_views.rows_read, page_views.accepted, output_folder)
+    if reorder_buffer:
+        report_late_rows(reorder_buffer.late_rows, output_folder)
+
+    print("There are {} unique search keywords and {} unique client ids.".format(
+        len(columns.terms), len(columns.cids)))
+
+    return aggregate_columns(columns, timeout)
+
+
+@instrument()
+def run_incremental(timeout: int = SESSION_TIMEOUT,
+                    aggregator_factory: Callable[..., StreamAggregator] = StreamAggregator,
+                    state_folder: str = None,
+                    **read_options) -> StreamAggregator:
+    """
+    Fold every csv file in the input folder that has not been consumed yet
+    into the persisted aggregation state, and return the aggregator of all
+    data consumed so far.
+    """
+
+    if state_folder is None:
+        state_folder = output_folder + "state/"
+    state = AggregationState.load(state_folder, timeout, aggregator_factory)
+    new_files = state.new_files(retrieve_csv_files(input_folder))
+    print("{} new input files to aggregate.".format(len(new_files)))
+
+    grouped = read_options.get("sort_memory") is not None
+    for csv_file in new_files:
+        print(csv_file)
+        rows, page_views, reorder_buffer = read_page_views(csv_file,
+                                                           **read_options)
+
+        #  Leave sessions open, as they may continue in the next file
+        state.aggregator.consume(rows, grouped_by_client=grouped, close=False)
+        report_validation(page_views.rows_read, page_views.accepted,
+                          output_folder)
+        if reorder_buffer:
+            report_late_rows(reorder_buffer.late_rows, output_folder)
+        state.record(csv_file)
+
+    state.save()
+    return state.aggregator
+
+
+@instrument(rows=lambda aggregator: aggregator.rows)
+def run_all_files(timeout: int = SESSION_TIMEOUT,
+                  aggregator_factory: Callable[..., StreamAggregator] = StreamAggregator,
+                  concurrency: int = CONCURRENCY,
+                  compression: str = None,
+                  per_file_summaries: bool = True) -> StreamAggregator:
+    """
+    Aggregate every csv file in the input folder concurrently, write a
+    summary per file to processed-data/per-file/ unless per_file_summaries
+    is False, e.g., for sketches, and return the merged aggregator.
+    """
+
+    csv_files = retrieve_csv_files(input_folder)
+    print("Aggregating {} input files, {} at a time.".format(len(csv_files),
+                                                            concurrency))
+    per_file_folder = output_folder + "processed-data/per-file/"
+    os.makedirs(per_file_folder, exist_ok=True)
+
+    def on_file(csv_file: str, file_aggregator: StreamAggregator,
+                page_views: PageViewReader):
+        print(csv_file)
+        report_validation(page_views.rows_read, page_views.accepted,
+                          output_folder)
+        if not per_file_summaries:
+            return
+        name = os.path.basename(csv_file).rsplit(".csv", 1)[0] + ".csv"
+        write_data_to_csv(file_aggregator.summary_table(), output_folder,
+                          compression, output_filename="per-file/" + name)
+
+    _, aggregator = aggregate_files(csv_files, timeout, aggregator_factory,
+                                    concurrency, on_file=on_file)
+    return aggregator
+
+
+def write_heavy_hitters(aggregator: SketchAggregator,
+                        output_folder: str,
+                        num_results: int = 5):
+    """
+    Report the approximate top queries with their error bounds, and store
+    every counted query, ranked, in a csv.
+    """
+
+    #  Credit sessions still open at the end of the input
+    aggregator.close()
+    query_counts, click_counts = aggregator.query_counts, aggregator.click_counts
+    print("Approximate counts are at most {:,.0f} queries and {:,.0f} clicks "
+          "above the true counts.".format(query_counts.error_bound,
+                                          click_counts.error_bound))
+    for ranking, counts in [("issued", query_counts),
+                            ("clicked", click_counts)]:
+        print("The top {} most {} queries are: {}".format(
+            num_results, ranking,
+            [(term, count, "-{}".format(error))
+             for term, count, error in counts.top(num_results)]))
+    if aggregator.total_clicks:
+        print("The average length of a search session is {:.2f} seconds".format(
+            aggregator.total_time / aggregator.total_clicks))
+
+    processed_folder = output_folder + 'processed-data/'
+    output_filename = 'approximate-top-queries.csv'
+    write_to_csv(output_filename=output_filename,
+                 output_folder=processed_folder,
+                 output=aggregator.heavy_hitters(query_counts.capacity))
+
+
+#  Aggregation engines selectable with --engine. Each takes the csv file,
+#  number of workers, session timeout and the keyword options of
+#  read_page_views, and returns the summary table.
+ENGINES = {"stream": run_stream_engine,
+           "dict": run_dict_engine,
+           "numpy": run_numpy_engine}
 
 
 @exception_handler
-def main(input_filename: str = None):
+def main(input_filename: str = None,
+         workers: int = 1,
+         engine: str = "stream",
+         timeout: int = SESSION_TIMEOUT,
+         max_lateness: int = None,
+         sort_memory: int = None,
+         incremental: bool = False,
+         output_format: str = "csv",
+         approximate: bool = False,
+         sketch_size: int = SKETCH_SIZE,
+         distinct: str = "exact",
+         hll_precision: int = HLL_PRECISION,
+         compression: str = None,
+         since: int = None,
+         until: int = None,
+         all_files: bool = False,
+         concurrency: int = CONCURRENCY):
     """
      Contains a pipeline that accepts an input csv file and processes the aggregate
      data. Outputs processed data into a csv file and prints results of basic data
@@ -254,37 +650,226 @@ def main(input_filename: str = None):
         input_filename : str
             e.g., "page-views.csv"
 
+        workers : int
+            Number of processes to aggregate with. A single process reads
+            the file in one streaming pass.
+
+        engine : str
+            Aggregation engine, one of "stream", "dict" or "numpy".
+
+        timeout : int
+            Seconds of inactivity after which a search session is closed.
+
+        max_lateness : int
+            If given, reorder rows by timestamp, allowing them to arrive
+            this many seconds late. Later rows go to a failed report.
+
+        sort_memory : int
+            If given, sort rows by client id and timestamp with an external
+            merge sort that holds about this many MB of rows in memory.
+
+        incremental : bool
+            Fold only input files not yet consumed into the aggregation
+            state saved under output/state/, instead of reading one file.
+
+        output_format : str
+            "csv", "binary", "both" or "parquet". The binary and Parquet
+            summaries can be read by page_views_insights.py without
+            parsing text. Parquet requires pyarrow.
+
+        approximate : bool
+            Count the top queries with fixed-size Space-Saving sketches
+            instead of exact per-query totals, and write them with their
+            error bounds. Incremental sketches are saved under
+            output/state/approximate/. Unique client ids are always
+            estimated with HyperLogLog, so memory stays fixed.
+
+        sketch_size : int
+            Number of counters in each sketch.
+
+        distinct : str
+            "exact" counts unique client ids with sets, and "hll"
+            estimates them with HyperLogLog counters, overall and per
+            query, that use a few kilobytes each.
+
+        hll_precision : int
+            Index bits of each HyperLogLog counter. Each extra bit
+            doubles memory and cuts the error by a factor of sqrt(2).
+
+        compression : str
+            Compress the csv summary with "gzip", "zstd" or "lz4". Input
+            files ending in .gz, .zst or .lz4 are always decompressed.
+
+        since, until : int
+            Only aggregate page views with since <= timestamp < until,
+            reading only the overlapping partitions written by
+            partition_page_views.py, if any.
+
+        all_files : bool
+            Aggregate every file in the input folder, reading several at
+            once, and write a summary per file along with the merged one.
+            Sessions are cut at file boundaries.
+
+        concurrency : int
+            Most files read at once with all_files.
+
     RETURNS
     -------
         None
     """
 
+    read_options = {"max_lateness": max_lateness, "sort_memory": sort_memory}
+    if since is not None or until is not None:
+        if incremental:
+            print("Time ranges are not supported with --incremental.")
+        else:
+            read_options.update(since=since, until=until,
+                                partition_folder=partition_folder)
+    distinct_counter = set
+    if distinct == "hll":
+        distinct_counter = partial(HyperLogLog, hll_precision)
+    aggregator_factory = partial(StreamAggregator, distinct=distinct_counter)
+    sketch_factory = partial(SketchAggregator, capacity=sketch_size,
+                             distinct=partial(HyperLogLog, hll_precision))
+
+    if all_files:
+        if incremental or any(option is not None for option in read_options.values()):
+            print("--all-files reads every file whole, and ignores "
+                  "--incremental, --since, --until and the reordering options.")
+        aggregator = run_all_files(timeout, sketch_factory if approximate
+                                   else aggregator_factory, concurrency,
+                                   compression, per_file_summaries=not approximate)
+        if approximate:
+            write_heavy_hitters(aggregator, output_folder)
+            return
+        for write_summary in OUTPUT_FORMATS[output_format]:
+            write_summary(aggregator.summary_table(), output_folder, compression)
+        return
+
+    if incremental:
+        if approximate:
+            aggregator = run_incremental(timeout, sketch_factory,
+                                         output_folder + "state/approximate/",
+                                         **read_options)
+            write_heavy_hitters(aggregator, output_folder)
+            return
+
+        summary_table = run_incremental(timeout, aggregator_factory,
+                                        **read_options).summary_table()
+        for write_summary in OUTPUT_FORMATS[output_format]:
+            write_summary(summary_table, output_folder, compression)
+        return
+
     csv_file = retrive_csv_file(filename=input_filename,
                                 input_folder=input_folder)
 
-    page_views_data = validate_data(csv_file,
-                                   header=False,
-                                   output_filename=None,
-                                   output_folder=None)
+    if approximate:
+        if engine != "stream":
+            print("Only the stream engine supports sketches. Using stream.")
+        aggregator = stream_aggregate(csv_file, workers, timeout,
+                                      sketch_factory, **read_options)
+        write_heavy_hitters(aggregator, output_folder)
+        return
 
-    terms, unique_terms = find_unique_attributes(page_views_data, 1)
-    print("There are {} unique search keywords out of {}.".format(len(unique_terms), len(terms)))
-    
-    count_queries = Counter(terms)
+    if workers > 1 and engine != "stream":
+        print("Only the stream engine supports workers. Using one process.")
 
-    cids, unique_cids = find_unique_attributes(page_views_data, 3, path=False)
-    print("There are {} unique client ids out of {}.".format(len(unique_cids), len(cids)))
-    
-    query_table =  create_dictionary(page_views_data, unique_terms)
-    
-    summary_table = aggregated_dictionary(query_table, count_queries, unique_terms)
-
-    write_data_to_csv(summary_table, output_folder)
+    if engine == "stream":
+        summary_table = run_stream_engine(csv_file, workers, timeout,
+                                          aggregator_factory, **read_options)
+    else:
+        if distinct != "exact":
+            print("Only the stream engine supports HyperLogLog. Counting exactly.")
+        summary_table = ENGINES[engine](csv_file, workers, timeout,
+                                        **read_options)
+
+    for write_summary in OUTPUT_FORMATS[output_format]:
+        write_summary(summary_table, output_folder, compression)
+
+
+def parse_arguments(argv: List[str] = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+
+    parser = argparse.ArgumentParser(description="Aggregate page view data.")
+    parser.add_argument("input_filename", nargs="?", default=None,
+                        help='input csv or Parquet file, e.g., "page-views.csv"')
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes to aggregate with")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="stream",
+                        help="aggregation engine (default: stream)")
+    parser.add_argument("--session-timeout", type=int, default=SESSION_TIMEOUT,
+                        help="seconds of inactivity that close a search session")
+    parser.add_argument("--max-lateness", type=int, default=None,
+                        help="reorder rows by timestamp, allowing them to "
+                             "arrive this many seconds late")
+    parser.add_argument("--sort-memory", type=int, default=None, metavar="MB",
+                        help="sort rows by client id and timestamp first, "
+                             "spilling to disk beyond this many MB")
+    parser.add_argument("--incremental", action="store_true",
+                        help="fold only new input files into the saved "
+                             "aggregation state")
+    parser.add_argument("--output-format", choices=sorted(OUTPUT_FORMATS),
+                        default="csv",
+                        help="summary file format (default: csv)")
+    parser.add_argument("--approximate", action="store_true",
+                        help="count top queries with fixed-size sketches "
+                             "and report their error bounds")
+    parser.add_argument("--sketch-size", type=int, default=SKETCH_SIZE,
+                        help="counters per sketch (default: {})".format(SKETCH_SIZE))
+    parser.add_argument("--distinct", choices=["exact", "hll"], default="exact",
+                        help="count unique client ids exactly or with "
+                             "HyperLogLog (default: exact)")
+    parser.add_argument("--hll-precision", type=int, default=HLL_PRECISION,
+                        help="HyperLogLog index bits (default: {})".format(HLL_PRECISION))
+    parser.add_argument("--compression", choices=sorted(COMPRESSION_SUFFIXES),
+                        default=None,
+                        help="compress the csv summary")
+    parser.add_argument("--since", type=parse_time, default=None,
+                        help="first time to aggregate, as a UNIX timestamp "
+                             "or UTC date, e.g., 2017-05-31T17:00")
+    parser.add_argument("--until", type=parse_time, default=None,
+                        help="time to aggregate up to, excluded")
+    parser.add_argument("--all-files", action="store_true",
+                        help="aggregate every input file concurrently, with "
+                             "a summary per file and a merged summary")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help="input files read at once with --all-files "
+                             "(default: {})".format(CONCURRENCY))
+    parser.add_argument("--profile", action="append", choices=PROFILE_MODES,
+                        default=None,
+                        help="profile the run with cProfile, a sampling "
+                             "profiler or tracemalloc, writing to "
+                             "output/profile/; may be repeated")
+    parser.add_argument("--metrics", default=None, metavar="FILE",
+                        help="write the time, CPU, rows/s and memory of each "
+                             "stage, as Prometheus text if FILE ends in "
+                             ".prom and otherwise as JSON lines")
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
     input_folder = "../input/raw-data/"
     output_folder = "../output/"
-
-    main(input_filename=sys.argv[1])
-
+    partition_folder = "../input/partitions/"
+
+    args = parse_arguments()
+    with profiled(args.profile, output_folder + "profile/", "aggregate-page-views"):
+        main(input_filename=args.input_filename,
+             workers=args.workers,
+             engine=args.engine,
+             timeout=args.session_timeout,
+             max_lateness=args.max_lateness,
+             sort_memory=args.sort_memory,
+             incremental=args.incremental,
+             output_format=args.output_format,
+             approximate=args.approximate,
+             sketch_size=args.sketch_size,
+             distinct=args.distinct,
+             hll_precision=args.hll_precision,
+             compression=args.compression,
+             since=args.since,
+             until=args.until,
+             all_files=args.all_files,
+             concurrency=args.concurrency)
+    if args.metrics is not None:
+        write_metrics(args.metrics)
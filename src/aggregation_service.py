@@ -0,0 +1,343 @@
+#!/usr/bin/python3
+"""
+Long-running aggregation service with a local HTTP query API.
+
+The aggregator stays resident and new files landing in the input folder
+are folded in as they appear, with the same persisted state and manifest
+as aggregate_page_views.py --incremental, so a restart resumes where the
+service stopped. The summary table is kept with its rankings already
+sorted, and after new files only the rows of the queries they touched are
+replaced and re-ranked. Requests are answered from it without touching
+the input. A file that fails to read is not counted: the service goes
+back to its saved state and retries on the next poll.
+
+Endpoints (JSON):
+
+    GET /top?n=5&by=num+queries     top N queries by a summary field
+    GET /query?q=geophysics         summary row of one query
+    GET /average                    average length of a search session
+    GET /status                     files, rows and queries aggregated
+
+    python3.8 aggregation_service.py --port 8080 --interval 10
+
+Do not run aggregate_page_views.py --incremental while the service is
+running, as both update the same state folder.
+"""
+
+#  Standard Python library imports
+import argparse
+import json
+import threading
+import time
+from bisect import bisect_left, insort
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+#   Companion scripts
+from exception_handler import exception_handler
+from retrieve_csv import retrieve_csv_files
+from page_view_reader import PageViewReader
+from query_normalizer import QueryNormalizer
+from aggregation_state import AggregationState
+from stream_aggregator import SESSION_TIMEOUT, StreamAggregator
+
+#  Summary fields queries can be ranked by
+RANKED_FIELDS = ["num queries", "total time", "num users", "results clicked"]
+
+
+class SummarySnapshot:
+    """
+    Summary table with its rankings and totals, so that every request is
+    a dictionary lookup or a slice. After each refresh only the rows of
+    the queries that changed are replaced and re-ranked, under a lock
+    shared with the readers.
+
+    ARGUMENTS
+    ---------
+        summary_table : dict
+            Aggregated data keyed by query search term.
+        files : int
+            Number of input files aggregated.
+        rows : int
+            Number of page views aggregated.
+    """
+
+    def __init__(self, summary_table: Dict[str, Dict[str, Any]],
+                 files: int = 0, rows: int = 0):
+        self.summary_table = dict(summary_table)
+        self.files = files
+        self.rows = rows
+        self.updated = time.time()
+        self._lock = threading.Lock()
+
+        #  field -> [(-value, term)] in ascending order, so ties are by term
+        self.rankings = {
+            field: sorted((-values[field], term)
+                          for term, values in summary_table.items())
+            for field in RANKED_FIELDS}
+
+        self.total_time = sum(values["total time"]
+                              for values in summary_table.values())
+        self.total_clicks = sum(values["results clicked"]
+                                for values in summary_table.values())
+
+    @classmethod
+    def of(cls, aggregator: StreamAggregator, files: int) -> "SummarySnapshot":
+        """
+        Snapshot an aggregator without closing its open sessions, which may
+        continue in the next file. Open sessions are counted as if closed.
+        """
+
+        rows = aggregator.summary_rows(aggregator.queries)
+        return cls({term: values for term, values in rows.items()
+                    if values is not None}, files, aggregator.rows)
+
+    def update(self, changed: Dict[str, Optional[Dict[str, Any]]],
+               files: int, rows: int):
+        """Replace the rows of the queries that changed, and re-rank them."""
+
+        with self._lock:
+            for term, values in changed.items():
+                old = self.summary_table.pop(term, None)
+                if old is not None:
+                    for field, ranking in self.rankings.items():
+                        del ranking[bisect_left(ranking, (-old[field], term))]
+                    self.total_time -= old["total time"]
+                    self.total_clicks -= old["results clicked"]
+                if values is not None:
+                    self.summary_table[term] = values
+                    for field, ranking in self.rankings.items():
+                        insort(ranking, (-values[field], term))
+                    self.total_time += values["total time"]
+                    self.total_clicks += values["results clicked"]
+            self.files = files
+            self.rows = rows
+            self.updated = time.time()
+
+    @property
+    def average_session(self) -> float:
+        with self._lock:
+            if not self.total_clicks:
+                return 0.0
+            return self.total_time / self.total_clicks
+
+    def top(self, num_results: int, field: str) -> List[Tuple[str, Any]]:
+        with self._lock:
+            return [(term, -value) for value, term
+                    in self.rankings[field][:num_results]]
+
+    def query(self, term: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self.summary_table.get(term)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"files": self.files,
+                    "rows": self.rows,
+                    "queries": len(self.summary_table),
+                    "updated": self.updated}
+
+
+class AggregationService:
+    """
+    Resident aggregator that folds in new input files and keeps the
+    snapshot of the summary table up to date.
+
+    ARGUMENTS
+    ---------
+        input_folder : str
+            e.g., "../input/raw-data/"
+        state_folder : str
+            e.g., "../output/state/"
+        timeout : int
+            Seconds of inactivity after which a session is closed.
+    """
+
+    def __init__(self, input_folder: str, state_folder: str,
+                 timeout: int = SESSION_TIMEOUT):
+        self.input_folder = input_folder
+        self.state_folder = state_folder
+        self.timeout = timeout
+        self.normalize = QueryNormalizer()
+        self.state = AggregationState.load(state_folder, timeout)
+        self.snapshot = SummarySnapshot.of(self.state.aggregator,
+                                           len(self.state.manifest))
+
+        #  Queries whose snapshot rows count sessions that are still open
+        self._open_queries = self.state.aggregator.open_queries()
+        self._stopped = threading.Event()
+
+    def refresh(self) -> int:
+        """
+        Fold in the input files not aggregated yet, save the state and
+        update the snapshot. Return the number of files read.
+        """
+
+        new_files = self.state.new_files(retrieve_csv_files(self.input_folder))
+        if not new_files:
+            return 0
+
+        aggregator = self.state.aggregator
+        aggregator.searched = set()
+        try:
+            for csv_file in new_files:
+                page_views = PageViewReader(csv_file)
+
+                #  Leave sessions open, as they may continue in the next file
+                aggregator.consume(page_views, close=False)
+                self.state.record(csv_file)
+                print("Aggregated {:,} of {:,} lines from {}".format(
+                    page_views.accepted, page_views.rows_read, csv_file))
+            searched, aggregator.searched = aggregator.searched, None
+            self.state.save()
+        except BaseException:
+            #  Rows already added cannot be taken back out, so go back to
+            #  the saved state, which the snapshot still describes, and
+            #  read every new file again on the next refresh
+            self.state = AggregationState.load(self.state_folder, self.timeout)
+            raise
+
+        #  Sessions are only credited to queries searched in the new files,
+        #  or to those that had a session open before them
+        open_queries = aggregator.open_queries()
+        changed = searched | open_queries | self._open_queries
+        self.snapshot.update(aggregator.summary_rows(changed),
+                             len(self.state.manifest), aggregator.rows)
+        self._open_queries = open_queries
+        return len(new_files)
+
+    def watch(self, interval: float):
+        """Refresh every interval seconds until stopped."""
+
+        while not self._stopped.is_set():
+            try:
+                self.refresh()
+            except Exception as error:
+                #  Keep serving the last snapshot, and retry on the next poll
+                print("Refresh failed: {}".format(error))
+            self._stopped.wait(interval)
+
+    def stop(self):
+        self._stopped.set()
+
+
+class SummaryRequestHandler(BaseHTTPRequestHandler):
+    """Answer GET requests from the service's latest snapshot."""
+
+    #  Set on a subclass by make_server
+    service = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        snapshot = self.service.snapshot
+
+        if url.path == "/top":
+            field = params.get("by", "num queries")
+            if field not in RANKED_FIELDS:
+                return self.send_json(400, {"error": "by must be one of {}".format(
+                    ", ".join(RANKED_FIELDS))})
+            try:
+                num_results = int(params.get("n", 5))
+            except ValueError:
+                return self.send_json(400, {"error": "n must be an integer"})
+            return self.send_json(200, snapshot.top(num_results, field))
+
+        if url.path == "/query":
+            term = self.service.normalize(
+                "/search?" + urlencode({"q": params.get("q", "")}))
+            row = snapshot.query(term)
+            if row is None:
+                return self.send_json(404, {"error": "no sessions for {!r}".format(term)})
+            return self.send_json(200, row)
+
+        if url.path == "/average":
+            return self.send_json(200, {"average session length":
+                                        snapshot.average_session})
+
+        if url.path == "/status":
+            return self.send_json(200, snapshot.status())
+
+        self.send_json(404, {"error": "unknown endpoint {}".format(url.path)})
+
+    def send_json(self, status: int, content: Any):
+        body = json.dumps(content).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        #  Requests are too frequent to log
+        pass
+
+
+def make_server(service: AggregationService, host: str = "127.0.0.1",
+                port: int = 8080) -> ThreadingHTTPServer:
+    """Create an HTTP server answering from a service. Port 0 picks a free port."""
+
+    handler = type("ServiceRequestHandler", (SummaryRequestHandler,),
+                   {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+@exception_handler
+def main(port: int = 8080,
+         interval: float = 10.0,
+         timeout: int = SESSION_TIMEOUT):
+    """
+    Serve the aggregated page views until interrupted.
+
+    ARGUMENTS
+    ---------
+        port : int
+            Local port to listen on.
+
+        interval : float
+            Seconds between checks of the input folder for new files.
+
+        timeout : int
+            Seconds of inactivity after which a search session is closed.
+
+    RETURNS
+    -------
+        None
+    """
+
+    service = AggregationService(input_folder, output_folder + "state/", timeout)
+    watcher = threading.Thread(target=service.watch, args=(interval,), daemon=True)
+    watcher.start()
+
+    server = make_server(service, port=port)
+    print("Serving page view insights on http://{}:{}/".format(*server.server_address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping.")
+    finally:
+        service.stop()
+        server.server_close()
+        watcher.join()
+
+
+def parse_arguments(argv: List[str] = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+
+    parser = argparse.ArgumentParser(description="Serve page view insights over HTTP.")
+    parser.add_argument("--port", type=int, default=8080,
+                        help="local port to listen on (default: 8080)")
+    parser.add_argument("--interval", type=float, default=10.0,
+                        help="seconds between checks for new input files")
+    parser.add_argument("--timeout", type=int, default=SESSION_TIMEOUT,
+                        help="seconds of inactivity that close a search session")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    input_folder = "../input/raw-data/"
+    output_folder = "../output/"
+
+    args = parse_arguments()
+    main(port=args.port, interval=args.interval, timeout=args.timeout)
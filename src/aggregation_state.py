@@ -0,0 +1,110 @@
+"""
+Persisted aggregation state for incremental runs.
+
+The state folder holds the StreamAggregator (per-query counters plus the
+sessions still open at the end of the last file) and a manifest of the
+input files already folded in, so a new run only reads unseen files.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from typing import Callable, Dict, List
+
+from atomic_file import write_atomic
+from stream_aggregator import SESSION_TIMEOUT, StreamAggregator
+
+STATE_FILENAME = "aggregation-state.pickle"
+MANIFEST_FILENAME = "manifest.json"
+
+
+def file_fingerprint(csv_file: str, block_size: int = 2**20) -> Dict[str, object]:
+    """Return the size, modification time and SHA-1 checksum of a file."""
+
+    checksum = hashlib.sha1()
+    with open(csv_file, mode="rb") as data:
+        for block in iter(lambda: data.read(block_size), b""):
+            checksum.update(block)
+
+    stat = os.stat(csv_file)
+    return {"size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "sha1": checksum.hexdigest()}
+
+
+class AggregationState:
+    """
+    Aggregator and manifest of consumed files, loaded from and saved to a
+    state folder.
+
+    ARGUMENTS
+    ---------
+        state_folder : str
+            e.g., "../output/state/"
+        timeout : int
+            Session timeout for a new aggregator. A saved aggregator keeps
+            the timeout it was created with.
+        aggregator_factory : callable
+            Creates a new aggregator from a timeout keyword.
+    """
+
+    def __init__(self, state_folder: str, timeout: int = SESSION_TIMEOUT,
+                 aggregator_factory: Callable[..., StreamAggregator] = StreamAggregator):
+        self.state_folder = state_folder
+        self.aggregator = aggregator_factory(timeout=timeout)
+        self.manifest = {}
+
+    @classmethod
+    def load(cls, state_folder: str,
+             timeout: int = SESSION_TIMEOUT,
+             aggregator_factory: Callable[..., StreamAggregator] = StreamAggregator
+             ) -> "AggregationState":
+        """Load saved state, or start empty if there is none."""
+
+        state = cls(state_folder, timeout, aggregator_factory)
+        state_file = os.path.join(state_folder, STATE_FILENAME)
+        if os.path.isfile(state_file):
+            with open(state_file, mode="rb") as data:
+                state.aggregator, state.manifest = pickle.load(data)
+        return state
+
+    def new_files(self, csv_files: List[str]) -> List[str]:
+        """
+        Return the files that have not been consumed yet. A consumed file
+        whose contents have changed is reported and skipped, as its rows
+        cannot be taken back out of the state.
+        """
+
+        unseen = []
+        for csv_file in csv_files:
+            name = os.path.basename(csv_file)
+            recorded = self.manifest.get(name)
+            if recorded is None:
+                unseen.append(csv_file)
+                continue
+
+            stat = os.stat(csv_file)
+            if (stat.st_size, stat.st_mtime) == (recorded["size"], recorded["mtime"]):
+                continue
+            if file_fingerprint(csv_file)["sha1"] != recorded["sha1"]:
+                print("{} has changed since it was aggregated. "
+                      "Rebuild the state to include the changes.".format(name))
+        return unseen
+
+    def record(self, csv_file: str):
+        """Add a consumed file to the manifest."""
+        self.manifest[os.path.basename(csv_file)] = file_fingerprint(csv_file)
+
+    def save(self):
+        """
+        Write the aggregator and manifest to the state folder. Both are
+        pickled together so they can never disagree; the manifest is also
+        written as json for inspection.
+        """
+
+        os.makedirs(self.state_folder, exist_ok=True)
+        write_atomic(os.path.join(self.state_folder, STATE_FILENAME),
+                     pickle.dumps((self.aggregator, self.manifest)))
+        write_atomic(os.path.join(self.state_folder, MANIFEST_FILENAME),
+                     json.dumps(self.manifest, indent=2, sort_keys=True).encode())
@@ -0,0 +1,187 @@
+"""
+Concurrent ingestion of many input files with asyncio.
+
+Each file flows through three stages joined by bounded queues: a reader
+that pulls line-aligned blocks from the file in a thread, a parser that
+turns blocks into rows, and an aggregator. A full queue suspends the stage
+feeding it, so at most about (2 * max_pending + 3) blocks are held per
+file, and a semaphore limits the number of files in flight.
+
+Only reads run in threads. They release the GIL while waiting on slow or
+network-mounted storage, so they overlap with the parsing and aggregation
+of other blocks and files, which run on the event loop. Parsing in threads
+as well would only contend for the GIL. On a fast local disk there is
+little to overlap, and the single-file readers are faster.
+
+Every file gets its own aggregator, so sessions are cut at file
+boundaries. Each one is merged into the aggregator of the whole folder,
+in file order, as soon as its file and those before it are done, and then
+dropped, so at most one aggregator per file in flight is held.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from retrieve_csv import open_compressed
+from page_view_reader import BLOCK_SIZE, PageViewReader
+from stream_aggregator import SESSION_TIMEOUT, StreamAggregator
+
+#  Files read at once, and blocks queued between each pair of stages
+CONCURRENCY = 4
+MAX_PENDING = 4
+
+
+async def read_stage(csv_file: str, blocks: asyncio.Queue,
+                     executor: ThreadPoolExecutor, block_size: int):
+    """Queue line-aligned blocks of a plain or compressed file, then None."""
+
+    loop = asyncio.get_running_loop()
+    data = await loop.run_in_executor(executor, open_compressed, csv_file)
+    try:
+        remainder = b""
+        while True:
+            chunk = await loop.run_in_executor(executor, data.read, block_size)
+            if not chunk:
+                break
+            chunk = remainder + chunk
+            cut = chunk.rfind(b"\n") + 1
+            remainder = chunk[cut:]
+            if cut:
+                await blocks.put(chunk[:cut])
+        if remainder:
+            await blocks.put(remainder)
+    finally:
+        data.close()
+    await blocks.put(None)
+
+
+async def parse_stage(page_views: PageViewReader, blocks: asyncio.Queue,
+                      batches: asyncio.Queue):
+    """Parse queued blocks into batches of rows, then queue None."""
+
+    while True:
+        block = await blocks.get()
+        if block is None:
+            break
+        await batches.put(page_views.parse_block(block))
+    await batches.put(None)
+
+
+async def aggregate_stage(aggregator: StreamAggregator, batches: asyncio.Queue):
+    """Fold queued batches of rows into an aggregator, then close it."""
+
+    while True:
+        rows = await batches.get()
+        if rows is None:
+            break
+        aggregator.consume(rows, close=False)
+    aggregator.close()
+
+
+async def ingest_file(csv_file: str, aggregator_factory: Callable[[], StreamAggregator],
+                      merged: StreamAggregator,
+                      previous: Optional[Tuple[asyncio.Event, asyncio.Event]],
+                      current: Tuple[asyncio.Event, asyncio.Event],
+                      semaphore: asyncio.Semaphore,
+                      executor: ThreadPoolExecutor,
+                      on_file: Optional[Callable[..., Any]] = None,
+                      max_pending: int = MAX_PENDING,
+                      block_size: int = BLOCK_SIZE) -> PageViewReader:
+    """
+    Run one file through the pipeline into a new aggregator, merge it as
+    soon as the files before it are merged, and return its line counts.
+    The previous and current events are set once a file holds its slot,
+    and once it is merged.
+    """
+
+    #  Take slots in file order, so the earliest file in flight never
+    #  waits for a slot held by a later one
+    if previous is not None:
+        await previous[0].wait()
+    async with semaphore:
+        current[0].set()
+        blocks = asyncio.Queue(maxsize=max_pending)
+        batches = asyncio.Queue(maxsize=max_pending)
+        page_views = PageViewReader(csv_file)
+        aggregator = aggregator_factory()
+        await asyncio.gather(read_stage(csv_file, blocks, executor, block_size),
+                             parse_stage(page_views, blocks, batches),
+                             aggregate_stage(aggregator, batches))
+
+        #  Merge in file order, keeping the slot so that at most
+        #  concurrency aggregators are held at once
+        if previous is not None:
+            await previous[1].wait()
+        if on_file is not None:
+            on_file(csv_file, aggregator, page_views)
+        merged.merge(aggregator)
+        current[1].set()
+        return page_views
+
+
+async def ingest_files(csv_files: List[str],
+                       aggregator_factory: Callable[[], StreamAggregator],
+                       merged: StreamAggregator,
+                       on_file: Optional[Callable[..., Any]] = None,
+                       concurrency: int = CONCURRENCY,
+                       max_pending: int = MAX_PENDING,
+                       block_size: int = BLOCK_SIZE) -> Dict[str, PageViewReader]:
+    """Ingest files concurrently, merging each into one aggregator."""
+
+    semaphore = asyncio.Semaphore(concurrency)
+    events = [(asyncio.Event(), asyncio.Event()) for _ in csv_files]
+
+    #  One thread per file in flight, for its reads
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        readers = await asyncio.gather(*[
+            ingest_file(csv_file, aggregator_factory, merged,
+                        events[i - 1] if i else None, events[i],
+                        semaphore, executor, on_file, max_pending, block_size)
+            for i, csv_file in enumerate(csv_files)])
+    return dict(zip(csv_files, readers))
+
+
+def aggregate_files(csv_files: List[str],
+                    timeout: int = SESSION_TIMEOUT,
+                    aggregator_factory: Callable[..., StreamAggregator] = StreamAggregator,
+                    concurrency: int = CONCURRENCY,
+                    max_pending: int = MAX_PENDING,
+                    block_size: int = BLOCK_SIZE,
+                    on_file: Optional[Callable[..., Any]] = None
+                    ) -> Tuple[Dict[str, PageViewReader], StreamAggregator]:
+    """
+    Aggregate many files concurrently.
+
+    ARGUMENTS
+    ---------
+        csv_files : list
+            Plain or compressed page view files.
+        timeout : int
+            Seconds of inactivity after which a session is closed.
+        aggregator_factory : callable
+            Creates an aggregator from a timeout keyword.
+        concurrency : int
+            Most files read at once.
+        max_pending : int
+            Most blocks queued between each pair of stages, per file.
+        block_size : int
+            Bytes read at a time.
+        on_file : callable
+            Called in file order with each file, its closed aggregator and
+            its PageViewReader, just before the aggregator is merged and
+            dropped, e.g., to write a summary per file.
+
+    RETURNS
+    -------
+        per_file : dict
+            csv file -> PageViewReader holding its line counts
+        merged : StreamAggregator
+            Every file's aggregator merged in file order.
+    """
+
+    merged = aggregator_factory(timeout=timeout)
+    per_file = asyncio.run(ingest_files(
+        csv_files, lambda: aggregator_factory(timeout=timeout), merged,
+        on_file, concurrency, max_pending, block_size))
+    return per_file, merged
@@ -0,0 +1,62 @@
+"""
+Atomic replacement of output files.
+
+New content is written to a temporary file in the destination folder,
+synced to disk and renamed over the destination, and the folder is then
+synced so the rename itself survives a crash. Readers see either the old
+file or the complete new one, never a partial write.
+"""
+
+import os
+from contextlib import contextmanager
+from typing import Iterator
+
+
+def fsync_directory(folder: str):
+    """Sync a folder's entries to disk. Windows cannot open folders, so skip it."""
+
+    if os.name == "nt":
+        return
+    descriptor = os.open(folder or ".", os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+@contextmanager
+def atomic_output(path: str) -> Iterator[str]:
+    """
+    Yield a temporary path to write the new content of a file to. It keeps
+    the file's suffix, so compression by suffix still applies. Once the
+    block finishes, the temporary file replaces the file; if it raises,
+    the temporary file is removed and the file is left as it was.
+
+        with atomic_output("summary.bin") as temp_path:
+            with open(temp_path, mode="wb") as output_data:
+                output_data.write(content)
+    """
+
+    folder, name = os.path.split(path)
+    temp_path = os.path.join(folder, ".tmp-{}-{}".format(os.getpid(), name))
+    try:
+        yield temp_path
+
+        #  Compressed and Parquet writers only finish the file when they
+        #  close it, so sync it after the block rather than inside it
+        with open(temp_path, mode="ab") as written:
+            os.fsync(written.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    fsync_directory(folder)
+
+
+def write_atomic(path: str, content: bytes):
+    """Write a whole file at once through atomic_output."""
+
+    with atomic_output(path) as temp_path:
+        with open(temp_path, mode="wb") as output_data:
+            output_data.write(content)
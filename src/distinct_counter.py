@@ -0,0 +1,119 @@
+"""
+Distinct counting of client ids.
+
+Exact counts use a plain set. HyperLogLog estimates the number of distinct
+items in a few kilobytes, however many there are, and counters built on
+separate shards or runs can be merged. Both support add, |= and len, so
+either can be used wherever a set of client ids is kept.
+"""
+
+import hashlib
+import math
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Any
+
+#  Default number of index bits; 2**12 registers, about 1.6% standard error
+HLL_PRECISION = 12
+
+
+def hash64(item: Any) -> int:
+    """Hash an item to 64 bits, the same way in every process."""
+
+    digest = hashlib.blake2b(str(item).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter.
+
+    Small counters keep the exact item hashes in a sorted array of 8-byte
+    integers, searched with bisect, which has no estimation error. Once
+    the array takes as many bytes as the registers would, it is folded
+    into them.
+
+    ARGUMENTS
+    ---------
+        precision : int
+            Number of hash bits that select a register, between 4 and 18.
+            Memory is 2**precision bytes, and the standard error is about
+            1.04 / sqrt(2**precision).
+    """
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        if not 4 <= precision <= 18:
+            raise ValueError("HyperLogLog precision must be between 4 and 18.")
+        self.precision = precision
+        self.num_registers = 1 << precision
+        self.registers = None
+        self._hashes = array("Q")
+
+    def __repr__(self) -> str:
+        return "HyperLogLog(precision={}, count={})".format(self.precision, len(self))
+
+    @property
+    def standard_error(self) -> float:
+        return 1.04 / math.sqrt(self.num_registers)
+
+    def add(self, item: Any):
+        self._add_hash(hash64(item))
+
+    def _add_hash(self, hashed: int):
+        if self.registers is None:
+            hashes = self._hashes
+            i = bisect_left(hashes, hashed)
+            if i == len(hashes) or hashes[i] != hashed:
+                hashes.insert(i, hashed)
+                if sys.getsizeof(hashes) >= self.num_registers:
+                    self._densify()
+            return
+
+        #  The top bits pick a register, which keeps the longest run of
+        #  leading zeros seen in the remaining bits
+        width = 64 - self.precision
+        index = hashed >> width
+        rank = width - (hashed & ((1 << width) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def _densify(self):
+        hashes, self._hashes = self._hashes, array("Q")
+        self.registers = bytearray(self.num_registers)
+        for hashed in hashes:
+            self._add_hash(hashed)
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Fold in a counter with the same precision."""
+
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog counters of precision "
+                             "{} and {}.".format(self.precision, other.precision))
+
+        if other.registers is None:
+            for hashed in other._hashes:
+                self._add_hash(hashed)
+            return self
+
+        if self.registers is None:
+            self._densify()
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def __ior__(self, other: "HyperLogLog") -> "HyperLogLog":
+        return self.merge(other)
+
+    def __len__(self) -> int:
+        if self.registers is None:
+            return len(self._hashes)
+
+        m = self.num_registers
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -rank for rank in self.registers)
+
+        #  Small cardinalities are better estimated from the empty registers
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
@@ -0,0 +1,140 @@
+"""
+External merge sort of page view rows that may not fit into memory.
+
+Rows are gathered until their estimated size reaches the memory budget,
+sorted in memory and spilled as a csv run to a temporary folder. Once the
+input ends, the runs are merged with heapq.merge as the sorted rows are
+read, so only one row per run is held at a time. If there are more runs
+than max_open_runs, groups of them are first merged into longer runs.
+Input that fits within the budget is sorted in memory and never spilled.
+
+sort_by_client orders rows by client id and timestamp, so the streaming
+aggregator sees each client's sessions in order on unsorted input.
+"""
+
+import csv
+import heapq
+import os
+import sys
+import tempfile
+from typing import Any, Callable, Iterable, Iterator, List
+
+
+def estimate_row_size(row: List[str]) -> int:
+    """Approximate the memory held by a row of strings, in bytes."""
+    return sys.getsizeof(row) + sum(sys.getsizeof(field) for field in row)
+
+
+def write_run(rows: List[List[str]], temp_folder: str, run_id: int) -> str:
+    """Write a sorted run to a temporary csv file and return its path."""
+
+    run_file = os.path.join(temp_folder, "run-{}.csv".format(run_id))
+    with open(run_file, mode="w", encoding="utf-8", newline="") as output_data:
+        csv.writer(output_data).writerows(rows)
+    return run_file
+
+
+def read_run(run_file: str) -> Iterator[List[str]]:
+    with open(run_file, mode="r", encoding="utf-8", newline="") as data:
+        yield from csv.reader(data)
+
+
+def merge_runs(run_files: List[str],
+               key: Callable[[List[str]], Any],
+               run_folder: str,
+               max_open_runs: int) -> List[str]:
+    """Merge runs in groups until at most max_open_runs remain."""
+
+    while len(run_files) > max_open_runs:
+        merged = []
+        for i in range(0, len(run_files), max_open_runs):
+            group = run_files[i:i + max_open_runs]
+            rows = heapq.merge(*[read_run(run_file) for run_file in group],
+                               key=key)
+            merged_file = os.path.join(run_folder, "merged-{}.csv".format(
+                os.path.basename(group[0])[:-4]))
+            with open(merged_file, mode="w", encoding="utf-8",
+                      newline="") as output_data:
+                csv.writer(output_data).writerows(rows)
+            for run_file in group:
+                os.remove(run_file)
+            merged.append(merged_file)
+        run_files = merged
+    return run_files
+
+
+def external_sort(rows: Iterable[List[str]],
+                  key: Callable[[List[str]], Any],
+                  memory_budget: int = 256 * 2**20,
+                  temp_folder: str = None,
+                  max_open_runs: int = 64) -> Iterator[List[str]]:
+    """
+    Sort rows that may not fit into memory. Rows are gathered until the
+    memory budget is reached, sorted and spilled to a temporary csv run,
+    and the runs are then merged with heapq.merge as the result is read.
+
+    ARGUMENTS
+    ---------
+        rows : iterable
+            Rows of strings.
+        key : callable
+            Sort key, which must give the same result for a row read back
+            from a run, i.e., with every field as a string.
+        memory_budget : int
+            Approximate number of bytes of rows to hold at once.
+        temp_folder : str
+            Folder for the runs. Defaults to the system temp folder.
+        max_open_runs : int
+            Most runs to read at once. More runs are merged in passes.
+
+    RETURNS
+    -------
+        sorted_rows : iterator
+            Rows in key order. Runs are removed once fully read.
+    """
+
+    with tempfile.TemporaryDirectory(prefix="page-views-sort-",
+                                     dir=temp_folder) as run_folder:
+        run_files = []
+        buffer = []
+        buffered = 0
+        for row in rows:
+            buffer.append(row)
+            buffered += estimate_row_size(row)
+            if buffered >= memory_budget:
+                buffer.sort(key=key)
+                run_files.append(write_run(buffer, run_folder, len(run_files)))
+                buffer = []
+                buffered = 0
+
+        buffer.sort(key=key)
+
+        #  Everything fit into memory, so nothing needs merging
+        if not run_files:
+            yield from buffer
+            return
+
+        if buffer:
+            run_files.append(write_run(buffer, run_folder, len(run_files)))
+            buffer = []
+
+        run_files = merge_runs(run_files, key, run_folder, max_open_runs)
+        runs = [read_run(run_file) for run_file in run_files]
+        yield from heapq.merge(*runs, key=key)
+
+
+def client_time_key(row: List[str]):
+    """Sort key for rows of [timestamp, path, referrer, cid, position]."""
+    return row[3], int(row[0]), int(row[4])
+
+
+def sort_by_client(rows: Iterable[List[str]],
+                   memory_budget: int = 256 * 2**20,
+                   temp_folder: str = None) -> Iterator[List[str]]:
+    """
+    Sort page view rows by (cid, timestamp), keeping each row's input
+    position as a fifth field so that ties stay in input order.
+    """
+
+    positioned = (row[:4] + [position] for position, row in enumerate(rows))
+    return external_sort(positioned, client_time_key, memory_budget, temp_folder)
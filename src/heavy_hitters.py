@@ -0,0 +1,222 @@
+"""
+Approximate heavy hitters for the top queries.
+
+A Space-Saving summary keeps a fixed number of counters. An item that is
+not counted yet takes over the smallest counter, inheriting its count as
+the item's possible overcount, so every estimate is an upper bound that
+is at most the inherited error above the true count. Any item issued
+more than total / capacity times is guaranteed to hold a counter.
+
+Summaries are mergeable, so partial sketches from worker shards or from
+earlier days can be combined, with the error bounds still holding.
+"""
+
+import heapq
+from typing import Any, Callable, List, Optional, Tuple
+
+from distinct_counter import HyperLogLog
+from stream_aggregator import SESSION_TIMEOUT, SessionAggregator
+
+#  Default number of counters per summary
+SKETCH_SIZE = 1024
+
+
+class SpaceSaving:
+    """
+    Space-Saving summary of weighted item counts in fixed memory.
+
+    ARGUMENTS
+    ---------
+        capacity : int
+            Number of counters kept.
+
+    ATTRIBUTES
+    ----------
+        total : int
+            Sum of every weight added.
+        counters : dict
+            item -> [estimated count, maximum overcount]
+    """
+
+    def __init__(self, capacity: int = SKETCH_SIZE):
+        if capacity < 1:
+            raise ValueError("A summary needs at least one counter.")
+        self.capacity = capacity
+        self.total = 0
+        self.counters = {}
+
+        #  (count, item) entries, some stale, to find the smallest counter
+        self._heap = []
+
+    def __len__(self) -> int:
+        return len(self.counters)
+
+    def __getstate__(self):
+        return self.capacity, self.total, self.counters
+
+    def __setstate__(self, state):
+        self.capacity, self.total, self.counters = state
+        self._rebuild()
+
+    def _rebuild(self):
+        self._heap = [(counter[0], item) for item, counter in self.counters.items()]
+        heapq.heapify(self._heap)
+
+    def _clean(self):
+        """Drop stale entries from the top of the heap."""
+
+        heap = self._heap
+        while heap:
+            count, item = heap[0]
+            counter = self.counters.get(item)
+            if counter is not None and counter[0] == count:
+                return
+            heapq.heappop(heap)
+
+    @property
+    def min_count(self) -> int:
+        """Upper bound on the count of any item without a counter."""
+
+        if len(self.counters) < self.capacity:
+            return 0
+        self._clean()
+        return self._heap[0][0]
+
+    def update(self, item: Any, weight: int = 1):
+        """Add weight to an item's count."""
+
+        if weight <= 0:
+            return
+        self.total += weight
+
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += weight
+        elif len(self.counters) < self.capacity:
+            counter = self.counters[item] = [weight, 0]
+        else:
+            #  Replace the smallest counter, inheriting its count as error
+            self._clean()
+            minimum, evicted = heapq.heappop(self._heap)
+            del self.counters[evicted]
+            counter = self.counters[item] = [minimum + weight, minimum]
+
+        heapq.heappush(self._heap, (counter[0], item))
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild()
+
+    def estimate(self, item: Any) -> Tuple[int, int]:
+        """Return the (estimated count, maximum overcount) of an item."""
+
+        counter = self.counters.get(item)
+        if counter is None:
+            return self.min_count, self.min_count
+        return counter[0], counter[1]
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        """
+        Fold in another summary. An item missing from one summary is
+        credited with that summary's smallest count, both as count and as
+        error, and only the largest counters are kept.
+        """
+
+        own_min, other_min = self.min_count, other.min_count
+        merged = []
+        for item in self.counters.keys() | other.counters.keys():
+            own = self.counters.get(item, (own_min, own_min))
+            theirs = other.counters.get(item, (other_min, other_min))
+            merged.append((own[0] + theirs[0], own[1] + theirs[1], item))
+
+        kept = heapq.nlargest(self.capacity, merged,
+                              key=lambda counter: counter[0])
+        self.counters = {item: [count, error] for count, error, item in kept}
+        self.total += other.total
+        self._rebuild()
+        return self
+
+    def top(self, num_results: int) -> List[Tuple[Any, int, int]]:
+        """
+        Return the top N (item, estimated count, maximum overcount)
+        entries, in descending order of count.
+        """
+
+        best = heapq.nlargest(num_results, self.counters.items(),
+                              key=lambda entry: (entry[1][0], -entry[1][1]))
+        return [(item, counter[0], counter[1]) for item, counter in best]
+
+    @property
+    def error_bound(self) -> float:
+        """Largest possible overcount of any estimate, total / capacity."""
+        return self.total / self.capacity
+
+
+class SketchAggregator(SessionAggregator):
+    """
+    Session aggregator that counts queries and results clicked per query
+    with Space-Saving summaries instead of exact per-query accumulators,
+    so it keeps no row per query and has no summary table.
+
+    Sessions are built exactly as in StreamAggregator. The total session
+    time and clicks over all queries are kept exactly, so the average
+    session length is not approximate. Apart from the sessions still open,
+    memory is fixed by the capacity and the distinct counter.
+
+    ARGUMENTS
+    ---------
+        normalize : callable
+            Extracts the query search term from a search path.
+        timeout : int
+            Seconds of inactivity after which a session is closed.
+        capacity : int
+            Number of counters in each summary.
+        distinct : callable
+            Creates the distinct counter of client ids. Defaults to a
+            HyperLogLog, whose size is fixed by its precision.
+    """
+
+    def __init__(self, normalize: Optional[Callable[[str], str]] = None,
+                 timeout: int = SESSION_TIMEOUT,
+                 capacity: int = SKETCH_SIZE,
+                 distinct: Callable[[], Any] = HyperLogLog):
+        super().__init__(normalize, timeout, distinct)
+        self.query_counts = SpaceSaving(capacity)
+        self.click_counts = SpaceSaving(capacity)
+        self.sessions = 0
+        self.total_time = 0
+        self.total_clicks = 0
+
+    def _count_query(self, keyword: Any):
+        self.query_counts.update(keyword)
+
+    def _credit_session(self, keyword: Any, cid: Any, position: int,
+                        clicks: int, total_time: int):
+        self.click_counts.update(keyword, clicks)
+        self.sessions += 1
+        self.total_time += total_time
+        self.total_clicks += clicks
+
+    def merge(self, other: "SketchAggregator") -> "SketchAggregator":
+        """Fold in a partial sketch aggregator, see SessionAggregator.merge."""
+
+        super().merge(other)
+        self.query_counts.merge(other.query_counts)
+        self.click_counts.merge(other.click_counts)
+        self.sessions += other.sessions
+        self.total_time += other.total_time
+        self.total_clicks += other.total_clicks
+        return self
+
+    def heavy_hitters(self, num_results: int) -> List[List[Any]]:
+        """
+        Close open sessions and return rows of
+        [ranking, query, estimated count, maximum overcount] for the top N
+        queries by number issued and by results clicked.
+        """
+
+        self.close()
+        rows = []
+        for ranking, counts in [("num queries", self.query_counts),
+                                ("results clicked", self.click_counts)]:
+            rows.extend([ranking, term, count, error]
+                        for term, count, error in counts.top(num_results))
+        return rows
@@ -0,0 +1,280 @@
+"""
+Per-stage instrumentation and opt-in profiling of the pipeline.
+
+Decorate a stage with instrument() to record, for every call, its wall
+time, CPU time, rows handled and rows per second. A CPU time close to the
+wall time means the stage was busy computing; a much smaller one means it
+was waiting, e.g., on I/O. While tracemalloc is tracing, the peak memory
+allocated during the stage is recorded too. Recording costs two clock
+reads per call, so stages are always instrumented.
+
+The records can be written as JSON lines or as a Prometheus text file,
+and profiled() wraps a run with cProfile, a sampling profiler or
+tracemalloc.
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+#  Most records kept; older ones are dropped, so a long-lived process
+#  does not grow without limit. STAGE_METRICS.clear() starts afresh.
+MAX_STAGE_METRICS = 10000
+
+#  Records of finished stage calls, in order of completion
+STAGE_METRICS = deque(maxlen=MAX_STAGE_METRICS)
+
+#  Peak memory of the stages running, innermost last
+_peaks = []
+
+PROFILE_MODES = ["cprofile", "sample", "memory"]
+
+
+def instrument(stage: Optional[str] = None,
+               rows: Optional[Callable[[Any], int]] = None):
+    """
+    Record the cost of each call of the decorated function.
+
+    ARGUMENTS
+    ---------
+        stage : str
+            Name of the stage. Defaults to the function name.
+        rows : callable
+            Returns the number of rows handled from the function's result.
+    """
+
+    def decorator(function):
+        name = stage or function.__name__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            tracing = tracemalloc.is_tracing()
+            if tracing:
+                _start_peak()
+            start_wall = time.perf_counter()
+            start_cpu = time.process_time()
+            try:
+                result = function(*args, **kwargs)
+            finally:
+                record = {"stage": name,
+                          "wall seconds": time.perf_counter() - start_wall,
+                          "cpu seconds": time.process_time() - start_cpu}
+                if tracing:
+                    record["peak memory bytes"] = _end_peak()
+                STAGE_METRICS.append(record)
+
+            if rows is not None:
+                record["rows"] = rows(result)
+                if record["wall seconds"] > 0:
+                    record["rows per second"] = record["rows"] / record["wall seconds"]
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def _start_peak():
+    #  Fold the peak so far into the enclosing stage before resetting it
+    if _peaks:
+        _peaks[-1] = max(_peaks[-1], tracemalloc.get_traced_memory()[1])
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    _peaks.append(0)
+
+
+def _end_peak() -> int:
+    peak = max(_peaks.pop(), tracemalloc.get_traced_memory()[1])
+    if _peaks:
+        _peaks[-1] = max(_peaks[-1], peak)
+    return peak
+
+
+def format_prometheus(records: List[Dict[str, Any]],
+                      prefix: str = "page_views_stage") -> str:
+    """
+    Format stage records as Prometheus text. Calls of the same stage are
+    summed into counters named with a _total suffix, except peak memory,
+    a gauge holding the largest of the calls.
+    """
+
+    metrics = [("wall seconds", "Wall time spent in the stage."),
+               ("cpu seconds", "CPU time spent in the stage."),
+               ("rows", "Rows handled by the stage."),
+               ("peak memory bytes", "Largest memory traced during the stage.")]
+
+    totals = {}
+    for record in records:
+        total = totals.setdefault(record["stage"], {"calls": 0})
+        total["calls"] += 1
+        for key, _ in metrics:
+            if key not in record:
+                continue
+            if key == "peak memory bytes":
+                total[key] = max(total.get(key, 0), record[key])
+            else:
+                total[key] = total.get(key, 0) + record[key]
+
+    lines = []
+    for key, description in [("calls", "Calls of the stage.")] + metrics:
+        metric = "{}_{}".format(prefix, key.replace(" ", "_"))
+        metric_type = "gauge" if key == "peak memory bytes" else "counter"
+        if metric_type == "counter":
+            metric += "_total"
+        values = [(stage, total[key]) for stage, total in totals.items()
+                  if key in total]
+        if not values:
+            continue
+        lines.append("# HELP {} {}".format(metric, description))
+        lines.append("# TYPE {} {}".format(metric, metric_type))
+        lines.extend('{}{{stage="{}"}} {}'.format(metric, stage, value)
+                     for stage, value in values)
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(metrics_file: str, records: Optional[List[Dict[str, Any]]] = None):
+    """
+    Write stage records to a file: Prometheus text if it ends in .prom,
+    and otherwise one JSON object per line.
+    """
+
+    if records is None:
+        records = STAGE_METRICS
+    folder = os.path.dirname(metrics_file)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    with open(metrics_file, mode="w") as output_data:
+        if metrics_file.endswith(".prom"):
+            output_data.write(format_prometheus(records))
+        else:
+            for record in records:
+                output_data.write(json.dumps(record) + "\n")
+    print("Stage metrics written to {}".format(metrics_file))
+
+
+def report_metrics(records: Optional[List[Dict[str, Any]]] = None):
+    """Print a table of the stage records."""
+
+    if records is None:
+        records = STAGE_METRICS
+    print("{:<28}{:>10}{:>10}{:>8}{:>14}{:>12}".format(
+        "stage", "wall s", "cpu s", "cpu %", "rows/s", "peak MB"))
+    for record in records:
+        wall = record["wall seconds"]
+        print("{:<28}{:>10.3f}{:>10.3f}{:>8.0%}{:>14}{:>12}".format(
+            record["stage"], wall, record["cpu seconds"],
+            record["cpu seconds"] / wall if wall else 0,
+            "{:,.0f}".format(record["rows per second"])
+            if "rows per second" in record else "",
+            "{:.1f}".format(record["peak memory bytes"] / 2**20)
+            if "peak memory bytes" in record else ""))
+
+
+class StackSampler:
+    """
+    Sampling profiler. A background thread records the call stack of one
+    thread at a fixed interval, and the counts are written as collapsed
+    stacks, the input of flame graph tools such as speedscope.
+
+    ARGUMENTS
+    ---------
+        interval : float
+            Seconds between samples.
+        thread_id : int
+            Thread to sample. Defaults to the calling thread.
+    """
+
+    def __init__(self, interval: float = 0.005, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _sample(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append("{}:{}".format(os.path.basename(code.co_filename),
+                                            code.co_name))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, output_file: str):
+        with open(output_file, mode="w") as output_data:
+            for stack, count in self.stacks.most_common():
+                output_data.write("{} {}\n".format(stack, count))
+
+
+@contextmanager
+def profiled(modes: Optional[List[str]], profile_folder: str,
+             name: str = "profile") -> Iterator[None]:
+    """
+    Run the enclosed code under the chosen profilers, writing their output
+    to the profile folder, and print the stage metrics afterwards.
+
+    ARGUMENTS
+    ---------
+        modes : list
+            Any of "cprofile" (deterministic, with a report of the most
+            expensive functions), "sample" (a low-overhead sampling
+            profiler) and "memory" (tracemalloc peaks per stage).
+        profile_folder : str
+            e.g., "../output/profile/"
+        name : str
+            Prefix of the output files.
+    """
+
+    modes = modes or []
+    if not modes:
+        yield
+        return
+
+    os.makedirs(profile_folder, exist_ok=True)
+    prefix = os.path.join(profile_folder, "{}-{}".format(
+        name, time.strftime("%Y%m%d%H%M%S")))
+
+    if "memory" in modes:
+        tracemalloc.start()
+    sampler = StackSampler() if "sample" in modes else None
+    if sampler is not None:
+        sampler.start()
+    profiler = cProfile.Profile() if "cprofile" in modes else None
+    if profiler is not None:
+        profiler.enable()
+
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(prefix + ".prof")
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+            print("cProfile statistics written to {}.prof".format(prefix))
+        if sampler is not None:
+            sampler.stop()
+            sampler.write(prefix + ".stacks")
+            print("Sampled stacks written to {}.stacks".format(prefix))
+        if "memory" in modes:
+            tracemalloc.stop()
+        report_metrics()
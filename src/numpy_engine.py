@@ -0,0 +1,137 @@
+"""
+Vectorized aggregation of columnar page views with NumPy.
+
+NumPy is optional. It is only imported when this engine runs, and the
+pure-Python engines work without it.
+"""
+
+from typing import Any, Dict
+
+from page_view_columns import PageViewColumns
+from stream_aggregator import SESSION_TIMEOUT
+
+#  NumPy, imported by require_numpy
+np = None
+
+
+def require_numpy():
+    """Import NumPy, or raise ImportError saying how to install it."""
+
+    global np
+    if np is not None:
+        return
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("The numpy engine requires NumPy. "
+                          "Install it with `pip install numpy`.") from None
+    np = numpy
+
+
+def aggregate_columns(columns: PageViewColumns,
+                      timeout: int = SESSION_TIMEOUT) -> Dict[str, Dict[str, Any]]:
+    """
+    Aggregate page view columns into the summary table, using sorts and
+    reductions instead of a per-row loop.
+
+    Rows are grouped by client id in input order. Each search row opens a
+    session that runs until the client's next search, or until the client
+    has been inactive for longer than the timeout. The averages are taken
+    from the last session to start, matching the streaming engine on
+    time-ordered input.
+
+    ARGUMENTS
+    ---------
+        columns : PageViewColumns
+        timeout : int
+            Seconds of inactivity after which a session is closed.
+
+    RETURNS
+    -------
+        summary_table : dict
+            Aggregated data keyed by query search term.
+    """
+
+    require_numpy()
+    if len(columns) == 0:
+        return {}
+
+    timestamps = np.frombuffer(columns.timestamps, dtype=np.int64)
+    cid_codes = np.frombuffer(columns.cid_codes, dtype=np.int32).astype(np.int64)
+    path_terms = np.frombuffer(columns.path_terms, dtype=np.int32).astype(np.int64)
+    is_search = np.frombuffer(columns.is_search, dtype=np.int8).astype(bool)
+    row_positions = np.frombuffer(columns.positions, dtype=np.int64)
+
+    num_terms = len(columns.terms)
+    num_queries = np.bincount(path_terms[path_terms >= 0], minlength=num_terms)
+
+    #  Group rows by client, keeping input order within each client
+    order = np.argsort(cid_codes, kind="stable")
+    cids = cid_codes[order]
+    times = timestamps[order]
+    searches = is_search[order]
+
+    #  Segments start at each client's first row and at each search
+    heads = np.r_[True, cids[1:] != cids[:-1]] | searches
+    segment_ids = np.cumsum(heads) - 1
+    starts = np.flatnonzero(heads)
+
+    #  Running latest activity before each row, within its segment
+    offset = times.max() - times.min() + 1
+    shifted = times - times.min() + segment_ids * offset
+    latest = np.maximum.accumulate(shifted)
+    previous = np.r_[shifted[0], latest[:-1]]
+    timed_out = ~heads & (shifted - previous > timeout)
+
+    #  A timeout closes the session, so later clicks are not credited
+    timeouts = np.cumsum(timed_out)
+    closed = (timeouts - np.repeat(timeouts[starts] - timed_out[starts],
+                                   np.diff(np.r_[starts, len(times)]))) > 0
+    credited = ~heads & ~closed
+
+    clicks = np.add.reduceat(credited.astype(np.int64), starts)
+    click_times = np.where(credited, times, np.iinfo(np.int64).min)
+    end_times = np.maximum.reduceat(click_times, starts)
+    total_times = np.where(clicks > 0, end_times - times[starts], 0)
+
+    #  Keep segments opened by a search with a query term
+    terms = path_terms[order[starts]]
+    positions = row_positions[order[starts]]
+    valid = searches[starts] & (terms >= 0)
+    positions, clicks, total_times, terms = (positions[valid], clicks[valid],
+                                             total_times[valid], terms[valid])
+    session_cids = cids[starts][valid]
+    if len(terms) == 0:
+        return {}
+
+    #  Reduce the sessions of each query, latest session last
+    order = np.lexsort((positions, terms))
+    terms = terms[order]
+    clicks = clicks[order]
+    total_times = total_times[order]
+    bounds = np.flatnonzero(np.r_[True, terms[1:] != terms[:-1]])
+    query_terms = terms[bounds]
+    results_clicked = np.add.reduceat(clicks, bounds)
+    total_time = np.add.reduceat(total_times, bounds)
+    last_session = np.r_[bounds[1:], len(terms)] - 1
+    last_clicks = clicks[last_session]
+    last_times = total_times[last_session]
+
+    #  Count distinct clients per query
+    pairs = np.unique(terms * len(columns.cids) + session_cids[order])
+    num_users = np.bincount(pairs // len(columns.cids), minlength=num_terms)
+
+    summary_table = {}
+    for i, term in enumerate(query_terms.tolist()):
+        users = int(num_users[term])
+        clicked = int(last_clicks[i])
+        spent = int(last_times[i])
+        summary_table[columns.terms[term]] = {
+            "num queries": int(num_queries[term]),
+            "total time": int(total_time[i]),
+            "num users": users,
+            "results clicked": int(results_clicked[i]),
+            "av clicks per user": clicked / users,
+            "av time per click": spent / clicked if clicked else 0.0}
+
+    return summary_table
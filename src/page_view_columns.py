@@ -0,0 +1,130 @@
+"""
+Compact columnar storage for page views.
+
+Each column is a typed array rather than a list of strings per row:
+
+    timestamps     array('q')  UNIX timestamp [seconds]
+    cid_codes      array('i')  index into cids
+    path_terms     array('i')  index into terms for search paths, else -1
+    is_search      array('b')  1 if the referrer is empty (an initial search)
+    referrer_terms array('i')  index into terms for the referring search, else -1
+    positions      array('q')  position of the row in the input
+
+Client ids and query search terms are dictionary-encoded, so each distinct
+string is stored once. A row costs 29 bytes instead of a list of four str
+objects.
+"""
+
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional
+
+from query_normalizer import QueryNormalizer
+from stream_aggregator import SESSION_TIMEOUT, StreamAggregator
+
+
+class PageViewColumns:
+    """
+    Columnar container of page views that can be kept resident and
+    aggregated repeatedly.
+
+    ARGUMENTS
+    ---------
+        normalize : callable
+            Extracts the query search term from a search path.
+            Defaults to a new QueryNormalizer.
+    """
+
+    def __init__(self, normalize: Optional[Callable[[str], str]] = None):
+        self.normalize = normalize if normalize is not None else QueryNormalizer()
+
+        self.timestamps = array("q")
+        self.cid_codes = array("i")
+        self.path_terms = array("i")
+        self.is_search = array("b")
+        self.referrer_terms = array("i")
+        self.positions = array("q")
+
+        self.cids = []
+        self.terms = []
+        self._cid_index = {}
+        self._term_index = {}
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[List[str]],
+                  normalize: Optional[Callable[[str], str]] = None
+                  ) -> "PageViewColumns":
+        """
+        Build columns from rows of [timestamp, path, referrer, cid],
+        optionally followed by the row's position in the input.
+        """
+
+        columns = cls(normalize)
+        append = columns.append
+        for row in rows:
+            append(row[0], row[1], row[2], row[3],
+                   int(row[4]) if len(row) > 4 else None)
+        return columns
+
+    def append(self, timestamp: int, path: str, referrer: str, cid: str,
+               position: Optional[int] = None):
+        """
+        Encode and append a single page view. The position defaults to
+        the number of rows appended so far.
+        """
+
+        if position is None:
+            position = len(self.timestamps)
+        self.positions.append(position)
+
+        self.timestamps.append(int(timestamp))
+        self.cid_codes.append(self._encode(cid, self.cids, self._cid_index))
+        self.path_terms.append(self._encode_term(path))
+        self.is_search.append(referrer == "")
+        self.referrer_terms.append(self._encode_term(referrer))
+
+    def _encode_term(self, path: str) -> int:
+        if "search" not in path:
+            return -1
+        return self._encode(self.normalize(path), self.terms, self._term_index)
+
+    @staticmethod
+    def _encode(value: str, values: List[str], index: Dict[str, int]) -> int:
+        code = index.get(value)
+        if code is None:
+            code = len(values)
+            index[value] = code
+            values.append(value)
+        return code
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the column arrays, excluding the dictionaries."""
+
+        return sum(column.itemsize * len(column)
+                   for column in (self.timestamps, self.cid_codes,
+                                  self.path_terms, self.is_search,
+                                  self.referrer_terms, self.positions))
+
+    def aggregate(self, timeout: int = SESSION_TIMEOUT) -> StreamAggregator:
+        """
+        Aggregate the columns into per-query totals, working on the integer
+        codes and decoding only the final keys.
+        """
+
+        aggregator = StreamAggregator(self.normalize, timeout)
+        add_view = aggregator.add_view
+        timestamps = self.timestamps
+        cid_codes = self.cid_codes
+        path_terms = self.path_terms
+        is_search = self.is_search
+        positions = self.positions
+
+        for i in range(len(timestamps)):
+            term = path_terms[i]
+            add_view(timestamps[i], term if term >= 0 else None,
+                     is_search[i], cid_codes[i], positions[i])
+
+        return aggregator.decode(self.terms, self.cids)
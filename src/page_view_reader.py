@@ -0,0 +1,163 @@
+"""
+Fast reader for page view csv files.
+
+Page view logs have four unquoted columns, so most lines can be split on
+commas directly. The file is memory-mapped and read in large line-aligned
+blocks, each decoded once and split into lines. Timestamps are converted
+to integers as rows are read, so later stages never parse them again.
+
+Compressed files (.csv.gz, .csv.zst, .csv.lz4) cannot be mapped, so they
+are decompressed into the same line-aligned blocks in a background thread.
+
+If a block contains a quote character, the rest of the range is read with
+the csv module from the start of that block, since quoted fields may hold
+commas or newlines.
+"""
+
+import csv
+from itertools import chain
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from retrieve_csv import MappedFile, compression_of, read_blocks
+
+#  Bytes read from the file at a time
+BLOCK_SIZE = 2**20
+
+
+class PageViewReader:
+    """
+    Iterate over the rows of a page view csv file one at a time, as
+    [timestamp (int), path, referrer, cid]. Rows that are missing a
+    timestamp, search path, or client id, or whose timestamp is not an
+    integer, are skipped, and the number of lines read and accepted are
+    counted as the file is read.
+
+    ARGUMENTS
+    ---------
+        csv_file : str
+        block_size : int
+            Bytes decoded at a time.
+        byte_ranges : list
+            Line-aligned (start, end) byte ranges to read, e.g., from
+            MappedFile.line_ranges or TimestampIndex.ranges. Defaults to
+            the whole file. Compressed files can only be read whole.
+    """
+
+    def __init__(self, csv_file: str, block_size: int = BLOCK_SIZE,
+                 byte_ranges: Optional[Sequence[Tuple[int, int]]] = None):
+        self.csv_file = csv_file
+        self.block_size = block_size
+        self.byte_ranges = byte_ranges
+        self.rows_read = 0
+        self.accepted = 0
+
+    @property
+    def rejected(self) -> int:
+        return self.rows_read - self.accepted
+
+    def __iter__(self) -> Iterator[List[Union[int, str]]]:
+        if compression_of(self.csv_file) is not None:
+            yield from self._read_compressed()
+            return
+
+        with MappedFile(self.csv_file) as mapped:
+            byte_ranges = self.byte_ranges
+            if byte_ranges is None:
+                byte_ranges = [(0, mapped.size)]
+            for start, end in byte_ranges:
+                yield from self._read_range(mapped, start, end)
+
+    def _read_range(self, mapped: MappedFile, start: int,
+                    end: int) -> Iterator[List[Union[int, str]]]:
+        for offset, block in mapped.blocks(start, end, self.block_size):
+            if mapped.buffer.find(b'"', offset, offset + len(block)) >= 0:
+                yield from self._read_csv(mapped.lines(offset, end))
+                return
+            yield from self._split_lines(str(block, "utf-8"))
+
+    def _read_compressed(self) -> Iterator[List[Union[int, str]]]:
+        if self.byte_ranges is not None:
+            raise ValueError("Byte ranges cannot be read from compressed "
+                             "file {}.".format(self.csv_file))
+
+        blocks = read_blocks(self.csv_file, self.block_size)
+        for block in blocks:
+            if b'"' in block:
+                lines = (line for rest in chain([block], blocks)
+                         for line in rest.decode("utf-8").splitlines(keepends=True))
+                yield from self._read_csv(lines)
+                return
+            yield from self._split_lines(block.decode("utf-8"))
+
+    def parse_block(self, block: bytes) -> List[List[Union[int, str]]]:
+        """
+        Parse a line-aligned block of the file read elsewhere, e.g., by an
+        asynchronous reader, counting its lines with the rest of the file.
+        Quoted fields may not span blocks.
+        """
+
+        text = block.decode("utf-8")
+        if '"' in text:
+            return list(self._read_csv(text.splitlines(keepends=True)))
+        return list(self._split_lines(text))
+
+    def _split_lines(self, text: str) -> Iterator[List[Union[int, str]]]:
+        """Split unquoted lines on commas."""
+
+        if "\r" in text:
+            text = text.replace("\r\n", "\n")
+        lines = text.split("\n")
+
+        #  Count the block up front, as attribute updates per row are slow
+        num_lines = len(lines) - lines.count("")
+        self.rows_read += num_lines
+        self.accepted += num_lines
+
+        for line in lines:
+            if not line:
+                continue
+            try:
+                timestamp, path, referrer, cid = line.split(",")
+                timestamp = int(timestamp)
+            except ValueError:
+                #  Wrong number of columns, or a missing or malformed timestamp
+                row = typed_row(line.split(","))
+                if row is None:
+                    self.accepted -= 1
+                else:
+                    yield row
+                continue
+
+            #  Skip rows with missing data
+            if path == "" or cid == "":
+                self.accepted -= 1
+            else:
+                yield [timestamp, path, referrer, cid]
+
+    def _read_csv(self, lines: Iterable[str]) -> Iterator[List[Union[int, str]]]:
+        """Read decoded lines, with their newlines, with csv.reader."""
+
+        for fields in csv.reader(lines):
+            if not fields:
+                continue
+            self.rows_read += 1
+            row = typed_row(fields)
+            if row is not None:
+                self.accepted += 1
+                yield row
+
+
+def typed_row(fields: List[str]) -> Optional[List[Union[int, str]]]:
+    """
+    Convert the fields of a line into [timestamp (int), path, referrer, cid],
+    or return None if the timestamp, search path, or client id is missing,
+    or the timestamp is not an integer.
+    """
+
+    if len(fields) < 4 or fields[0] == "" or fields[1] == "" or fields[3] == "":
+        return None
+    try:
+        timestamp = int(fields[0])
+    except ValueError:
+        return None
+    return [timestamp, fields[1], fields[2], fields[3]]
@@ -0,0 +1,326 @@
+#!/usr/bin/python3
+"""
+Embedded SQLite store of a day's page views, for ad-hoc SQL without a
+database server.
+
+Page views are bulk-loaded with executemany, BATCH_SIZE rows per
+transaction, in WAL mode. Query terms and client ids are stored once in
+dimension tables and referenced by integer ids. Sessions are built
+exactly as in StreamAggregator while loading, so the precomputed summary
+table matches the csv summary, and the insight questions are answered
+from its indexes:
+
+    queries      query_id, query
+    clients      cid_id, cid
+    page_views   view_id (input position), timestamp, path, referrer,
+                 cid_id, query_id of the search or of the session the
+                 click was credited to
+    sessions     session_id, query_id, cid_id, start_time, clicks,
+                 total_time
+    summary      query_id, query and the summary table columns
+
+The store is rebuilt from scratch on each load, and indexes are created
+after the rows are in, which is faster than updating them row by row.
+
+    python3.8 page_views_db.py page-views.csv
+    python3.8 page_views_db.py --sql "SELECT COUNT(*) FROM sessions"
+"""
+
+#  Standard Python library imports
+import argparse
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+#   Companion scripts
+from exception_handler import exception_handler
+from retrieve_csv import is_parquet, retrive_csv_file
+from page_view_reader import PageViewReader
+from stream_aggregator import SESSION_TIMEOUT, StreamAggregator
+from summary_binary import FIELDS
+
+#  Page views inserted per transaction
+BATCH_SIZE = 100000
+
+SCHEMA = """
+CREATE TABLE queries (
+    query_id INTEGER PRIMARY KEY,
+    query TEXT NOT NULL UNIQUE
+);
+CREATE TABLE clients (
+    cid_id INTEGER PRIMARY KEY,
+    cid TEXT NOT NULL UNIQUE
+);
+CREATE TABLE page_views (
+    view_id INTEGER PRIMARY KEY,
+    timestamp INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    referrer TEXT NOT NULL,
+    cid_id INTEGER NOT NULL REFERENCES clients,
+    query_id INTEGER REFERENCES queries
+);
+CREATE TABLE sessions (
+    session_id INTEGER PRIMARY KEY,
+    query_id INTEGER NOT NULL REFERENCES queries,
+    cid_id INTEGER NOT NULL REFERENCES clients,
+    start_time INTEGER NOT NULL,
+    clicks INTEGER NOT NULL,
+    total_time INTEGER NOT NULL
+);
+CREATE TABLE summary (
+    query_id INTEGER PRIMARY KEY REFERENCES queries,
+    query TEXT NOT NULL,
+    num_queries INTEGER NOT NULL,
+    total_time INTEGER NOT NULL,
+    num_users INTEGER NOT NULL,
+    results_clicked INTEGER NOT NULL,
+    av_clicks_per_user REAL NOT NULL,
+    av_time_per_click REAL NOT NULL
+);
+"""
+
+#  Ranked columns are indexed with the query, which breaks ties
+INDEXES = """
+CREATE INDEX page_views_query ON page_views (query_id);
+CREATE INDEX page_views_cid_time ON page_views (cid_id, timestamp);
+CREATE INDEX sessions_query ON sessions (query_id);
+CREATE INDEX summary_num_queries ON summary (num_queries DESC, query);
+CREATE INDEX summary_results_clicked ON summary (results_clicked DESC, query);
+"""
+
+TABLES = ["summary", "sessions", "page_views", "clients", "queries"]
+
+#  Summary table columns, in the order of FIELDS
+SUMMARY_COLUMNS = [field.replace(" ", "_") for field in FIELDS]
+
+
+def connect(db_file: str, read_only: bool = False) -> sqlite3.Connection:
+    """
+    Open the store. Writers use WAL mode, so readers are not blocked
+    while a load is committing, and only sync at checkpoints.
+    """
+
+    if read_only:
+        return sqlite3.connect("file:{}?mode=ro".format(db_file), uri=True)
+    connection = sqlite3.connect(db_file)
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    return connection
+
+
+class Dimension:
+    """
+    Integer ids of the values of a dimension table, assigned in order of
+    first appearance. New values are kept until they are inserted.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.new = []
+
+    def id(self, value: Optional[str]) -> Optional[int]:
+        if value is None:
+            return None
+        value_id = self.ids.get(value)
+        if value_id is None:
+            value_id = self.ids[value] = len(self.ids) + 1
+            self.new.append((value_id, value))
+        return value_id
+
+
+class SessionLoader(StreamAggregator):
+    """
+    Stream aggregator that keeps each closed session, and the query of the
+    last row added: its search term, or the term of the session a click
+    was credited to.
+    """
+
+    def __init__(self, timeout: int = SESSION_TIMEOUT):
+        super().__init__(timeout=timeout)
+        self.last_query = None
+
+        #  (query, cid, start time, clicks, total time) not yet inserted
+        self.sessions = []
+
+    def add_view(self, timestamp: int, keyword: Any, is_search: bool,
+                 cid: Any, position: Optional[int] = None):
+        session = self._open.get(cid)
+        clicks = session[3] if session is not None else None
+        super().add_view(timestamp, keyword, is_search, cid, position)
+
+        #  A click was credited if the client's session survived and grew
+        self.last_query = keyword
+        if (not is_search and session is not None
+                and self._open.get(cid) is session and session[3] > clicks):
+            self.last_query = session[0]
+
+    def _close_session(self, cid: Any):
+        keyword, _, start_time, clicks, end_time, _ = self._open[cid]
+        total_time = end_time - start_time if end_time is not None else 0
+        self.sessions.append((keyword, cid, start_time, clicks, total_time))
+        super()._close_session(cid)
+
+
+def load_page_views(db_file: str, csv_file: str,
+                    timeout: int = SESSION_TIMEOUT,
+                    batch_size: int = BATCH_SIZE) -> int:
+    """
+    Rebuild the store from a csv or Parquet page view file, and return the
+    number of page views loaded.
+
+    ARGUMENTS
+    ---------
+        db_file : str
+            e.g., "../output/processed-data/page-views.sqlite"
+        csv_file : str
+        timeout : int
+            Seconds of inactivity after which a session is closed.
+        batch_size : int
+            Page views inserted per transaction.
+    """
+
+    if is_parquet(csv_file):
+        from page_views_parquet import ParquetPageViewReader
+        page_views = ParquetPageViewReader(csv_file)
+    else:
+        page_views = PageViewReader(csv_file)
+    loader = SessionLoader(timeout)
+    queries, clients = Dimension(), Dimension()
+    views = []
+
+    connection = connect(db_file)
+    try:
+        with connection:
+            for table in TABLES:
+                connection.execute("DROP TABLE IF EXISTS {}".format(table))
+            connection.executescript(SCHEMA)
+
+        def insert_batch():
+            sessions = [(queries.id(keyword), clients.id(cid), start_time,
+                         clicks, total_time)
+                        for keyword, cid, start_time, clicks, total_time
+                        in loader.sessions]
+            with connection:
+                connection.executemany("INSERT INTO queries VALUES (?, ?)",
+                                       queries.new)
+                connection.executemany("INSERT INTO clients VALUES (?, ?)",
+                                       clients.new)
+                connection.executemany(
+                    "INSERT INTO page_views VALUES (?, ?, ?, ?, ?, ?)", views)
+                connection.executemany(
+                    "INSERT INTO sessions (query_id, cid_id, start_time, clicks, "
+                    "total_time) VALUES (?, ?, ?, ?, ?)", sessions)
+            queries.new.clear()
+            clients.new.clear()
+            loader.sessions.clear()
+            views.clear()
+
+        add = loader.add
+        for row in page_views:
+            add(row[0], row[1], row[2], row[3])
+            views.append((loader.rows, row[0], row[1], row[2],
+                          clients.id(row[3]), queries.id(loader.last_query)))
+            if len(views) >= batch_size:
+                insert_batch()
+        loader.close()
+        insert_batch()
+
+        summary = loader.summary_table()
+        with connection:
+            connection.executemany(
+                "INSERT INTO summary VALUES (?, ?, {})".format(
+                    ", ".join("?" * len(FIELDS))),
+                ([queries.ids[term], term] + [values[field] for field in FIELDS]
+                 for term, values in summary.items()))
+            connection.executescript(INDEXES)
+            connection.execute("ANALYZE")
+    finally:
+        connection.close()
+    return loader.rows
+
+
+def top_queries(connection: sqlite3.Connection, column: str,
+                num_results: int) -> List[Tuple[str, int]]:
+    """
+    Return the top (query, value) pairs of a summary column, e.g.,
+    "num_queries", in descending order, with ties broken by query.
+    """
+
+    if column not in SUMMARY_COLUMNS:
+        raise ValueError("Unknown summary column: {}".format(column))
+    return connection.execute(
+        "SELECT query, {0} FROM summary ORDER BY {0} DESC, query LIMIT ?".format(column),
+        (num_results,)).fetchall()
+
+
+def average_session_time(connection: sqlite3.Connection) -> float:
+    """Return the seconds spent per result clicked, over every query."""
+
+    total_time, results_clicked = connection.execute(
+        "SELECT SUM(total_time), SUM(results_clicked) FROM summary").fetchone()
+    return total_time / results_clicked
+
+
+def query_summary(connection: sqlite3.Connection,
+                  query: str) -> Optional[Dict[str, Any]]:
+    """Return the summary row of a query, keyed like the summary table, or None."""
+
+    row = connection.execute(
+        "SELECT {} FROM summary WHERE query = ?".format(", ".join(SUMMARY_COLUMNS)),
+        (query,)).fetchone()
+    return dict(zip(FIELDS, row)) if row is not None else None
+
+
+@exception_handler
+def main(input_filename: str = None, sql: str = None):
+    """
+    Load an input file into the store, or run a SQL query against it.
+
+    ARGUMENTS
+    ---------
+        input_filename : str
+            e.g., "page-views.csv". Defaults to the most recent csv file.
+        sql : str
+            Query to run and print the rows of, instead of loading.
+
+    RETURNS
+    -------
+        None
+    """
+
+    if sql is not None:
+        connection = connect(db_file, read_only=True)
+        try:
+            for row in connection.execute(sql):
+                print(row)
+        finally:
+            connection.close()
+        return
+
+    csv_file = retrive_csv_file(filename=input_filename,
+                                input_folder=input_folder)
+    start = time.perf_counter()
+    num_rows = load_page_views(db_file, csv_file)
+    print("Loaded {:,} page views of {} in {:.2f} s: {}".format(
+        num_rows, csv_file, time.perf_counter() - start, db_file))
+
+
+def parse_arguments(argv: List[str] = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+
+    parser = argparse.ArgumentParser(description="Load page views into SQLite.")
+    parser.add_argument("input_filename", nargs="?", default=None,
+                        help='input csv or Parquet file, e.g., "page-views.csv"')
+    parser.add_argument("--sql", default=None,
+                        help="run a query against the store instead of loading")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    input_folder = "../input/raw-data/"
+    output_folder = "../output/processed-data/"
+    db_file = os.path.join(output_folder, "page-views.sqlite")
+
+    args = parse_arguments()
+    main(input_filename=args.input_filename, sql=args.sql)
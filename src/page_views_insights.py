@@ -35,32 +35,23 @@ RETURNS
 """
 
 #  Standard Python library imports
-from typing import List, Dict, Tuple, Any
-from collections import OrderedDict
-from operator import getitem
+from typing import List, Dict, Tuple, Any, Iterable, Iterator
+import argparse
 import csv 
+import heapq
+import os
+import time
+from urllib.parse import urlencode
 
-def pull_aggregated_data(filepath: 
-                         str) -> Tuple[List[str], List[str], List[str]]:
-    agg_data = []
-    total_times = []
-    results_clicked = []
-    with open(filepath, mode='r') as datafile:
-        for row in csv.reader(datafile):
-            agg_data.append(row[:5])
-            total_times.append(float(row[2]))
-            results_clicked.append(float(row[4]))
-    return agg_data, total_times, results_clicked
-
-
-def create_dictionary(dataset: 
-                      List[List[str]])-> Dict[str, Dict[str, int]]:
-    agg_dict = {row[0]: {} for row in dataset}
-    for row in dataset:
-        agg_dict[row[0]]["num queries"] = int(row[1])
-        agg_dict[row[0]]["num results clicked"] = int(row[4])
-    return agg_dict
-
+#   Companion scripts
+from summary_binary import FIELDS, SummaryFile
+from page_views_db import average_session_time, connect, top_queries
+from retrieve_csv import is_parquet, open_text
+from partition_page_views import TimeRangeReader, parse_time
+from stream_aggregator import StreamAggregator
+from retrieve_csv import retrive_csv_file
+from query_index import QueryIndex, index_filename
+from query_normalizer import QueryNormalizer
 
 def calculate_average_time(total_times: List[float], 
                            num_clicks: List[float]):
@@ -69,52 +60,312 @@ def calculate_average_time(total_times: List[float],
     average_time_per_query = sum_time / sum_clicks
     return average_time_per_query
 
+
+class _Descending:
+    """Wrap a term so that it compares in reverse, for heap tie-breaking."""
+
+    __slots__ = ("term",)
+
+    def __init__(self, term: str):
+        self.term = term
+
+    def __lt__(self, other: "_Descending") -> bool:
+        return other.term < self.term
+
+    def __eq__(self, other: "_Descending") -> bool:
+        return self.term == other.term
+
+
+class TopK:
+    """
+    Keep the top N (term, value) pairs of a stream in a bounded min-heap,
+    using O(N) memory. Ties are broken by term, in ascending order.
+
+    ARGUMENTS
+    ---------
+        num_results : int
+        reverse : bool
+            Keep the largest values if True, the smallest if False.
+    """
+
+    def __init__(self, num_results: int, reverse: bool = True):
+        self.num_results = num_results
+        self.sign = 1 if reverse else -1
+        self._heap = []
+
+    def push(self, term: str, value: Any):
+        #  The heap root is the worst entry kept so far
+        entry = (self.sign * value, _Descending(term), value)
+        if len(self._heap) < self.num_results:
+            heapq.heappush(self._heap, entry)
+        elif self._heap and self._heap[0] < entry:
+            heapq.heapreplace(self._heap, entry)
+
+    def results(self) -> List[Tuple[str, Any]]:
+        """Return the kept pairs, best first."""
+
+        best = sorted(self._heap, reverse=True)
+        return [(entry[1].term, entry[2]) for entry in best]
+
+
+def find_top_rankings(rows: Iterable[Tuple[str, Dict[str, Any]]],
+                      num_results: int,
+                      result_keys: List[str],
+                      reverse: bool = True) -> Dict[str, List[Tuple[str, Any]]]:
+    """
+    Rank (term, values) rows by several keys in a single pass, and return
+    the top N results for each key in descending order.
+    """
+
+    rankings = {key: TopK(num_results, reverse) for key in result_keys}
+    for term, values in rows:
+        for key, ranking in rankings.items():
+            ranking.push(term, values[key])
+    return {key: ranking.results() for key, ranking in rankings.items()}
+
+
 def find_top_results(dictionary: Dict[str, Dict[str, Any]],
                                      num_results: int,
                                      result_key: str,
                                      reverse: bool = True) -> List[Tuple[str, int]]:
-    """Create an ordered dictionary sorted by a user-defined key
-    and return the top N results in descending order."""
+    """Return the top N results of a dictionary by a user-defined key,
+    in descending order."""
+
+    return find_top_rankings(dictionary.items(), num_results, [result_key],
+                             reverse)[result_key]
+
+
+def stream_aggregated_data(filepath: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield (term, values) for each row of the aggregated csv, one at a time."""
+
+    with open_text(filepath) as datafile:
+        for row in csv.reader(datafile):
+            yield row[0], {"num queries": int(row[1]),
+                           "total time": float(row[2]),
+                           "num results clicked": int(row[4])}
 
-    most_freq_queries = []
-    result = OrderedDict(sorted(dictionary.items(),
-                                key = lambda x: getitem(x[1], result_key),
-                                reverse=reverse))
-    top_queries = list(result.keys())[:num_results]
-    for query in top_queries:
-        result_val = result[query][result_key]
-        most_freq_queries.append((query, result_val))
 
-    return most_freq_queries
+def pull_csv_insights(filepath: str) -> Tuple[List[Tuple[str, int]],
+                                              List[Tuple[str, int]],
+                                              float]:
+    """Answer the insight queries in a single pass over the aggregated csv."""
 
-def main(filepath):
+    totals = {"total time": 0.0, "num results clicked": 0.0}
+
+    def accumulate(rows):
+        for term, values in rows:
+            totals["total time"] += values["total time"]
+            totals["num results clicked"] += values["num results clicked"]
+            yield term, values
+
+    rankings = find_top_rankings(accumulate(stream_aggregated_data(filepath)),
+                                 N, ["num results clicked", "num queries"])
+    average_time_per_query = calculate_average_time(
+        [totals["total time"]], [totals["num results clicked"]])
+    return (rankings["num results clicked"], rankings["num queries"],
+            average_time_per_query)
+
+
+def pull_binary_insights(filepath: str) -> Tuple[List[Tuple[str, int]],
+                                                  List[Tuple[str, int]],
+                                                  float]:
+    """Answer the insight queries from a memory-mapped binary summary."""
+
+    results_clicked = 2 + FIELDS.index("results clicked")
+    num_queries = 2 + FIELDS.index("num queries")
+    total_time = 2 + FIELDS.index("total time")
+    totals = {"total time": 0, "results clicked": 0}
+
+    def accumulate(records):
+        #  Records are sorted by term, so their index breaks ties the same way
+        for i, record in enumerate(records):
+            totals["total time"] += record[total_time]
+            totals["results clicked"] += record[results_clicked]
+            yield i, {"results clicked": record[results_clicked],
+                      "num queries": record[num_queries]}
+
+    with SummaryFile(filepath) as summary:
+        rankings = find_top_rankings(accumulate(summary.records()), N,
+                                     ["results clicked", "num queries"])
+        most_freq_queries, top_queries = [
+            [(summary.term(i), value) for i, value in rankings[key]]
+            for key in ["results clicked", "num queries"]]
+    average_time_per_query = calculate_average_time(
+        [totals["total time"]], [totals["results clicked"]])
+    return most_freq_queries, top_queries, average_time_per_query
+
+
+def pull_parquet_insights(filepath: str) -> Tuple[List[Tuple[str, int]],
+                                                   List[Tuple[str, int]],
+                                                   float]:
+    """
+    Answer the insight queries from a Parquet summary, reading only the
+    query, num queries, results clicked and total time columns.
+    """
+
+    from page_views_parquet import read_summary_columns
+
+    columns = ["query", "num queries", "results clicked", "total time"]
+    totals = {"total time": 0, "results clicked": 0}
+
+    def accumulate(batches):
+        for batch in batches:
+            totals["total time"] += sum(batch["total time"])
+            totals["results clicked"] += sum(batch["results clicked"])
+            for term, num_queries, results_clicked in zip(
+                    batch["query"], batch["num queries"], batch["results clicked"]):
+                yield term, {"results clicked": results_clicked,
+                             "num queries": num_queries}
+
+    rankings = find_top_rankings(accumulate(read_summary_columns(filepath, columns)),
+                                 N, ["results clicked", "num queries"])
+    average_time_per_query = calculate_average_time(
+        [totals["total time"]], [totals["results clicked"]])
+    return (rankings["results clicked"], rankings["num queries"],
+            average_time_per_query)
+
+
+def pull_db_insights(db_file: str) -> Tuple[List[Tuple[str, int]],
+                                             List[Tuple[str, int]],
+                                             float]:
+    """
+    Answer the insight queries from the summary table of a SQLite store
+    written by page_views_db.py. The rankings are read from its indexes.
+    """
+
+    connection = connect(db_file, read_only=True)
+    try:
+        most_freq_queries = top_queries(connection, "results_clicked", N)
+        top_queries_issued = top_queries(connection, "num_queries", N)
+        average_time_per_query = average_session_time(connection)
+    finally:
+        connection.close()
+    return most_freq_queries, top_queries_issued, average_time_per_query
+
+
+def pull_range_insights(partition_folder: str, since: int = None,
+                        until: int = None) -> Tuple[List[Tuple[str, int]],
+                                                    List[Tuple[str, int]],
+                                                    float]:
+    """
+    Answer the insight queries for page views with since <= timestamp < until,
+    aggregating only the partitions written by partition_page_views.py that
+    overlap the range.
+    """
+
+    page_views = TimeRangeReader(since=since, until=until,
+                                 partition_folder=partition_folder)
+    summary = StreamAggregator().consume(page_views).summary_table()
+    rankings = find_top_rankings(summary.items(), N,
+                                 ["results clicked", "num queries"])
+    total_time = sum(values["total time"] for values in summary.values())
+    total_clicks = sum(values["results clicked"] for values in summary.values())
+    average_time_per_query = calculate_average_time([total_time], [total_clicks])
+    return (rankings["results clicked"], rankings["num queries"],
+            average_time_per_query)
+
+
+def report_query(query: str, input_filename: str = None):
+    """
+    Report the sessions, clicks and time of a single query, read from the
+    raw page views through the query index, which is built on first use.
+    """
+
+    term = QueryNormalizer().normalize("/search?" + urlencode({"q": query}))
+    csv_file = retrive_csv_file(filename=input_filename, input_folder=input_folder)
+    index_file = os.path.join(index_folder, index_filename(csv_file))
+    with QueryIndex.open(csv_file, index_file) as index:
+        start = time.perf_counter()
+        result = index.lookup(term)
+        elapsed = (time.perf_counter() - start) * 1000
+
+    summary = result["summary"]
+    if summary is None:
+        print("No search sessions for {!r} in {}.".format(term, csv_file))
+    else:
+        print("{!r}: {} queries, {} sessions, {} users, {} results clicked, "
+              "{} seconds in sessions \n".format(
+                  term, summary["num queries"], len(result["sessions"]),
+                  summary["num users"], summary["results clicked"],
+                  summary["total time"]))
+        print("Sessions (client id, start time, results clicked, seconds):")
+        for session in result["sessions"]:
+            print("    {}, {}, {}, {}".format(*session))
+    print("\nLooked up in {:.2f} ms".format(elapsed))
+
+
+def main(filepath, since=None, until=None):
     """Run the pipeline and report insights"""
 
-    agg_data, total_times, results_clicked = pull_aggregated_data(filepath)
-    agg_dict = create_dictionary(agg_data)
+    if since is not None or until is not None:
+        most_freq_queries, top_queries, average_time_per_query = \
+            pull_range_insights(partition_folder, since, until)
+    elif filepath.endswith(".bin"):
+        most_freq_queries, top_queries, average_time_per_query = \
+            pull_binary_insights(filepath)
+    elif is_parquet(filepath):
+        most_freq_queries, top_queries, average_time_per_query = \
+            pull_parquet_insights(filepath)
+    elif filepath.endswith(".sqlite"):
+        most_freq_queries, top_queries, average_time_per_query = \
+            pull_db_insights(filepath)
+    else:
+        most_freq_queries, top_queries, average_time_per_query = \
+            pull_csv_insights(filepath)
 
     print("Reporting insights...\n")
 
     #  Q1: Report top 5 most frequent queries
-    most_freq_queries = find_top_results(agg_dict, N, "num results clicked")
     print("""The top {} most issued queries are: {} \n""".format(N, most_freq_queries))
 
     #  Q2: Report top 5 queries in terms of total number of results clicked
-    top_queries = find_top_results(agg_dict, N, "num queries")  
     print("""The top {} queries in terms of total number of search results clicked: {} \n""".format(N,
             top_queries))
 
     #  Q3: Report average time
-    average_time_per_query = calculate_average_time(total_times, results_clicked)
     print("""The average length of a search session is {:.2f} seconds \n""".format(
     average_time_per_query))
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report page view insights.")
+    parser.add_argument("filename", nargs="?", default=None,
+                        help="summary file in output/processed-data/, e.g., "
+                             '"aggregated-page-views.csv.gz"')
+    parser.add_argument("--binary", action="store_true",
+                        help="read the binary summary instead of the csv")
+    parser.add_argument("--parquet", action="store_true",
+                        help="read the Parquet summary instead of the csv")
+    parser.add_argument("--db", action="store_true",
+                        help="read the SQLite store written by page_views_db.py")
+    parser.add_argument("--since", type=parse_time, default=None,
+                        help="report on page views from this time on, read "
+                             "from input/partitions/, e.g., 2017-05-31T17:00")
+    parser.add_argument("--until", type=parse_time, default=None,
+                        help="report on page views before this time")
+    parser.add_argument("--query", default=None,
+                        help="report the sessions of one query, e.g., "
+                             "geophysics, from the raw page views")
+    args = parser.parse_args()
+
     # Number of results to return
     N = 5
 
     folder = '../output/processed-data/'
+    partition_folder = '../input/partitions/'
+    input_folder = '../input/raw-data/'
+    index_folder = folder
     filename = 'aggregated-page-views.csv'
+    if args.binary:
+        filename = 'aggregated-page-views.bin'
+    if args.parquet:
+        filename = 'aggregated-page-views.parquet'
+    if args.db:
+        filename = 'page-views.sqlite'
+    if args.filename is not None:
+        filename = args.filename
     filepath = folder + filename
     
-    main(filepath)
\ No newline at end of file
+    if args.query is not None:
+        report_query(args.query)
+    else:
+        main(filepath, args.since, args.until)
\ No newline at end of file
@@ -0,0 +1,227 @@
+"""
+Parquet export and import of raw page views and of the aggregated summary.
+
+Parquet files store each column apart, so readers such as pandas, Spark or
+DuckDB load only the columns they need, and the summary needs no csv
+conversion before analysis. Query, path and client id columns are
+dictionary-encoded and counts are typed integers. Rows are written in row
+groups of ROW_GROUP_SIZE as they arrive, so memory stays bounded by one
+group, and the timestamp statistics of each group let readers of a time
+range skip the groups outside it.
+
+pyarrow is optional. It is only imported when Parquet files are read or
+written, and the csv and binary formats work without it. Callers import
+this module only for Parquet paths, so csv runs never load it.
+
+    python page_views_parquet.py page-views.csv
+"""
+
+import argparse
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+from atomic_file import atomic_output
+from page_view_reader import PageViewReader
+from retrieve_csv import is_parquet, retrive_csv_file
+from summary_binary import FIELDS
+
+#  pyarrow modules, imported by require_pyarrow
+pa = None
+pq = None
+
+#  Rows written per row group
+ROW_GROUP_SIZE = 2**16
+
+#  Summary fields stored as integers, the rest are floats
+INTEGER_FIELDS = ["num queries", "total time", "num users", "results clicked"]
+
+#  Raw page view columns, in csv order
+PAGE_VIEW_COLUMNS = ["timestamp", "path", "referrer", "cid"]
+
+
+def require_pyarrow():
+    """Import pyarrow, or raise ImportError saying how to install it."""
+
+    global pa, pq
+    if pa is not None:
+        return
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet files require pyarrow. "
+                          "Install it with `pip install pyarrow`.") from None
+    pa, pq = pyarrow, pyarrow.parquet
+
+
+def summary_schema() -> "pa.Schema":
+    require_pyarrow()
+    return pa.schema([("query", pa.dictionary(pa.int32(), pa.string()))] +
+                     [(field, pa.int64() if field in INTEGER_FIELDS
+                       else pa.float64()) for field in FIELDS])
+
+
+def page_view_schema() -> "pa.Schema":
+    require_pyarrow()
+    text = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([("timestamp", pa.int64()), ("path", text),
+                      ("referrer", text), ("cid", text)])
+
+
+def write_row_groups(rows: Iterable[List[Any]], output_file: str,
+                     schema: "pa.Schema",
+                     row_group_size: int = ROW_GROUP_SIZE) -> int:
+    """
+    Write rows to a Parquet file one row group at a time, through a
+    temporary file so readers never see a partial file, and return the
+    number of rows written.
+    """
+
+    require_pyarrow()
+    num_rows = 0
+    with atomic_output(output_file) as temp_file:
+        with pq.ParquetWriter(temp_file, schema) as writer:
+            columns = [[] for _ in schema.names]
+            for row in rows:
+                for column, value in zip(columns, row):
+                    column.append(value)
+                if len(columns[0]) >= row_group_size:
+                    num_rows += _write_group(writer, columns, schema)
+            if columns[0]:
+                num_rows += _write_group(writer, columns, schema)
+    return num_rows
+
+
+def _write_group(writer: "pq.ParquetWriter", columns: List[List[Any]],
+                 schema: "pa.Schema") -> int:
+    num_rows = len(columns[0])
+    arrays = [pa.array(column, type=field.type)
+              for column, field in zip(columns, schema)]
+    writer.write_table(pa.Table.from_arrays(arrays, schema=schema),
+                       row_group_size=num_rows)
+    for column in columns:
+        column.clear()
+    return num_rows
+
+
+def write_summary_parquet(compiled_dict: Dict[str, Dict[str, Any]],
+                          output_file: str,
+                          row_group_size: int = ROW_GROUP_SIZE):
+    """Write the aggregated dict to a Parquet file, sorted by query."""
+
+    rows = ([term] + [compiled_dict[term][field] for field in FIELDS]
+            for term in sorted(compiled_dict))
+    write_row_groups(rows, output_file, summary_schema(), row_group_size)
+
+
+def write_page_views_parquet(page_views: Iterable[List[Union[int, str]]],
+                             output_file: str,
+                             row_group_size: int = ROW_GROUP_SIZE) -> int:
+    """
+    Write raw page view rows, e.g., from a PageViewReader, to a Parquet
+    file as they are read, and return the number of rows written.
+    """
+
+    return write_row_groups((row[:4] for row in page_views), output_file,
+                            page_view_schema(), row_group_size)
+
+
+def read_summary_columns(filepath: str,
+                         columns: List[str]) -> Iterator[Dict[str, List[Any]]]:
+    """
+    Yield the chosen columns of a Parquet summary a row group at a time,
+    as lists keyed by column name. Other columns are never read.
+    """
+
+    require_pyarrow()
+    summary = pq.ParquetFile(filepath)
+    for batch in summary.iter_batches(columns=columns):
+        yield {name: batch.column(name).to_pylist() for name in columns}
+
+
+class ParquetPageViewReader:
+    """
+    Iterate over the rows of a Parquet page view file as [timestamp (int),
+    path, referrer, cid], counting the rows read and accepted like
+    PageViewReader. Rows missing a timestamp, path or client id are
+    skipped.
+
+    ARGUMENTS
+    ---------
+        parquet_file : str
+        since, until : int
+            Only read rows with since <= timestamp < until. Row groups
+            whose timestamp statistics fall outside the range are skipped
+            without being read.
+    """
+
+    def __init__(self, parquet_file: str, since: Optional[int] = None,
+                 until: Optional[int] = None):
+        require_pyarrow()
+        self.parquet_file = parquet_file
+        self.since = since
+        self.until = until
+        self.rows_read = 0
+        self.accepted = 0
+
+    @property
+    def rejected(self) -> int:
+        return self.rows_read - self.accepted
+
+    def row_groups(self, page_views: "pq.ParquetFile") -> List[int]:
+        """Return the row groups that may hold rows in the time range."""
+
+        metadata = page_views.metadata
+        timestamp = page_views.schema_arrow.get_field_index("timestamp")
+        row_groups = []
+        for i in range(metadata.num_row_groups):
+            statistics = metadata.row_group(i).column(timestamp).statistics
+            if statistics is not None and statistics.has_min_max:
+                if self.since is not None and statistics.max < self.since:
+                    continue
+                if self.until is not None and statistics.min >= self.until:
+                    continue
+            row_groups.append(i)
+        return row_groups
+
+    def __iter__(self) -> Iterator[List[Union[int, str]]]:
+        since, until = self.since, self.until
+        page_views = pq.ParquetFile(self.parquet_file)
+        for batch in page_views.iter_batches(row_groups=self.row_groups(page_views),
+                                             columns=PAGE_VIEW_COLUMNS):
+            columns = [batch.column(name).to_pylist() for name in PAGE_VIEW_COLUMNS]
+            self.rows_read += batch.num_rows
+            for timestamp, path, referrer, cid in zip(*columns):
+                if timestamp is None or not path or not cid:
+                    continue
+                if ((since is not None and timestamp < since)
+                        or (until is not None and timestamp >= until)):
+                    #  Rows outside the range are not counted as read
+                    self.rows_read -= 1
+                    continue
+                self.accepted += 1
+                yield [timestamp, path, referrer or "", cid]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert page views to Parquet.")
+    parser.add_argument("input_filename", nargs="?", default=None,
+                        help='input csv file, e.g., "page-views.csv"')
+    parser.add_argument("--output", default=None,
+                        help="Parquet file to write (default: the input file "
+                             "name ending in .parquet)")
+    parser.add_argument("--row-group-size", type=int, default=ROW_GROUP_SIZE,
+                        help="rows per row group (default: {})".format(ROW_GROUP_SIZE))
+    args = parser.parse_args()
+
+    input_folder = "../input/raw-data/"
+
+    csv_file = retrive_csv_file(filename=args.input_filename,
+                                input_folder=input_folder)
+    output_file = args.output
+    if output_file is None:
+        output_file = csv_file.split(".csv")[0] + ".parquet"
+    page_views = PageViewReader(csv_file)
+    num_rows = write_page_views_parquet(page_views, output_file,
+                                        args.row_group_size)
+    print("{:,} of {:,} rows written to {}".format(num_rows, page_views.rows_read,
+                                                  output_file))
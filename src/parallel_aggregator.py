@@ -0,0 +1,177 @@
+"""
+Aggregate a page view csv file across several processes.
+
+The file is split into byte ranges aligned to line boundaries. In the map
+step each worker memory-maps the file, reads one range and spills its rows
+into one shard file per worker, chosen by client id, so a search and its
+follow-up clicks end up in the same shard. In the reduce step each worker streams one shard
+into a StreamAggregator, and the partial aggregators are merged.
+"""
+
+import csv
+import os
+import tempfile
+import zlib
+from multiprocessing import Pool
+from typing import Callable, List, Optional, Tuple
+
+from stream_aggregator import SESSION_TIMEOUT, StreamAggregator
+from reorder_buffer import ReorderBuffer
+from retrieve_csv import MappedFile
+from page_view_reader import PageViewReader
+
+
+def find_line_ranges(csv_file: str, num_ranges: int) -> List[Tuple[int, int]]:
+    """
+    Split a file into byte ranges that start and end on line boundaries.
+
+    ARGUMENTS
+    ---------
+        csv_file : str
+        num_ranges : int
+            Number of ranges wanted. Fewer are returned for small files.
+
+    RETURNS
+    -------
+        ranges : list
+            (start, end) byte offsets covering the whole file.
+    """
+
+    with MappedFile(csv_file) as mapped:
+        return mapped.line_ranges(num_ranges)
+
+
+def shard_for(cid: str, num_shards: int) -> int:
+    """Return a shard number for a client id that is stable across processes."""
+    return zlib.crc32(cid.encode("utf-8")) % num_shards
+
+
+def split_range(args: Tuple[str, int, int, int, int, str]) -> Tuple[int, int]:
+    """
+    Map step: read one line-aligned slice of the memory-mapped file and
+    write its valid rows to shard files, prefixed with their position.
+    A row's position is its range's start offset plus its index in the
+    range, which orders rows across ranges as every row takes at least
+    one byte.
+
+    RETURNS
+    -------
+        rows_read, accepted : int
+    """
+
+    csv_file, range_id, start, end, num_shards, spill_folder = args
+
+    shards = [open(spill_path(spill_folder, shard, range_id), mode="w",
+                   encoding="utf-8", newline="")
+              for shard in range(num_shards)]
+    writers = [csv.writer(shard) for shard in shards]
+    page_views = PageViewReader(csv_file, byte_ranges=[(start, end)])
+    try:
+        for position, row in enumerate(page_views, start):
+            writers[shard_for(row[3], num_shards)].writerow([position] + row)
+    finally:
+        for shard in shards:
+            shard.close()
+
+    return page_views.rows_read, page_views.accepted
+
+
+def read_shard(shard: int, num_ranges: int, spill_folder: str):
+    """Yield the rows of one shard in input order, removing spill files."""
+
+    for range_id in range(num_ranges):
+        path = spill_path(spill_folder, shard, range_id)
+        with open(path, mode="r", encoding="utf-8", newline="") as data:
+            for row in csv.reader(data):
+                #  Move the byte offset to the end of the row
+                yield row[1:] + row[:1]
+        os.remove(path)
+
+
+def aggregate_shard(args: Tuple[int, int, str, int, Optional[int], Callable]
+                    ) -> Tuple[StreamAggregator, List[List[str]]]:
+    """
+    Reduce step: stream one shard, in input order, into an aggregator.
+
+    RETURNS
+    -------
+        aggregator : StreamAggregator
+        late_rows : list
+            Rows diverted by the reorder buffer, if one is used.
+    """
+
+    shard, num_ranges, spill_folder, timeout, max_lateness, aggregator_factory = args
+    aggregator = aggregator_factory(timeout=timeout)
+    rows = read_shard(shard, num_ranges, spill_folder)
+    late_rows = []
+    if max_lateness is not None:
+        reorder_buffer = ReorderBuffer(max_lateness)
+        rows = reorder_buffer.reorder(rows)
+        late_rows = reorder_buffer.late_rows
+
+    for row in rows:
+        aggregator.add(row[0], row[1], row[2], row[3], position=int(row[4]))
+    aggregator.close()
+
+    return aggregator, [row[:4] for row in late_rows]
+
+
+def spill_path(spill_folder: str, shard: int, range_id: int) -> str:
+    return os.path.join(spill_folder,
+                        "shard-{}-range-{}.csv".format(shard, range_id))
+
+
+def parallel_aggregate(csv_file: str,
+                       workers: int,
+                       timeout: int = SESSION_TIMEOUT,
+                       max_lateness: Optional[int] = None,
+                       aggregator_factory: Callable[..., StreamAggregator] = StreamAggregator
+                       ) -> Tuple[StreamAggregator, int, int, List[List[str]]]:
+    """
+    Aggregate a csv file with a pool of worker processes.
+
+    ARGUMENTS
+    ---------
+        csv_file : str
+        workers : int
+            Number of processes, byte ranges and client id shards.
+        timeout : int
+            Seconds of inactivity after which a session is closed.
+        max_lateness : int
+            If given, reorder each shard by timestamp, allowing rows to
+            arrive this many seconds late.
+        aggregator_factory : callable
+            Creates each partial aggregator from a timeout keyword, e.g.,
+            a StreamAggregator subclass. It must be picklable.
+
+    RETURNS
+    -------
+        aggregator : StreamAggregator
+            Merged result of every shard.
+        rows_read, accepted : int
+        late_rows : list
+            Rows that arrived later than the reorder watermark.
+    """
+
+    ranges = find_line_ranges(csv_file, workers)
+    with tempfile.TemporaryDirectory(prefix="page-views-") as spill_folder, \
+            Pool(processes=workers) as pool:
+
+        counts = pool.map(split_range,
+                          [(csv_file, range_id, start, end, workers, spill_folder)
+                           for range_id, (start, end) in enumerate(ranges)])
+
+        partials = pool.map(aggregate_shard,
+                            [(shard, len(ranges), spill_folder, timeout,
+                              max_lateness, aggregator_factory)
+                             for shard in range(workers)])
+
+    aggregator = aggregator_factory(timeout=timeout)
+    late_rows = []
+    for partial, late in partials:
+        aggregator.merge(partial)
+        late_rows.extend(late)
+
+    rows_read = sum(count[0] for count in counts)
+    accepted = sum(count[1] for count in counts)
+    return aggregator, rows_read, accepted, late_rows
@@ -0,0 +1,401 @@
+#!/usr/bin/python3
+"""
+Split page view csv files into hourly or daily partitions, so that a time
+range can be aggregated by reading only the partitions that overlap it.
+
+Each partition is a plain page view csv file, named after the UTC start
+of its hour or day, e.g., "page-views-2017053117.csv". The partition
+folder holds an index.json describing every partition: its first and
+last timestamp, row count and the codes of the distinct queries searched
+in it. Query codes index the "terms" list of the index. Input files
+already partitioned are listed under "sources" and are skipped.
+
+Each entry also records the size of its partition when the index was
+last saved. Rows appended after that, by a run that stopped before
+saving, are truncated away before the partition is written to again, so
+rerunning an interrupted file does not duplicate its rows.
+
+Sessions are not split, but a time range only includes the rows inside
+it, so a session that crosses the range boundary is cut there.
+
+    python3.8 partition_page_views.py page-views.csv --granularity hour
+"""
+
+#  Standard Python library imports
+import argparse
+import csv
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import IO, Any, Iterator, List, Optional
+
+#   Companion scripts
+from exception_handler import exception_handler
+from retrieve_csv import TimestampIndex, compression_of, retrive_csv_file
+from page_view_reader import PageViewReader
+from query_normalizer import QueryNormalizer
+from atomic_file import write_atomic
+
+#  Seconds in each partition
+GRANULARITIES = {"hour": 3600, "day": 86400}
+INDEX_FILENAME = "index.json"
+
+
+def parse_time(value: str) -> int:
+    """
+    Parse a UNIX timestamp, or an ISO date or time in UTC such as
+    "2017-05-31" or "2017-05-31T17:00".
+    """
+
+    if value.lstrip("-").isdigit():
+        return int(value)
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def partition_name(start: int, granularity: str) -> str:
+    """Name the partition starting at a timestamp, e.g., page-views-20170531.csv."""
+
+    time_format = "%Y%m%d%H" if granularity == "hour" else "%Y%m%d"
+    return "page-views-{}.csv".format(time.strftime(time_format, time.gmtime(start)))
+
+
+class PartitionIndex:
+    """
+    Index of the partitions in a folder.
+
+    ARGUMENTS
+    ---------
+        partition_folder : str
+            e.g., "../input/partitions/"
+        granularity : str
+            "hour" or "day".
+    """
+
+    def __init__(self, partition_folder: str, granularity: str = "hour"):
+        self.partition_folder = partition_folder
+        self.granularity = granularity
+        self.terms = []
+        self.sources = []
+        self.partitions = {}
+        self._codes = {}
+
+        #  Partition name -> codes of queries added since loading
+        self._new_queries = {}
+
+    @classmethod
+    def load(cls, partition_folder: str,
+             granularity: Optional[str] = None) -> "PartitionIndex":
+        """
+        Load the index of a folder, or start an empty one. Partitions of a
+        different granularity than requested cannot be added to.
+        """
+
+        index_file = os.path.join(partition_folder, INDEX_FILENAME)
+        if not os.path.isfile(index_file):
+            return cls(partition_folder, granularity or "hour")
+
+        with open(index_file, mode="r") as data:
+            saved = json.load(data)
+        if granularity is not None and granularity != saved["granularity"]:
+            raise ValueError("{} holds {} partitions, not {} partitions.".format(
+                partition_folder, saved["granularity"], granularity))
+
+        index = cls(partition_folder, saved["granularity"])
+        index.terms = saved["terms"]
+        index.sources = saved["sources"]
+        index.partitions = saved["partitions"]
+        index._codes = {term: code for code, term in enumerate(index.terms)}
+        return index
+
+    def save(self):
+        for name, codes in self._new_queries.items():
+            entry = self.partitions[name]
+            entry["queries"] = sorted(codes.union(entry["queries"]))
+        self._new_queries = {}
+
+        os.makedirs(self.partition_folder, exist_ok=True)
+        content = {"granularity": self.granularity,
+                   "terms": self.terms,
+                   "sources": self.sources,
+                   "partitions": self.partitions}
+        write_atomic(os.path.join(self.partition_folder, INDEX_FILENAME),
+                     json.dumps(content, indent=1, sort_keys=True).encode())
+
+    def code(self, term: str) -> int:
+        """Return the code of a query term, adding it if it is new."""
+
+        code = self._codes.get(term)
+        if code is None:
+            code = self._codes[term] = len(self.terms)
+            self.terms.append(term)
+        return code
+
+    def record(self, name: str, start: int, timestamp: int,
+               query_code: Optional[int] = None):
+        """Add a row written to a partition to its index entry."""
+
+        entry = self.partitions.get(name)
+        if entry is None:
+            entry = self.partitions[name] = {"start": start,
+                                             "first": timestamp,
+                                             "last": timestamp,
+                                             "rows": 0,
+                                             "bytes": 0,
+                                             "queries": []}
+        entry["rows"] += 1
+        if timestamp < entry["first"]:
+            entry["first"] = timestamp
+        if timestamp > entry["last"]:
+            entry["last"] = timestamp
+        if query_code is not None:
+            self._new_queries.setdefault(name, set()).add(query_code)
+
+    def select(self, since: Optional[int] = None, until: Optional[int] = None,
+               query: Optional[str] = None) -> List[str]:
+        """
+        Return the paths of the partitions that may hold rows with
+        since <= timestamp < until, in time order. If a query term is
+        given, only partitions where it was searched are returned.
+        """
+
+        code = self._codes.get(query) if query is not None else None
+        if query is not None and code is None:
+            return []
+
+        selected = []
+        for name, entry in sorted(self.partitions.items(),
+                                  key=lambda item: item[1]["start"]):
+            if since is not None and entry["last"] < since:
+                continue
+            if until is not None and entry["first"] >= until:
+                continue
+            if code is not None and code not in entry["queries"]:
+                continue
+            selected.append(os.path.join(self.partition_folder, name))
+        return selected
+
+
+def partition_file(csv_file: str, index: PartitionIndex,
+                   max_open: int = 64) -> int:
+    """
+    Append the rows of a page view file to the partitions of an index,
+    and return the number of rows written.
+
+    ARGUMENTS
+    ---------
+        csv_file : str
+        index : PartitionIndex
+        max_open : int
+            Most partition files held open at once.
+    """
+
+    seconds = GRANULARITIES[index.granularity]
+    normalize = QueryNormalizer()
+    os.makedirs(index.partition_folder, exist_ok=True)
+
+    #  start -> (file, csv writer), in order of last use
+    open_files = {}
+    written = set()
+    rows_written = 0
+    try:
+        for row in PageViewReader(csv_file):
+            start = row[0] - row[0] % seconds
+            name = partition_name(start, index.granularity)
+            if start in open_files:
+                output_data, writer = open_files.pop(start)
+            else:
+                if len(open_files) >= max_open:
+                    oldest = next(iter(open_files))
+                    close_partition(open_files.pop(oldest)[0])
+                output_data = open_partition(index, name, first=name not in written)
+                writer = csv.writer(output_data, lineterminator="\n")
+                written.add(name)
+            open_files[start] = (output_data, writer)
+
+            writer.writerow(row)
+            query_code = None
+            if "search" in row[1]:
+                query_code = index.code(normalize(row[1]))
+            index.record(name, start, row[0], query_code)
+            rows_written += 1
+    finally:
+        for output_data, _ in open_files.values():
+            close_partition(output_data)
+
+    for name in written:
+        index.partitions[name]["bytes"] = os.path.getsize(
+            os.path.join(index.partition_folder, name))
+    index.sources.append(os.path.basename(csv_file))
+    return rows_written
+
+
+def open_partition(index: PartitionIndex, name: str, first: bool) -> IO[str]:
+    """
+    Open a partition to append rows to. The first time a run opens it,
+    rows past the size recorded in the index are dropped: they were
+    appended by a run that stopped before saving the index.
+    """
+
+    filepath = os.path.join(index.partition_folder, name)
+    entry = index.partitions.get(name)
+    if first and entry is None:
+        return open(filepath, mode="w", encoding="utf-8", newline="")
+    if first and entry.get("bytes") is not None and os.path.isfile(filepath):
+        os.truncate(filepath, entry["bytes"])
+    return open(filepath, mode="a", encoding="utf-8", newline="")
+
+
+def close_partition(output_data: IO[str]):
+    """Flush a partition to disk before its size is recorded in the index."""
+
+    output_data.flush()
+    os.fsync(output_data.fileno())
+    output_data.close()
+
+
+class TimeRangeReader:
+    """
+    Iterate over the page views with since <= timestamp < until. Rows are
+    read from the partitions overlapping the range if the input file is
+    one of the partitioned sources, and otherwise from the blocks of the input file whose
+    timestamps overlap it.
+
+    ARGUMENTS
+    ---------
+        csv_file : str
+            Input file, read if it has not been partitioned. If None,
+            every partitioned source is read.
+        since, until : int
+            Range of timestamps. Either may be None.
+        partition_folder : str
+            e.g., "../input/partitions/"
+
+    ATTRIBUTES
+    ----------
+        rows_read, accepted : int
+            Counts of the lines inside the range.
+        skipped : int
+            Rows read that were outside the range.
+    """
+
+    def __init__(self, csv_file: Optional[str] = None,
+                 since: Optional[int] = None,
+                 until: Optional[int] = None,
+                 partition_folder: Optional[str] = None):
+        self.csv_file = csv_file
+        self.since = since
+        self.until = until
+        self.partition_folder = partition_folder
+        self.readers = []
+        self.skipped = 0
+
+    @property
+    def rows_read(self) -> int:
+        return sum(reader.rows_read for reader in self.readers) - self.skipped
+
+    @property
+    def accepted(self) -> int:
+        return sum(reader.accepted for reader in self.readers) - self.skipped
+
+    @property
+    def rejected(self) -> int:
+        return self.rows_read - self.accepted
+
+    def open_readers(self) -> List[PageViewReader]:
+        """Return a reader for each file, or byte range, to read."""
+
+        if self.partition_folder is not None and os.path.isfile(
+                os.path.join(self.partition_folder, INDEX_FILENAME)):
+            index = PartitionIndex.load(self.partition_folder)
+            if (self.csv_file is None
+                    or os.path.basename(self.csv_file) in index.sources):
+                return [PageViewReader(partition) for partition
+                        in index.select(self.since, self.until)]
+            print("{} has not been partitioned; reading it directly.".format(
+                self.csv_file))
+        if self.csv_file is None:
+            raise FileNotFoundError("No partition index in {}. Run "
+                                    "partition_page_views.py first.".format(
+                                        self.partition_folder))
+
+        if compression_of(self.csv_file) is not None:
+            return [PageViewReader(self.csv_file)]
+        byte_ranges = TimestampIndex.open(self.csv_file).ranges(self.since, self.until)
+        return [PageViewReader(self.csv_file, byte_ranges=byte_ranges)]
+
+    def __iter__(self) -> Iterator[List[Any]]:
+        since, until = self.since, self.until
+        self.readers = self.open_readers()
+        for reader in self.readers:
+            for row in reader:
+                if ((since is not None and row[0] < since)
+                        or (until is not None and row[0] >= until)):
+                    self.skipped += 1
+                    continue
+                yield row
+
+
+@exception_handler
+def main(input_filename: str = None,
+         granularity: str = "hour",
+         max_open: int = 64):
+    """
+    Partition an input file, or every input file not yet partitioned, and
+    update the partition index.
+
+    ARGUMENTS
+    ---------
+        input_filename : str
+            e.g., "page-views.csv". Defaults to the most recent csv file.
+
+        granularity : str
+            "hour" or "day".
+
+        max_open : int
+            Most partition files held open at once.
+
+    RETURNS
+    -------
+        None
+    """
+
+    csv_file = retrive_csv_file(filename=input_filename,
+                                input_folder=input_folder)
+
+    index = PartitionIndex.load(partition_folder, granularity)
+    if os.path.basename(csv_file) in index.sources:
+        print("{} has already been partitioned.".format(csv_file))
+        return
+
+    rows_written = partition_file(csv_file, index, max_open)
+    index.save()
+    print("Wrote {:,} rows to {} {} partitions in {}".format(
+        rows_written, len(index.partitions), index.granularity,
+        partition_folder))
+
+
+def parse_arguments(argv: List[str] = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+
+    parser = argparse.ArgumentParser(description="Partition page view data by time.")
+    parser.add_argument("input_filename", nargs="?", default=None,
+                        help='input csv file, e.g., "page-views.csv"')
+    parser.add_argument("--granularity", choices=sorted(GRANULARITIES),
+                        default="hour", help="partition length (default: hour)")
+    parser.add_argument("--max-open", type=int, default=64,
+                        help="most partition files held open at once")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    input_folder = "../input/raw-data/"
+    partition_folder = "../input/partitions/"
+
+    args = parse_arguments()
+    main(input_filename=args.input_filename,
+         granularity=args.granularity,
+         max_open=args.max_open)
@@ -0,0 +1,326 @@
+#!/usr/bin/python3
+"""
+Secondary index from query search term to the rows of the raw page view
+file that belong to it, for drill-down lookups without rescanning the file.
+
+Each term lists the byte offsets of its search rows and of the click rows
+credited to its sessions, in file order. Sessions are built exactly as in
+StreamAggregator, so a lookup reproduces the term's row of the summary
+table, along with every individual session.
+
+Layout (little-endian):
+
+    header   magic b"PVQIDX01", number of terms (uint64), size and
+             modification time (ns) of the source file, session timeout
+    terms    one 32-byte record per term, sorted by term:
+                 term offset (uint64), term length (uint32), padding,
+                 first entry, number of entries (uint64)
+    entries  one uint64 per row, the row's byte offset shifted left by one,
+             with the low bit set if the row is a click credited to a session
+    strings  utf-8 query terms, referenced by offset into this table
+
+    python3.8 query_index.py page-views.csv
+"""
+
+#  Standard Python library imports
+import argparse
+import csv
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+#   Companion scripts
+from exception_handler import exception_handler
+from retrieve_csv import MappedFile, compression_of, retrive_csv_file
+from page_view_reader import typed_row
+from stream_aggregator import SESSION_TIMEOUT, QueryAccumulator, StreamAggregator
+from query_normalizer import QueryNormalizer
+from atomic_file import write_atomic
+
+MAGIC = b"PVQIDX01"
+HEADER = struct.Struct("<8sQQqq")
+TERM = struct.Struct("<QI4xQQ")
+ENTRY = struct.Struct("<Q")
+
+
+def index_filename(csv_file: str) -> str:
+    """Name the index of an input file, e.g., page-views.qidx."""
+
+    return os.path.basename(csv_file).rsplit(".csv", 1)[0] + ".qidx"
+
+
+def rows_with_offsets(mapped: MappedFile) -> Iterator[Tuple[int, List[Any]]]:
+    """
+    Yield (byte offset, [timestamp (int), path, referrer, cid]) for each
+    valid row of a mapped page view file. Quoted fields are parsed with
+    the csv module, but may not span lines.
+    """
+
+    for offset, view in mapped.blocks():
+        for line in view.tobytes().split(b"\n"):
+            start = offset
+            offset += len(line) + 1
+            text = line.decode("utf-8").rstrip("\r")
+            if not text:
+                continue
+            fields = next(csv.reader([text])) if '"' in text else text.split(",")
+            row = typed_row(fields)
+            if row is not None:
+                yield start, row
+
+
+class SessionIndexer(StreamAggregator):
+    """
+    Stream aggregator that records, for each query, the byte offsets of
+    its search rows and of the clicks credited to its sessions. Rows must
+    be added with their byte offset as position.
+    """
+
+    def __init__(self, timeout: int = SESSION_TIMEOUT):
+        super().__init__(timeout=timeout)
+
+        #  term -> offsets shifted left by one, with the click bit
+        self.entries = {}
+
+    def add_view(self, timestamp: int, keyword: Any, is_search: bool,
+                 cid: Any, position: Optional[int] = None):
+        session = self._open.get(cid)
+        clicks = session[3] if session is not None else None
+        super().add_view(timestamp, keyword, is_search, cid, position)
+
+        #  A click was credited if the client's session survived and grew
+        credited = (not is_search and session is not None
+                    and self._open.get(cid) is session and session[3] > clicks)
+        if credited:
+            self.entries.setdefault(session[0], array("Q")).append(position << 1 | 1)
+        if keyword is not None and not (credited and session[0] == keyword):
+            self.entries.setdefault(keyword, array("Q")).append(position << 1)
+
+    def _credit_session(self, keyword: Any, cid: Any, position: int,
+                        clicks: int, total_time: int):
+        pass
+
+
+def build_query_index(csv_file: str, index_file: str,
+                      timeout: int = SESSION_TIMEOUT) -> int:
+    """
+    Index an uncompressed page view file, and return the number of terms.
+    The index is written atomically, so readers never see a partial one.
+    """
+
+    if compression_of(csv_file) is not None:
+        raise ValueError("Only uncompressed files can be indexed, "
+                         "not {}.".format(csv_file))
+
+    indexer = SessionIndexer(timeout)
+    with MappedFile(csv_file) as mapped:
+        for offset, row in rows_with_offsets(mapped):
+            indexer.add(row[0], row[1], row[2], row[3], offset)
+
+    stat = os.stat(csv_file)
+    terms = sorted(indexer.entries)
+    strings = bytearray()
+    records = bytearray(HEADER.pack(MAGIC, len(terms), stat.st_size,
+                                    stat.st_mtime_ns, timeout))
+    entries = array("Q")
+    for term in terms:
+        encoded = term.encode("utf-8")
+        offsets = indexer.entries[term]
+        records += TERM.pack(len(strings), len(encoded), len(entries), len(offsets))
+        strings += encoded
+        entries.extend(offsets)
+
+    if sys.byteorder == "big":
+        entries.byteswap()
+    write_atomic(index_file, bytes(records) + entries.tobytes() + bytes(strings))
+    return len(terms)
+
+
+class QueryIndex:
+    """
+    Memory-mapped, read-only view of a query index.
+
+    ARGUMENTS
+    ---------
+        index_file : str
+            e.g., "../output/processed-data/page-views.qidx"
+        csv_file : str
+            The indexed input file, read at the recorded offsets.
+    """
+
+    def __init__(self, index_file: str, csv_file: str):
+        self.csv_file = csv_file
+        with open(index_file, mode="rb") as data:
+            self._buffer = mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._buffer) < HEADER.size:
+            raise ValueError("{} is not a query index.".format(index_file))
+        (magic, self.count, self.source_size, self.source_mtime,
+         self.timeout) = HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("{} is not a query index.".format(index_file))
+        self._entries = HEADER.size + self.count * TERM.size
+        self._strings = self._entries
+        if self.count:
+            _, _, first, num_entries = self.record(self.count - 1)
+            self._strings += (first + num_entries) * ENTRY.size
+
+    @classmethod
+    def open(cls, csv_file: str, index_file: str,
+             timeout: int = SESSION_TIMEOUT) -> "QueryIndex":
+        """Open the index of an input file, building it if it is missing or stale."""
+
+        if os.path.isfile(index_file):
+            index = cls(index_file, csv_file)
+            if index.is_current(timeout):
+                return index
+            index.close()
+        build_query_index(csv_file, index_file, timeout)
+        return cls(index_file, csv_file)
+
+    def is_current(self, timeout: int = SESSION_TIMEOUT) -> bool:
+        """Whether the input file and timeout are the ones indexed."""
+
+        stat = os.stat(self.csv_file)
+        return (stat.st_size, stat.st_mtime_ns, timeout) == (
+            self.source_size, self.source_mtime, self.timeout)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self):
+        self._buffer.close()
+
+    def __enter__(self) -> "QueryIndex":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def record(self, i: int) -> Tuple[int, int, int, int]:
+        """Return the raw (offset, length, first entry, entries) of term i."""
+        return TERM.unpack_from(self._buffer, HEADER.size + i * TERM.size)
+
+    def term(self, i: int) -> str:
+        offset, length = self.record(i)[:2]
+        start = self._strings + offset
+        return self._buffer[start:start + length].decode("utf-8")
+
+    def find(self, term: str) -> Optional[int]:
+        """Binary search the sorted terms, and return the term's position."""
+
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.term(middle) < term:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and self.term(low) == term:
+            return low
+        return None
+
+    def entries(self, term: str) -> List[Tuple[int, bool]]:
+        """Return the (byte offset, is credited click) entries of a term."""
+
+        i = self.find(term)
+        if i is None:
+            return []
+        first, num_entries = self.record(i)[2:]
+        start = self._entries + first * ENTRY.size
+        with memoryview(self._buffer)[start:start + num_entries * ENTRY.size] as view:
+            return [(entry >> 1, bool(entry & 1)) for (entry,) in ENTRY.iter_unpack(view)]
+
+    def lookup(self, term: str) -> Dict[str, Any]:
+        """
+        Read a term's rows from the input file and rebuild its sessions.
+
+        RETURNS
+        -------
+            result : dict
+                "summary", the term's row of the summary table, or None if
+                it was never searched, and "sessions", a list of
+                [cid, start time, clicks, session time] in file order.
+        """
+
+        normalize = QueryNormalizer()
+        accumulator = QueryAccumulator()
+
+        #  [cid, start time, clicks, end time, offset] per session
+        sessions = []
+        open_sessions = {}
+        with MappedFile(self.csv_file) as mapped:
+            for offset, is_click in self.entries(term):
+                line = next(mapped.lines(offset, mapped.next_line(offset)))
+                line = line.rstrip("\r\n")
+                fields = next(csv.reader([line])) if '"' in line else line.split(",")
+                timestamp, path, referrer, cid = typed_row(fields)
+
+                if not is_click:
+                    accumulator.num_queries += 1
+                    if referrer == "":
+                        open_sessions[cid] = [cid, timestamp, 0, None, offset]
+                        sessions.append(open_sessions[cid])
+                    continue
+
+                #  Credited to the client's latest session of the term
+                session = open_sessions[cid]
+                session[2] += 1
+                if session[3] is None or timestamp > session[3]:
+                    session[3] = timestamp
+                if "search" in path and normalize(path) == term:
+                    accumulator.num_queries += 1
+
+        results = []
+        for cid, start, clicks, end, offset in sessions:
+            total_time = end - start if end is not None else 0
+            accumulator.add_session(cid, offset, clicks, total_time)
+            results.append([cid, start, clicks, total_time])
+        return {"summary": accumulator.summary() if sessions else None,
+                "sessions": results}
+
+
+@exception_handler
+def main(input_filename: str = None):
+    """
+    Build or refresh the query index of an input file.
+
+    ARGUMENTS
+    ---------
+        input_filename : str
+            e.g., "page-views.csv". Defaults to the most recent csv file.
+
+    RETURNS
+    -------
+        None
+    """
+
+    csv_file = retrive_csv_file(filename=input_filename,
+                                input_folder=input_folder)
+    index_file = os.path.join(output_folder, index_filename(csv_file))
+
+    start = time.perf_counter()
+    num_terms = build_query_index(csv_file, index_file)
+    print("Indexed {:,} queries of {} in {:.2f} s: {}".format(
+        num_terms, csv_file, time.perf_counter() - start, index_file))
+
+
+def parse_arguments(argv: List[str] = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+
+    parser = argparse.ArgumentParser(description="Index page views by query.")
+    parser.add_argument("input_filename", nargs="?", default=None,
+                        help='input csv file, e.g., "page-views.csv"')
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    input_folder = "../input/raw-data/"
+    output_folder = "../output/processed-data/"
+
+    args = parse_arguments()
+    main(input_filename=args.input_filename)
@@ -0,0 +1,73 @@
+"""
+Extract and clean query search terms from page view paths.
+
+Search terms repeat heavily, so normalized terms are cached by raw path.
+"""
+
+import string
+from functools import lru_cache
+from typing import Optional
+from urllib.parse import parse_qsl, urlsplit
+
+
+class QueryNormalizer:
+    """
+    Callable that turns a search path into a clean query search term.
+
+    The query string is parsed properly (percent-decoding, "+" as space),
+    the "q" parameter is lowercased and stripped of punctuation, and the
+    result is stored in a bounded LRU cache keyed on the raw path.
+
+    ARGUMENTS
+    ---------
+        maxsize : int
+            Maximum number of paths to cache. None leaves it unbounded.
+        key : str
+            Name of the query string parameter holding the search term.
+    """
+
+    def __init__(self, maxsize: Optional[int] = 65536, key: str = "q"):
+        self.maxsize = maxsize
+        self.key = key
+        self.table = str.maketrans("", "", string.punctuation)
+        self._cached = lru_cache(maxsize=maxsize)(self.normalize)
+
+    def __reduce__(self):
+        #  The cache itself is not sent to other processes
+        return (self.__class__, (self.maxsize, self.key))
+
+    def __call__(self, path: str) -> str:
+        return self._cached(path)
+
+    def normalize(self, path: str) -> str:
+        """Clean the search term of a path without using the cache."""
+
+        query = urlsplit(path).query
+        params = parse_qsl(query, keep_blank_values=True)
+        term = None
+        for name, value in params:
+            if name == self.key:
+                term = value
+                break
+
+        #  Fall back to the first parameter, or to the text after "="
+        if term is None:
+            if params:
+                term = params[0][1]
+            else:
+                term = path.partition("=")[2]
+
+        return term.lower().translate(self.table)
+
+    def cache_info(self):
+        """Return the hits, misses, maxsize and currsize of the cache."""
+        return self._cached.cache_info()
+
+    def cache_clear(self):
+        self._cached.cache_clear()
+
+    @property
+    def hit_rate(self) -> float:
+        info = self.cache_info()
+        lookups = info.hits + info.misses
+        return info.hits / lookups if lookups else 0.0
@@ -0,0 +1,67 @@
+"""
+Put slightly out-of-order page views back into timestamp order.
+
+Rows are held in a heap until the watermark (the latest timestamp seen,
+minus the allowed lateness) passes them, and are then emitted in order.
+Rows that arrive behind the watermark can no longer be placed in order,
+so they are diverted instead of being silently miscounted.
+"""
+
+import heapq
+from typing import Iterable, Iterator, List
+
+
+class ReorderBuffer:
+    """
+    Bounded reorder stage in front of the aggregation.
+
+    ARGUMENTS
+    ---------
+        max_lateness : int
+            Seconds a row may arrive behind the latest timestamp seen and
+            still be emitted in order.
+
+    ATTRIBUTES
+    ----------
+        late_rows : list
+            Rows that arrived behind the watermark.
+        max_buffered : int
+            Largest number of rows held at once.
+    """
+
+    def __init__(self, max_lateness: int):
+        self.max_lateness = max_lateness
+        self.watermark = None
+        self.late_rows = []
+        self.max_buffered = 0
+        self._heap = []
+        self._count = 0
+
+    @property
+    def late(self) -> int:
+        return len(self.late_rows)
+
+    def reorder(self, rows: Iterable[List[str]]) -> Iterator[List[str]]:
+        """Yield rows of [timestamp, path, referrer, cid] in timestamp order."""
+
+        heap = self._heap
+        for row in rows:
+            timestamp = int(row[0])
+            if self.watermark is not None and timestamp < self.watermark:
+                self.late_rows.append(row)
+                continue
+
+            #  The counter keeps rows with equal timestamps in input order
+            heapq.heappush(heap, (timestamp, self._count, row))
+            self._count += 1
+            if len(heap) > self.max_buffered:
+                self.max_buffered = len(heap)
+
+            watermark = timestamp - self.max_lateness
+            if self.watermark is None or watermark > self.watermark:
+                self.watermark = watermark
+            while heap and heap[0][0] <= self.watermark:
+                yield heapq.heappop(heap)[2]
+
+        while heap:
+            yield heapq.heappop(heap)[2]
@@ -1,6 +1,31 @@
+import gzip
+import io
+import json
+import mmap
 import os
 import glob
+import queue
 import sys
+import threading
+
+from atomic_file import write_atomic
+
+#  zstd and lz4 are optional, and only needed for files compressed with them
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+#  Input file patterns, uncompressed and compressed
+CSV_PATTERNS = ["*.csv", "*.csv.gz", "*.csv.zst", "*.csv.lz4"]
+
+#  Suffix of the timestamp index saved next to an input file
+TIMESTAMP_INDEX_SUFFIX = ".tsidx"
 
 
 def retrive_csv_file(filename=None, input_folder=None):
@@ -35,13 +60,13 @@ def retrive_csv_file(filename=None, input_folder=None):
     #  No file name provided
     else:
         if input_folder is not None:
-            files = glob.glob(input_folder + "/*.csv")
+            files = find_csv_files(input_folder + "/")
             csv_file = max(files)
             print(csv_file)
 
         #  Neither a filename nor a folder was provided
         else:
-            files = glob.glob("./*.csv")
+            files = find_csv_files("./")
             print(files)
             csv_file = max(files)
 
@@ -51,3 +76,322 @@ def retrive_csv_file(filename=None, input_folder=None):
     else:
         print("This file does not exist.")
         sys.exit(1)
+
+
+def retrieve_csv_files(input_folder=None):
+    """
+    Retrieve every csv file in a folder, sorted by name.
+
+    ARGUMENTS
+    ---------
+        input folder : str
+
+    RETURNS
+    -------
+        csv_files : list
+            Full paths to files, e.g., ['.../input/raw-data/page-views.csv']
+    """
+
+    if input_folder is None:
+        input_folder = "."
+    return sorted(find_csv_files(os.path.join(input_folder, "")))
+
+
+def find_csv_files(folder):
+    """Return the plain and compressed csv files in a folder."""
+
+    files = []
+    for pattern in CSV_PATTERNS:
+        files.extend(glob.glob(folder + pattern))
+    return files
+
+
+def compression_of(filepath):
+    """Return "gzip", "zstd" or "lz4" for a compressed file, else None."""
+
+    for suffix, compression in [(".gz", "gzip"), (".zst", "zstd"),
+                                (".lz4", "lz4")]:
+        if filepath.endswith(suffix):
+            return compression
+    return None
+
+
+def is_parquet(filepath: str) -> bool:
+    return filepath.endswith(".parquet")
+
+
+def open_compressed(filepath, mode="rb"):
+    """
+    Open a compressed file as a binary stream, by its suffix. Every gzip
+    member and zstd frame in the file is read.
+
+    ARGUMENTS
+    ---------
+        filepath : str
+            e.g., 'page-views.csv.gz'
+
+        mode : str
+            "rb" or "wb"
+
+    RETURNS
+    -------
+        stream : file object
+    """
+
+    compression = compression_of(filepath)
+    if compression == "gzip":
+        return gzip.open(filepath, mode)
+
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError(".zst files require zstandard. "
+                              "Install it with `pip install zstandard`.")
+        raw = open(filepath, mode)
+        if mode.startswith("r"):
+            return zstandard.ZstdDecompressor().stream_reader(
+                raw, read_across_frames=True, closefd=True)
+        return zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+
+    if compression == "lz4":
+        if lz4 is None:
+            raise ImportError(".lz4 files require lz4. "
+                              "Install it with `pip install lz4`.")
+        return lz4.frame.open(filepath, mode)
+
+    return open(filepath, mode)
+
+
+def open_text(filepath):
+    """Open a plain or compressed csv file for reading text."""
+
+    if compression_of(filepath) is None:
+        return open(filepath, mode="r")
+    return io.TextIOWrapper(open_compressed(filepath), encoding="utf-8")
+
+
+def read_blocks(filepath, block_size=2**20, max_pending=4):
+    """
+    Yield line-aligned blocks of bytes from a file, decompressing it in a
+    background thread so that decompression overlaps with parsing. At most
+    max_pending decompressed blocks are held in memory.
+    """
+
+    pending = queue.Queue(maxsize=max_pending)
+    stop = threading.Event()
+
+    def decompress():
+        try:
+            with open_compressed(filepath) as stream:
+                while not stop.is_set():
+                    block = stream.read(block_size)
+                    pending.put(block)
+                    if not block:
+                        return
+        except Exception as error:
+            pending.put(error)
+
+    thread = threading.Thread(target=decompress, daemon=True)
+    thread.start()
+    try:
+        partial = b""
+        while True:
+            block = pending.get()
+            if isinstance(block, Exception):
+                raise block
+            if not block:
+                break
+
+            #  Hold back the partial last line until the next block
+            block = partial + block
+            end = block.rfind(b"\n") + 1
+            if end:
+                yield block[:end]
+            partial = block[end:]
+        if partial:
+            yield partial
+    finally:
+        #  Unblock the thread if reading stopped early
+        stop.set()
+        while thread.is_alive():
+            try:
+                pending.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+class MappedFile:
+    """
+    Read-only memory map of an input file. Readers scan line-aligned slices
+    of it through memoryviews, so no data is copied until it is decoded,
+    and each worker can map the same file and read only its own slice.
+
+    ARGUMENTS
+    ---------
+        filepath : str
+            e.g., the file returned by retrive_csv_file
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        with open(filepath, mode="rb") as data:
+            self.size = os.fstat(data.fileno()).st_size
+
+            #  Empty files cannot be mapped
+            self.buffer = b""
+            if self.size:
+                self.buffer = mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def next_line(self, offset):
+        """Return the offset of the first line starting after offset."""
+
+        newline = self.buffer.find(b"\n", offset)
+        return self.size if newline < 0 else newline + 1
+
+    def line_ranges(self, num_ranges):
+        """
+        Split the file into byte ranges that start and end on line
+        boundaries.
+
+        ARGUMENTS
+        ---------
+            num_ranges : int
+                Number of ranges wanted. Fewer are returned for small files.
+
+        RETURNS
+        -------
+            ranges : list
+                (start, end) byte offsets covering the whole file.
+        """
+
+        boundaries = [0]
+        for i in range(1, num_ranges):
+            offset = max(self.size * i // num_ranges, boundaries[-1])
+            boundaries.append(self.next_line(offset) if offset > 0 else 0)
+        boundaries.append(self.size)
+
+        return [(start, end) for start, end in zip(boundaries, boundaries[1:])
+                if end > start]
+
+    def blocks(self, start=0, end=None, block_size=2**20):
+        """
+        Yield (offset, memoryview) for line-aligned blocks of about
+        block_size bytes between two line boundaries. Each view is released
+        when the next block is requested, so it must not be kept.
+        """
+
+        if end is None:
+            end = self.size
+        while start < end:
+            cut = min(start + block_size, end)
+            if cut < end:
+                newline = self.buffer.rfind(b"\n", start, cut)
+                cut = newline + 1 if newline >= 0 else min(self.next_line(cut), end)
+            with memoryview(self.buffer)[start:cut] as view:
+                yield start, view
+            start = cut
+
+    def lines(self, start=0, end=None):
+        """Yield decoded lines between two line boundaries, with their newlines."""
+
+        if end is None:
+            end = self.size
+        while start < end:
+            cut = min(self.next_line(start), end)
+            with memoryview(self.buffer)[start:cut] as view:
+                yield str(view, "utf-8")
+            start = cut
+
+
+class TimestampIndex:
+    """
+    Sparse index of a mapped page view file. For each line-aligned block of
+    about stride bytes it keeps the block's byte range and its smallest and
+    largest timestamp, so a time range can be read by scanning only the
+    blocks that overlap it. Rows need not be sorted, although the fewer
+    blocks a time range spans, the fewer are read. open() saves the index
+    next to the input file and reuses it until the file changes.
+
+    ARGUMENTS
+    ---------
+        entries : list
+            (start, end, first timestamp, last timestamp) per block. Blocks
+            without a readable timestamp have None bounds and are always read.
+    """
+
+    def __init__(self, entries):
+        self.entries = entries
+
+    @classmethod
+    def open(cls, csv_file, stride=2**20):
+        """
+        Load the index saved next to a file, e.g., page-views.csv.tsidx, if
+        it matches the file's size and modification time, or else build
+        it and save it. A folder that cannot be written to only means the
+        index is built again next time.
+        """
+
+        index_file = csv_file + TIMESTAMP_INDEX_SUFFIX
+        stat = os.stat(csv_file)
+        key = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+               "stride": stride}
+        try:
+            with open(index_file, mode="r") as data:
+                saved = json.load(data)
+            if all(saved.get(name) == value for name, value in key.items()):
+                return cls([tuple(entry) for entry in saved["entries"]])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        with MappedFile(csv_file) as mapped:
+            index = cls.build(mapped, stride)
+        try:
+            write_atomic(index_file,
+                         json.dumps(dict(key, entries=index.entries)).encode())
+        except OSError:
+            pass
+        return index
+
+    @classmethod
+    def build(cls, mapped, stride=2**20):
+        """Scan the first field of every line of a MappedFile."""
+
+        entries = []
+        for offset, view in mapped.blocks(block_size=stride):
+            timestamps = []
+            for line in view.tobytes().split(b"\n"):
+                comma = line.find(b",")
+                if comma > 0 and line[:comma].isdigit():
+                    timestamps.append(int(line[:comma]))
+            first = min(timestamps) if timestamps else None
+            last = max(timestamps) if timestamps else None
+            entries.append((offset, offset + len(view), first, last))
+        return cls(entries)
+
+    def ranges(self, since=None, until=None):
+        """
+        Return the merged byte ranges of the blocks that may hold rows with
+        since <= timestamp < until. Either bound may be None.
+        """
+
+        ranges = []
+        for start, end, first, last in self.entries:
+            if first is not None:
+                if since is not None and last < since:
+                    continue
+                if until is not None and first >= until:
+                    continue
+            if ranges and ranges[-1][1] == start:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((start, end))
+        return ranges
@@ -0,0 +1,392 @@
+"""
+Single-pass aggregation of page view rows.
+
+Rows are consumed one at a time from any iterable, and only per-query
+accumulators and the currently open search sessions are kept in memory,
+so the raw rows never need to be held in a list.
+"""
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from query_normalizer import QueryNormalizer
+
+#  Seconds of inactivity after which a search session is closed
+SESSION_TIMEOUT = 30 * 60
+
+
+class QueryAccumulator:
+    """
+    Running totals for a single query search term.
+
+    ATTRIBUTES
+    ----------
+        num_queries : int
+            Number of times the query was issued.
+        results_clicked : int
+            Clicks summed over every session of the query.
+        total_time : int
+            Session time summed over every session of the query [seconds].
+        cids : set
+            Client ids that searched the query, or another distinct
+            counter such as a HyperLogLog.
+        last : list
+            [position, clicks, total time] of the latest session, which
+            the averages in the summary table are taken from.
+    """
+
+    __slots__ = ("num_queries", "results_clicked", "total_time", "cids", "last")
+
+    def __init__(self, cids: Any = None):
+        self.num_queries = 0
+        self.results_clicked = 0
+        self.total_time = 0
+        self.cids = cids if cids is not None else set()
+        self.last = None
+
+    def __getstate__(self):
+        return (self.num_queries, self.results_clicked, self.total_time,
+                self.cids, self.last)
+
+    def __setstate__(self, state):
+        (self.num_queries, self.results_clicked, self.total_time,
+         self.cids, self.last) = state
+
+    def add_session(self, cid: Any, position: int, clicks: int, total_time: int):
+        """Credit a closed search session to the query."""
+
+        self.results_clicked += clicks
+        self.total_time += total_time
+        self.cids.add(cid)
+        if self.last is None or position > self.last[0]:
+            self.last = [position, clicks, total_time]
+
+    def merge(self, other: "QueryAccumulator") -> "QueryAccumulator":
+        """Fold in the totals of another accumulator."""
+
+        self.num_queries += other.num_queries
+        self.results_clicked += other.results_clicked
+        self.total_time += other.total_time
+        self.cids |= other.cids
+        if other.last is not None and (self.last is None
+                                       or other.last[0] > self.last[0]):
+            self.last = list(other.last)
+        return self
+
+    def summary(self) -> Dict[str, Any]:
+        """Reduce the accumulated sessions into a row of the summary table."""
+
+        num_users = len(self.cids)
+
+        #  Averages are taken from the most recently started session
+        last_clicks, last_time = self.last[1], self.last[2]
+        return {"num queries": self.num_queries,
+                "total time": self.total_time,
+                "num users": num_users,
+                "results clicked": self.results_clicked,
+                "av clicks per user": last_clicks / num_users,
+                "av time per click": (last_time / last_clicks
+                                      if last_clicks else 0.0)}
+
+
+class SessionAggregator(ABC):
+    """
+    Build search sessions from page views in a single pass, and hand each
+    query issued and each closed session to hooks that subclasses define.
+
+    Open search sessions are keyed by client id. A search row opens a new
+    session for its client, closing any earlier one, and a click row is
+    credited to its own client's open session. A session is closed once
+    its client has been inactive for longer than the timeout, so clicks
+    arriving later are not credited to it.
+
+    Sessions are kept in order of last activity, and idle ones are evicted
+    as the stream advances, so for time-ordered logs memory is bounded by
+    the number of concurrent sessions.
+
+    ARGUMENTS
+    ---------
+        normalize : callable
+            Extracts the query search term from a search path.
+            Defaults to a new QueryNormalizer.
+        timeout : int
+            Seconds of inactivity after which a session is closed.
+        distinct : callable
+            Creates the distinct counters of client ids. Defaults to set,
+            for exact counts.
+    """
+
+    def __init__(self, normalize: Optional[Callable[[str], str]] = None,
+                 timeout: int = SESSION_TIMEOUT,
+                 distinct: Callable[[], Any] = set):
+        self.normalize = normalize if normalize is not None else QueryNormalizer()
+        self.timeout = timeout
+        self.distinct = distinct
+        self.cids = distinct()
+        self.rows = 0
+        self.orphan_clicks = 0
+
+        #  cid -> [keyword, position, start time, clicks, end time, last seen]
+        self._open = OrderedDict()
+
+    def add(self, timestamp: int, path: str, referrer: str, cid: str,
+            position: Optional[int] = None):
+        """
+        Fold a single page view into the running totals. The position
+        orders rows across partial aggregators, and defaults to the
+        number of rows added so far.
+        """
+
+        keyword = None
+        if "search" in path:
+            keyword = self.normalize(path)
+        self.add_view(int(timestamp), keyword, referrer == "", cid, position)
+
+    def add_view(self, timestamp: int, keyword: Any, is_search: bool,
+                 cid: Any, position: Optional[int] = None):
+        """
+        Fold in a page view whose search term has already been extracted.
+        The keyword is None unless the path is a search, and keywords and
+        client ids may be any hashable codes.
+        """
+
+        if position is None:
+            position = self.rows
+        self.rows += 1
+        self.cids.add(cid)
+
+        if keyword is not None:
+            self._count_query(keyword)
+
+        session = self._open.get(cid)
+        if session is not None and timestamp - session[5] > self.timeout:
+            self._close_session(cid)
+            session = None
+
+        #  Path is an initial search
+        if is_search:
+            if session is not None:
+                self._close_session(cid)
+            if keyword is not None:
+                self._open[cid] = [keyword, position, timestamp, 0, None, timestamp]
+
+        #  Path referred by the client's open search
+        elif session is not None:
+            session[3] += 1
+            if session[4] is None or timestamp > session[4]:
+                session[4] = timestamp
+            if timestamp > session[5]:
+                session[5] = timestamp
+            self._open.move_to_end(cid)
+
+        else:
+            self.orphan_clicks += 1
+
+        self._evict(timestamp)
+
+    @abstractmethod
+    def _count_query(self, keyword: Any):
+        """Count one issue of a query."""
+
+    def _evict(self, now: int):
+        """Close sessions that have been idle for longer than the timeout."""
+
+        expired = now - self.timeout
+        while self._open:
+            cid, session = next(iter(self._open.items()))
+            if session[5] >= expired:
+                break
+            self._close_session(cid)
+
+    def consume(self, rows: Iterable[List[str]],
+                grouped_by_client: bool = False,
+                close: bool = True) -> "StreamAggregator":
+        """
+        Add every row from an iterable of [timestamp, path, referrer, cid],
+        optionally followed by the row's position in the input. If the
+        rows are grouped by client id, each client's sessions are closed
+        as soon as the next client starts. Sessions still open at the end
+        are closed unless close is False, e.g., when more input follows.
+        """
+
+        add = self.add
+        cid = None
+        for row in rows:
+            if grouped_by_client and row[3] != cid:
+                self.close()
+                cid = row[3]
+            add(row[0], row[1], row[2], row[3],
+                int(row[4]) if len(row) > 4 else None)
+        if close:
+            self.close()
+        return self
+
+    def _close_session(self, cid: Any):
+        """Credit a client's open session to its query."""
+
+        keyword, position, start_time, clicks, end_time, _ = self._open.pop(cid)
+        total_time = end_time - start_time if end_time is not None else 0
+        self._credit_session(keyword, cid, position, clicks, total_time)
+
+    @abstractmethod
+    def _credit_session(self, keyword: Any, cid: Any, position: int,
+                        clicks: int, total_time: int):
+        """Add a closed session to its query's totals."""
+
+    def close(self):
+        """Close every open session, e.g., at the end of the input."""
+
+        while self._open:
+            self._close_session(next(iter(self._open)))
+
+    @property
+    def open_sessions(self) -> int:
+        return len(self._open)
+
+    def merge(self, other: "SessionAggregator") -> "SessionAggregator":
+        """
+        Fold in a partial aggregator built from a disjoint set of client
+        ids, or from later rows once its sessions are closed. Merging is
+        associative, so partial results can be combined in any grouping.
+        """
+
+        self.close()
+        other.close()
+        self.cids |= other.cids
+        self.rows += other.rows
+        self.orphan_clicks += other.orphan_clicks
+        return self
+
+
+class StreamAggregator(SessionAggregator):
+    """
+    Aggregate page views in a single pass, keeping exact totals for every
+    query. Sessions are built as in SessionAggregator.
+
+    ARGUMENTS
+    ---------
+        normalize : callable
+            Extracts the query search term from a search path.
+            Defaults to a new QueryNormalizer.
+        timeout : int
+            Seconds of inactivity after which a session is closed.
+        distinct : callable
+            Creates the distinct counters of client ids, overall and per
+            query. Defaults to set, for exact counts.
+    """
+
+    #  Set of the queries searched, collected while a set is assigned
+    searched = None
+
+    def __init__(self, normalize: Optional[Callable[[str], str]] = None,
+                 timeout: int = SESSION_TIMEOUT,
+                 distinct: Callable[[], Any] = set):
+        super().__init__(normalize, timeout, distinct)
+        self.queries = {}
+
+    def _count_query(self, keyword: Any):
+        if keyword not in self.queries:
+            self.queries[keyword] = QueryAccumulator(self.distinct())
+        self.queries[keyword].num_queries += 1
+        if self.searched is not None:
+            self.searched.add(keyword)
+
+    def _credit_session(self, keyword: Any, cid: Any, position: int,
+                        clicks: int, total_time: int):
+        self.queries[keyword].add_session(cid, position, clicks, total_time)
+
+    def merge(self, other: "StreamAggregator") -> "StreamAggregator":
+        """Fold in a partial aggregator, see SessionAggregator.merge."""
+
+        super().merge(other)
+        for term, accumulator in other.queries.items():
+            if term in self.queries:
+                self.queries[term].merge(accumulator)
+            else:
+                self.queries[term] = QueryAccumulator(
+                    self.distinct()).merge(accumulator)
+        return self
+
+    def decode(self, terms: List[str], cids: List[str]) -> "StreamAggregator":
+        """
+        Return a copy keyed by strings, for an aggregator that was fed
+        integer codes indexing the given query terms and client ids.
+        Client ids must have been counted exactly, in sets.
+        """
+
+        self.close()
+        decoded = StreamAggregator(self.normalize, self.timeout)
+        for code, accumulator in self.queries.items():
+            query = QueryAccumulator().merge(accumulator)
+            query.cids = {cids[cid] for cid in accumulator.cids}
+            decoded.queries[terms[code]] = query
+        decoded.cids = {cids[cid] for cid in self.cids}
+        decoded.rows = self.rows
+        decoded.orphan_clicks = self.orphan_clicks
+        return decoded
+
+    def open_queries(self) -> Set[Any]:
+        """Return the queries that have a session open."""
+        return {session[0] for session in self._open.values()}
+
+    def summary_rows(self, terms: Iterable[Any]) -> Dict[Any, Optional[Dict[str, Any]]]:
+        """
+        Return the summary rows of some queries, counting their open
+        sessions as if closed, without closing them, as they may continue
+        in later input. Queries without any session map to None.
+        """
+
+        accumulators = {term: self.queries[term] for term in terms}
+        for cid, session in self._open.items():
+            keyword, position, start_time, clicks, end_time, _ = session
+            accumulator = accumulators.get(keyword)
+            if accumulator is None:
+                continue
+            if accumulator is self.queries[keyword]:
+                accumulator = accumulators[keyword] = QueryAccumulator(
+                    self.distinct()).merge(accumulator)
+            total_time = end_time - start_time if end_time is not None else 0
+            accumulator.add_session(cid, position, clicks, total_time)
+        return {term: accumulator.summary() if accumulator.last is not None else None
+                for term, accumulator in accumulators.items()}
+
+    def summary_table(self) -> Dict[str, Dict[str, Any]]:
+        """Return the aggregated data keyed by query search term."""
+
+        self.close()
+        return {term: accumulator.summary()
+                for term, accumulator in self.queries.items()
+                if accumulator.last is not None}
+
+
+def aggregate_rows(rows: Iterable[List[str]],
+                   normalize: Optional[Callable[[str], str]] = None,
+                   aggregator: Optional[StreamAggregator] = None,
+                   timeout: int = SESSION_TIMEOUT,
+                   grouped_by_client: bool = False) -> StreamAggregator:
+    """
+    Stream rows into an aggregator and return it.
+
+    ARGUMENTS
+    ---------
+        rows : iterable
+            Rows of [timestamp, path, referrer, cid].
+        normalize : callable
+            Extracts the query search term from a search path.
+            Defaults to a new QueryNormalizer.
+        aggregator : StreamAggregator
+            Existing aggregator to continue, if any.
+        timeout : int
+            Seconds of inactivity after which a session is closed.
+        grouped_by_client : bool
+            Whether rows arrive grouped by client id, e.g., sorted.
+
+    RETURNS
+    -------
+        aggregator : StreamAggregator
+    """
+
+    if aggregator is None:
+        aggregator = StreamAggregator(normalize, timeout)
+    return aggregator.consume(rows, grouped_by_client)
@@ -0,0 +1,132 @@
+"""
+Compact binary format for the aggregated page view summary.
+
+Layout (little-endian):
+
+    header   magic b"PVSUMRY1", number of records (uint64)
+    records  one fixed-width 64-byte record per query, sorted by term:
+                 term offset (uint64), term length (uint32), padding,
+                 num queries, total time, num users, results clicked (int64),
+                 av clicks per user, av time per click (float64)
+    strings  utf-8 query terms, referenced by offset into this table
+
+Readers memory-map the file and unpack only the fields they need, so no
+text has to be parsed.
+"""
+
+import heapq
+import mmap
+import os
+import struct
+from typing import Any, Dict, Iterator, List, Tuple
+
+from atomic_file import atomic_output
+
+MAGIC = b"PVSUMRY1"
+HEADER = struct.Struct("<8sQ")
+RECORD = struct.Struct("<QI4xqqqqdd")
+
+#  Record fields, in order, after the term offset and length
+FIELDS = ["num queries", "total time", "num users", "results clicked",
+          "av clicks per user", "av time per click"]
+
+
+def write_summary_binary(compiled_dict: Dict[str, Dict[str, Any]],
+                         output_file: str):
+    """
+    Write the aggregated dict to a binary summary file, through a temporary
+    file so readers never see a partial summary.
+    """
+
+    terms = sorted(compiled_dict)
+    strings = bytearray()
+    records = bytearray(HEADER.pack(MAGIC, len(terms)))
+    for term in terms:
+        val = compiled_dict[term]
+        encoded = term.encode("utf-8")
+        records += RECORD.pack(len(strings), len(encoded),
+                               *[val[field] for field in FIELDS])
+        strings += encoded
+
+    with atomic_output(output_file) as temp_file:
+        with open(temp_file, mode="wb") as output_data:
+            output_data.write(records)
+            output_data.write(strings)
+
+
+class SummaryFile:
+    """
+    Memory-mapped, read-only view of a binary summary file.
+
+    ARGUMENTS
+    ---------
+        filepath : str
+            e.g., "../output/processed-data/aggregated-page-views.bin"
+    """
+
+    def __init__(self, filepath: str):
+        with open(filepath, mode="rb") as data:
+            size = os.fstat(data.fileno()).st_size
+            self._buffer = (mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ)
+                            if size else b"")
+
+        if len(self._buffer) < HEADER.size:
+            raise ValueError("{} is not a page view summary.".format(filepath))
+        magic, self.count = HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("{} is not a page view summary.".format(filepath))
+        self._strings = HEADER.size + self.count * RECORD.size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self):
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+    def __enter__(self) -> "SummaryFile":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def record(self, i: int) -> Tuple:
+        """Return the raw (offset, length, *FIELDS) tuple of record i."""
+        return RECORD.unpack_from(self._buffer, HEADER.size + i * RECORD.size)
+
+    def term(self, i: int) -> str:
+        offset, length = self.record(i)[:2]
+        start = self._strings + offset
+        return bytes(self._buffer[start:start + length]).decode("utf-8")
+
+    def records(self) -> Iterator[Tuple]:
+        """Iterate over the raw records, in term order."""
+
+        view = memoryview(self._buffer)[HEADER.size:self._strings]
+        try:
+            yield from RECORD.iter_unpack(view)
+        finally:
+            view.release()
+
+    def column(self, field: str) -> List[Any]:
+        """Return every value of one field, in term order."""
+
+        index = 2 + FIELDS.index(field)
+        return [record[index] for record in self.records()]
+
+    def top(self, num_results: int, field: str) -> List[Tuple[str, Any]]:
+        """
+        Return the top N (term, value) pairs for a field, in descending order.
+        Ties keep term order. Terms are only decoded for the results.
+        """
+
+        index = 2 + FIELDS.index(field)
+        best = heapq.nlargest(num_results, enumerate(self.records()),
+                              key=lambda item: item[1][index])
+        return [(self.term(i), record[index]) for i, record in best]
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Decode the whole summary into the aggregated dict form."""
+
+        return {self.term(i): dict(zip(FIELDS, record[2:]))
+                for i, record in enumerate(self.records())}
@@ -1,8 +1,10 @@
 import unittest
+from unittest import mock
 
 #  Enable unittest to find source code
 import os
 import sys
+import tempfile
 sys.path.insert(0, '../../src/')
 
 #  Import module to test
@@ -16,6 +18,7 @@ class TestExtractionData(unittest.TestCase):
     -------
         test_emptyCSV : Given empty file, no data should be pulled and a failed report 
                         is generated.
+        test_headerRow : A header row is skipped without being rejected.
     """
 
     def test_emptyCSV(self,
@@ -31,6 +34,20 @@ class TestExtractionData(unittest.TestCase):
         dir = os.listdir(filepath)
         self.assertGreater(len(dir), 0)
 
+    def test_headerRow(self):
+        """Ensure header=True keeps the header out of the line counts."""
+
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".csv") as data:
+            data.write("timestamp,path,referrer,cid\n"
+                       "10,/search?q=salt,,a\n"
+                       "11,/repository/1,/search?q=salt,a\n")
+            data.flush()
+            with mock.patch("aggregate_page_views.report_validation") as report:
+                rows = validate_data(data.name, header=True)
+
+        self.assertEqual([row[0] for row in rows], [10, 11])
+        report.assert_called_once_with(2, 2, None)
+
 
 class TestCleanData(unittest.TestCase):
     """
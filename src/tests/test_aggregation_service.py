@@ -0,0 +1,153 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from unittest import mock
+
+#  Enable unittest to find source code
+import sys
+sys.path.insert(0, '../../src/')
+
+#  Import module to test
+from aggregation_service import AggregationService, SummarySnapshot, make_server
+
+
+class TestAggregationService(unittest.TestCase):
+    """
+    METHODS
+    -------
+        test_snapshotRankings : Rankings are sorted with ties by term.
+        test_openSessions : Snapshots count open sessions but leave them open.
+        test_refresh : New input files are folded in once.
+        test_httpApi : Endpoints answer from the latest snapshot.
+        test_failedFile : A file that fails partway is not counted twice.
+        test_incrementalUpdate : Updated rankings match a full snapshot.
+    """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.input_folder = os.path.join(self.folder, "raw-data")
+        os.makedirs(self.input_folder)
+        self.service = AggregationService(self.input_folder,
+                                          os.path.join(self.folder, "state"))
+
+    def write_input(self, name, content):
+        with open(os.path.join(self.input_folder, name), mode="w") as data:
+            data.write(content)
+
+    def test_snapshotRankings(self):
+        """Ensure top N results are in descending order, ties by term."""
+
+        row = {"num queries": 2, "total time": 10, "num users": 1,
+               "results clicked": 4}
+        snapshot = SummarySnapshot({"b": row, "a": row,
+                                    "c": dict(row, **{"num queries": 3})})
+
+        self.assertEqual(snapshot.top(2, "num queries"), [("c", 3), ("a", 2)])
+        self.assertEqual(snapshot.average_session, 2.5)
+
+    def test_openSessions(self):
+        """Ensure a snapshot credits open sessions without closing them."""
+
+        self.write_input("page-views-1.csv", "10,/search?q=a,,x\n"
+                                             "20,/repo,/search?q=a,x\n")
+        self.service.refresh()
+
+        self.assertEqual(self.service.snapshot.query("a")["results clicked"], 1)
+        self.assertEqual(self.service.state.aggregator.open_sessions, 1)
+
+    def test_refresh(self):
+        """Ensure each new file is aggregated once, continuing open sessions."""
+
+        self.write_input("page-views-1.csv", "10,/search?q=a,,x\n")
+        self.assertEqual(self.service.refresh(), 1)
+        self.write_input("page-views-2.csv", "20,/repo,/search?q=a,x\n")
+
+        self.assertEqual(self.service.refresh(), 1)
+        self.assertEqual(self.service.refresh(), 0)
+        self.assertEqual(self.service.snapshot.status()["files"], 2)
+        self.assertEqual(self.service.snapshot.query("a")["results clicked"], 1)
+
+    def test_httpApi(self):
+        """Ensure the endpoints return json, and errors for bad requests."""
+
+        self.write_input("page-views-1.csv", "10,/search?q=a,,x\n"
+                                             "20,/repo,/search?q=a,x\n"
+                                             "30,/search?q=b,,y\n")
+        self.service.refresh()
+        server = make_server(self.service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = "http://{}:{}".format(*server.server_address)
+
+        def get(path):
+            with urllib.request.urlopen(url + path) as response:
+                return json.loads(response.read())
+
+        self.assertEqual(get("/top?n=1&by=results+clicked"), [["a", 1]])
+        self.assertEqual(get("/query?q=b")["num queries"], 1)
+        self.assertEqual(get("/query?q=B")["num queries"], 1)
+        self.assertEqual(get("/average"), {"average session length": 10.0})
+        self.assertEqual(get("/status")["rows"], 3)
+        for path, status in [("/query?q=c", 404), ("/top?by=x", 400), ("/x", 404)]:
+            with self.assertRaises(urllib.error.HTTPError) as error:
+                get(path)
+            self.assertEqual(error.exception.code, status)
+
+    def test_failedFile(self):
+        """Ensure rows of a file that failed are dropped before the retry."""
+
+        self.write_input("page-views-1.csv", "10,/search?q=a,,x\n")
+        self.service.refresh()
+        self.write_input("page-views-2.csv", "20,/search?q=a,,y\n")
+        with mock.patch.object(self.service.state, "record",
+                               side_effect=FileNotFoundError("page-views-2.csv")):
+            with self.assertRaises(FileNotFoundError):
+                self.service.refresh()
+
+        self.assertEqual(self.service.state.aggregator.rows, 1)
+        self.assertEqual(self.service.refresh(), 1)
+        self.assertEqual(self.service.snapshot.query("a")["num queries"], 2)
+
+    def test_incrementalUpdate(self):
+        """Ensure only changed rows are re-ranked, with the same result."""
+
+        self.write_input("page-views-1.csv", "10,/search?q=a,,x\n"
+                                             "20,/search?q=b,,y\n"
+                                             "30,/repo,/search?q=b,y\n")
+        self.service.refresh()
+        self.write_input("page-views-2.csv", "40,/repo,/search?q=a,x\n"
+                                             "50,/search?q=c,,z\n"
+                                             "60,/search?q=c,,z\n")
+        self.service.refresh()
+
+        full = SummarySnapshot.of(self.service.state.aggregator, 2)
+        snapshot = self.service.snapshot
+        self.assertEqual(snapshot.summary_table, full.summary_table)
+        self.assertEqual(snapshot.rankings, full.rankings)
+        self.assertEqual(snapshot.average_session, full.average_session)
+        self.assertEqual(snapshot.top(1, "num queries"), [("c", 2)])
+
+
+def runTests():
+    test_classes = [TestAggregationService]
+    load_tests = unittest.TestLoader()
+
+    test_list = []
+    for test in test_classes:
+        load_test_cases = load_tests.loadTestsFromTestCase(test)
+        test_list.append(load_test_cases)
+
+    test_suite = unittest.TestSuite(test_list)
+    run_test = unittest.TextTestRunner()
+    run_test.run(test_suite)
+
+
+if __name__ == "__main__":
+    runTests()
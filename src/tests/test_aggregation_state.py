@@ -0,0 +1,72 @@
+import unittest
+
+#  Enable unittest to find source code
+import os
+import sys
+import tempfile
+sys.path.insert(0, '../../src/')
+
+#  Import module to test
+from aggregate_page_views import PageViewReader
+from stream_aggregator import StreamAggregator
+from aggregation_state import AggregationState
+
+
+class TestAggregationState(unittest.TestCase):
+    """
+    METHODS
+    -------
+        test_incrementalRuns : Folding files in over two runs matches one pass.
+    """
+
+    def test_incrementalRuns(self, csv_file='../../input/raw-data/page-views.csv'):
+        """Ensure saved state, including open sessions, carries across runs."""
+
+        with open(csv_file, mode='r') as data:
+            lines = data.readlines()
+
+        #  Split inside a session, so it stays open at the file boundary
+        split = 1001
+        self.assertNotEqual(lines[split].split(',')[2], '')
+
+        with tempfile.TemporaryDirectory() as folder:
+            input_files = [os.path.join(folder, 'hour-{}.csv'.format(i))
+                           for i in range(2)]
+            for input_file, part in zip(input_files, [lines[:split], lines[split:]]):
+                with open(input_file, mode='w') as output_data:
+                    output_data.writelines(part)
+            state_folder = os.path.join(folder, 'state')
+
+            for available in [input_files[:1], input_files]:
+                state = AggregationState.load(state_folder)
+                new_files = state.new_files(available)
+                self.assertEqual(new_files, available[-1:])
+                for input_file in new_files:
+                    state.aggregator.consume(PageViewReader(input_file), close=False)
+                    state.record(input_file)
+                state.save()
+
+            state = AggregationState.load(state_folder)
+            self.assertEqual(state.new_files(input_files), [])
+
+        expected_output = StreamAggregator().consume(
+            PageViewReader(csv_file)).summary_table()
+        self.assertEqual(state.aggregator.summary_table(), expected_output)
+
+
+def runTests():
+    test_classes = [TestAggregationState]
+    load_tests = unittest.TestLoader()
+
+    test_list = []
+    for test in test_classes:
+        load_test_cases = load_tests.loadTestsFromTestCase(test)
+        test_list.append(load_test_cases)
+
+    test_suite = unittest.TestSuite(test_list)
+    run_test = unittest.TextTestRunner()
+    run_test.run(test_suite)
+
+
+if __name__ == "__main__":
+    runTests()
@@ -0,0 +1,131 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+import weakref
+
+#  Enable unittest to find source code
+import sys
+sys.path.insert(0, '../../src/')
+
+#  Import module to test
+from async_pipeline import aggregate_files
+from page_view_reader import PageViewReader
+from stream_aggregator import StreamAggregator
+
+
+class TestAsyncPipeline(unittest.TestCase):
+    """
+    METHODS
+    -------
+        test_perFileSummaries : Each file matches a single-file aggregation.
+        test_mergedSummary : Per-file aggregators are merged.
+        test_mergedEarly : Aggregators are dropped as their files finish.
+        test_smallQueues : Tiny blocks and queues give the same results.
+        test_compressedInput : Gzip files are read through the pipeline.
+    """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.csv_files = []
+        for i in range(3):
+            rows = "".join("{},/search?q=t{},,c{}\n{},/repo,/search?q=t{},c{}\n".format(
+                10 * j, j % 4, j, 10 * j + 5, j % 4, j) for j in range(i, 40))
+            self.csv_files.append(self.write_file("page-views-{}.csv".format(i), rows))
+
+    def write_file(self, name, content):
+        path = os.path.join(self.folder, name)
+        with open(path, mode="w") as data:
+            data.write(content)
+        return path
+
+    def test_perFileSummaries(self):
+        """Ensure each file's summary and line counts match PageViewReader."""
+
+        summaries = {}
+        per_file, _ = aggregate_files(
+            self.csv_files, concurrency=2,
+            on_file=lambda csv_file, aggregator, _: summaries.__setitem__(
+                csv_file, aggregator.summary_table()))
+
+        self.assertEqual(list(summaries), self.csv_files)
+        for csv_file in self.csv_files:
+            page_views = PageViewReader(csv_file)
+            expected = StreamAggregator().consume(page_views).summary_table()
+            counts = per_file[csv_file]
+            self.assertEqual(summaries[csv_file], expected)
+            self.assertEqual((counts.rows_read, counts.accepted),
+                             (page_views.rows_read, page_views.accepted))
+
+    def test_mergedSummary(self):
+        """Ensure the merged summary adds up every file, merged in file order."""
+
+        _, merged = aggregate_files(self.csv_files, concurrency=2)
+        expected = StreamAggregator()
+        for csv_file in self.csv_files:
+            expected.merge(StreamAggregator().consume(PageViewReader(csv_file)))
+
+        self.assertEqual(merged.summary_table(), expected.summary_table())
+        self.assertEqual(merged.rows, 2 * (40 + 39 + 38))
+
+    def test_mergedEarly(self):
+        """Ensure each file's aggregator is dropped once it is merged."""
+
+        alive = weakref.WeakSet()
+
+        def factory(timeout):
+            aggregator = StreamAggregator(timeout=timeout)
+            alive.add(aggregator)
+            return aggregator
+
+        held = []
+        aggregate_files(self.csv_files * 3, aggregator_factory=factory,
+                        concurrency=2,
+                        on_file=lambda *_: held.append(len(alive)))
+
+        #  The merged aggregator, and at most one per file in flight
+        self.assertLessEqual(max(held), 1 + 2)
+
+    def test_smallQueues(self):
+        """Ensure blocks split mid-line and full queues lose no rows."""
+
+        _, expected = aggregate_files(self.csv_files)
+        _, merged = aggregate_files(self.csv_files, concurrency=1,
+                                    max_pending=1, block_size=7)
+
+        self.assertEqual(merged.summary_table(), expected.summary_table())
+
+    def test_compressedInput(self):
+        """Ensure compressed files give the same summary as plain ones."""
+
+        gz_file = os.path.join(self.folder, "page-views-0.csv.gz")
+        with open(self.csv_files[0], mode="rb") as data:
+            with gzip.open(gz_file, mode="wb") as output_data:
+                output_data.write(data.read())
+
+        summaries = []
+        aggregate_files([self.csv_files[0], gz_file],
+                        on_file=lambda _, aggregator, __: summaries.append(
+                            aggregator.summary_table()))
+
+        self.assertEqual(summaries[1], summaries[0])
+
+
+def runTests():
+    test_classes = [TestAsyncPipeline]
+    load_tests = unittest.TestLoader()
+
+    test_list = []
+    for test in test_classes:
+        load_test_cases = load_tests.loadTestsFromTestCase(test)
+        test_list.append(load_test_cases)
+
+    test_suite = unittest.TestSuite(test_list)
+    run_test = unittest.TextTestRunner()
+    run_test.run(test_suite)
+
+
+if __name__ == "__main__":
+    runTests()
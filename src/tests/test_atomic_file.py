@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+#  Enable unittest to find source code
+import sys
+sys.path.insert(0, '../../src/')
+
+#  Import module to test
+import atomic_file
+from atomic_file import atomic_output, write_atomic
+
+
+class WriteFailed(Exception):
+    pass
+
+
+class TestAtomicFile(unittest.TestCase):
+    """
+    METHODS
+    -------
+        test_replace : The new content replaces the file, with no temp file left.
+        test_failedWrite : A failed write keeps the old file and no temp file.
+        test_folderSynced : The folder is synced after the rename.
+    """
+
+    def setUp(self):
+        temp_folder = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_folder.cleanup)
+        self.folder = temp_folder.name
+        self.path = os.path.join(self.folder, "summary.csv.gz")
+
+    def read(self):
+        with open(self.path, mode="rb") as data:
+            return data.read()
+
+    def test_replace(self):
+        """Ensure the temp file keeps the suffix and is renamed over the file."""
+
+        write_atomic(self.path, b"old")
+        with atomic_output(self.path) as temp_path:
+            self.assertTrue(temp_path.endswith(".csv.gz"))
+            self.assertEqual(os.path.dirname(temp_path), self.folder)
+            with open(temp_path, mode="wb") as output_data:
+                output_data.write(b"new")
+
+        self.assertEqual(self.read(), b"new")
+        self.assertEqual(os.listdir(self.folder), ["summary.csv.gz"])
+
+    def test_failedWrite(self):
+        """Ensure readers still see the complete old file after a failure."""
+
+        write_atomic(self.path, b"old")
+        with self.assertRaises(WriteFailed):
+            with atomic_output(self.path) as temp_path:
+                with open(temp_path, mode="wb") as output_data:
+                    output_data.write(b"partial")
+                raise WriteFailed()
+
+        self.assertEqual(self.read(), b"old")
+        self.assertEqual(os.listdir(self.folder), ["summary.csv.gz"])
+
+    def test_folderSynced(self):
+        """Ensure the rename is made durable by syncing the folder."""
+
+        with mock.patch.object(atomic_file, "fsync_directory") as fsync_directory:
+            write_atomic(self.path, b"new")
+
+        fsync_directory.assert_called_once_with(self.folder)
+
+
+def runTests():
+    test_classes = [TestAtomicFile]
+    load_tests = unittest.TestLoader()
+
+    test_list = []
+    for test in test_classes:
+        load_test_cases = load_tests.loadTestsFromTestCase(test)
+        test_list.append(load_test_cases)
+
+    test_suite = unittest.TestSuite(test_list)
+    run_test = unittest.TextTestRunner()
+    run_test.run(test_suite)
+
+
+if __name__ == "__main__":
+    runTests()
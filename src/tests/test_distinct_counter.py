@@ -0,0 +1,105 @@
+import pickle
+import unittest
+
+#  Enable unittest to find source code
+import sys
+sys.path.insert(0, '../../src/')
+
+#  Import module to test
+from distinct_counter import HyperLogLog
+from stream_aggregator import StreamAggregator
+
+
+class TestHyperLogLog(unittest.TestCase):
+    """
+    METHODS
+    -------
+        test_small : Small counts are exact.
+        test_sparseSize : Exact hashes take less memory than the registers.
+        test_estimate : Large counts are within the standard error.
+        test_merge : Merged counters estimate the union.
+        test_precision : Counters of different precision do not merge.
+        test_aggregator : Unique users per query can be estimated.
+    """
+
+    def test_small(self):
+        """Ensure counters below the register threshold count exactly."""
+
+        counter = HyperLogLog(10)
+        for cid in ["a", "b", "a", "c", "b"]:
+            counter.add(cid)
+
+        self.assertEqual(len(counter), 3)
+        self.assertIsNone(counter.registers)
+
+    def test_sparseSize(self):
+        """Ensure counters switch to registers before the hashes outgrow them."""
+
+        counter = HyperLogLog(12)
+        sizes = []
+        while counter.registers is None:
+            counter.add(len(sizes))
+            sizes.append(sys.getsizeof(counter._hashes))
+            if counter.registers is None:
+                self.assertEqual(list(counter._hashes), sorted(counter._hashes))
+
+        self.assertLess(max(sizes[:-1]), counter.num_registers)
+        self.assertGreater(len(sizes), counter.num_registers // 16)
+        self.assertAlmostEqual(len(counter) / len(sizes), 1,
+                               delta=4 * counter.standard_error)
+
+    def test_estimate(self):
+        """Ensure the estimate is within 4 standard errors."""
+
+        counter = HyperLogLog(10)
+        for i in range(50000):
+            counter.add("cid-{}".format(i % 20000))
+
+        self.assertAlmostEqual(len(counter) / 20000, 1,
+                               delta=4 * counter.standard_error)
+
+    def test_merge(self):
+        """Ensure merging counters matches counting everything in one."""
+
+        whole, left, right = HyperLogLog(8), HyperLogLog(8), HyperLogLog(8)
+        for i in range(3000):
+            whole.add(i)
+            (left if i % 3 else right).add(i)
+
+        left |= pickle.loads(pickle.dumps(right))
+
+        self.assertEqual(len(left), len(whole))
+        self.assertEqual(left.registers, whole.registers)
+
+    def test_precision(self):
+        """Ensure counters of different precision are not merged."""
+
+        with self.assertRaises(ValueError):
+            HyperLogLog(8).merge(HyperLogLog(9))
+
+    def test_aggregator(self):
+        """Ensure a stream aggregator can count users with HyperLogLog."""
+
+        rows = [[str(i), '/search?q=a', '', 'cid-{}'.format(i)] for i in range(40)]
+        aggregator = StreamAggregator(distinct=HyperLogLog).consume(rows)
+
+        self.assertIsInstance(aggregator.cids, HyperLogLog)
+        self.assertEqual(aggregator.summary_table()['a']['num users'], 40)
+
+
+def runTests():
+    test_classes = [TestHyperLogLog]
+    load_tests = unittest.TestLoader()
+
+    test_list = []
+    for test in test_classes:
+        load_test_cases = load_tests.loadTestsFromTestCase(test)
+        test_list.append(load_test_cases)
+
+    test_suite = unittest.TestSuite(test_list)
+    run_test = unittest.TextTestRunner()
+    run_test.run(test_suite)
+
+
+if __name__ == "__main__":
+    runTests()
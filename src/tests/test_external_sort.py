@@ -0,0 +1,57 @@
+import unittest
+
+#  Enable unittest to find source code
+import sys
+sys.path.insert(0, '../../src/')
+
+#  Import module to test
+from external_sort import external_sort, sort_by_client
+
+
+class TestExternalSort(unittest.TestCase):
+    """
+    METHODS
+    -------
+        test_spilledRuns : Rows spilled to many runs merge into sorted order.
+        test_sortByClient : Rows are ordered by client id, then timestamp.
+    """
+
+    def test_spilledRuns(self):
+        """Ensure a tiny memory budget still gives a fully sorted result."""
+
+        rows = [[str(value)] for value in [5, 3, 9, 1, 7, 2, 8, 6, 4, 0]]
+        output = external_sort(rows, key=lambda row: int(row[0]),
+                               memory_budget=1, max_open_runs=3)
+
+        self.assertEqual([int(row[0]) for row in output], list(range(10)))
+
+    def test_sortByClient(self):
+        """Ensure rows are grouped by cid in time order, keeping positions."""
+
+        rows = [['30', '/search?q=rock', '', 'b'],
+                ['10', '/search?q=salt', '', 'a'],
+                ['20', '/repository/1', '/search?q=rock', 'b'],
+                ['15', '/repository/2', '/search?q=salt', 'a']]
+        output = list(sort_by_client(rows, memory_budget=1))
+
+        self.assertEqual([(row[3], row[0]) for row in output],
+                         [('a', '10'), ('a', '15'), ('b', '20'), ('b', '30')])
+        self.assertEqual([int(row[4]) for row in output], [1, 3, 2, 0])
+
+
+def runTests():
+    test_classes = [TestExternalSort]
+    load_tests = unittest.TestLoader()
+
+    test_list = []
+    for test in test_classes:
+        load_test_cases = load_tests.loadTestsFromTestCase(test)
+        test_list.append(load_test_cases)
+
+    test_suite = unittest.TestSuite(test_list)
+    run_test = unittest.TextTestRunner()
+    run_test.run(test_suite)
+
+
+if __name__ == "__main__":
+    runTests()
@@ -0,0 +1,149 @@
+import pickle
+import random
+import unittest
+from collections import Counter
+
+#  Enable unittest to find source code
+import sys
+sys.path.insert(0, '../../src/')
+
+#  Import module to test
+from heavy_hitters import SketchAggregator, SpaceSaving
+
+
+def skewed_stream(num_items, seed):
+    """Return a stream of items with a few frequent ones and a long tail."""
+
+    rng = random.Random(seed)
+    return ["q{}".format(int(rng.paretovariate(1.2))) for _ in range(num_items)]
+
+
+class TestSpaceSaving(unittest.TestCase):
+    """
+    METHODS
+    -------
+        test_exact : Counts are exact while every item has a counter.
+        test_bounds : Estimates stay within their error bounds.
+        test_merge : Merged summaries keep the error bounds.
+        test_pickle : A summary keeps counting after a pickle round trip.
+    """
+
+    def assertWithinBounds(self, summary, true_counts):
+        for item, count, error in summary.top(len(summary)):
+            self.assertLessEqual(count - error, true_counts[item])
+            self.assertGreaterEqual(count, true_counts[item])
+            self.assertLessEqual(error, summary.error_bound)
+
+        #  Items above total / capacity are guaranteed a counter
+        for item, count in true_counts.items():
+            if count > summary.error_bound:
+                self.assertIn(item, summary.counters)
+
+    def test_exact(self):
+        """Ensure a summary with room for every item counts exactly."""
+
+        summary = SpaceSaving(10)
+        for item in ["a", "b", "a", "c", "a", "b"]:
+            summary.update(item)
+
+        self.assertEqual(summary.top(2), [("a", 3, 0), ("b", 2, 0)])
+        self.assertEqual(summary.min_count, 0)
+
+    def test_bounds(self):
+        """Ensure every estimate is an upper bound within its error."""
+
+        stream = skewed_stream(20000, seed=1)
+        summary = SpaceSaving(50)
+        for item in stream:
+            summary.update(item)
+
+        self.assertEqual(len(summary), 50)
+        self.assertEqual(summary.total, len(stream))
+        self.assertWithinBounds(summary, Counter(stream))
+
+    def test_merge(self):
+        """Ensure merging partial summaries keeps the error bounds."""
+
+        stream = skewed_stream(20000, seed=2)
+        partials = [SpaceSaving(50) for _ in range(3)]
+        for i, item in enumerate(stream):
+            partials[i % 3].update(item, weight=2)
+
+        merged = partials[0].merge(partials[1]).merge(partials[2])
+
+        self.assertEqual(merged.total, 2 * len(stream))
+        self.assertWithinBounds(merged, Counter({item: 2 * count for item, count
+                                                 in Counter(stream).items()}))
+
+    def test_pickle(self):
+        """Ensure a summary can be saved and updated again."""
+
+        summary = SpaceSaving(2)
+        for item in ["a", "a", "b", "c"]:
+            summary.update(item)
+        summary = pickle.loads(pickle.dumps(summary))
+        summary.update("a")
+
+        self.assertEqual(summary.top(1), [("a", 3, 0)])
+
+
+class TestSketchAggregator(unittest.TestCase):
+    """
+    METHODS
+    -------
+        test_sessions : Queries and clicks are counted from sessions.
+        test_fixedMemory : Memory does not grow with distinct queries or clients.
+    """
+
+    def test_sessions(self):
+        """Ensure partial sketch aggregators merge into the totals."""
+
+        first = SketchAggregator(capacity=4).consume([
+            ['1', '/search?q=a', '', 'x'],
+            ['3', '/repo', '/search?q=a', 'x'],
+            ['5', '/search?q=b', '', 'x'],
+        ])
+        second = SketchAggregator(capacity=4).consume([
+            ['2', '/search?q=a', '', 'y'],
+            ['4', '/repo', '/search?q=a', 'y'],
+            ['8', '/repo', '/search?q=a', 'y'],
+        ])
+        first.merge(second)
+
+        self.assertEqual(first.query_counts.top(2), [("a", 2, 0), ("b", 1, 0)])
+        self.assertEqual(first.click_counts.top(1), [("a", 3, 0)])
+        self.assertEqual((first.total_time, first.total_clicks), (8, 3))
+        self.assertEqual(first.heavy_hitters(1),
+                         [["num queries", "a", 2, 0],
+                          ["results clicked", "a", 3, 0]])
+
+    def test_fixedMemory(self):
+        """Ensure the saved state is the same size for twice the clients."""
+
+        def state_size(num_clients):
+            aggregator = SketchAggregator(capacity=16).consume(
+                [[str(i), "/search?q=q{}".format(i), "", "c{}".format(i)]
+                 for i in range(num_clients)])
+            self.assertAlmostEqual(len(aggregator.cids), num_clients,
+                                   delta=num_clients * 0.05)
+            return len(pickle.dumps(aggregator))
+
+        self.assertLess(state_size(40000), 1.1 * state_size(20000))
+
+
+def runTests():
+    test_classes = [TestSpaceSaving, TestSketchAggregator]
+    load_tests = unittest.TestLoader()
+
+    test_list = []
+    for test in test_classes:
+        load_test_cases = load_tests.loadTestsFromTestCase(test)
+        test_list.append(load_test_cases)
+
+    test_suite = unittest.TestSuite(test_list)
+    run_test = unittest.TextTestRunner()
+    run_test.run(test_suite)
+
+
+if __name__ == "__main__":
+    runTests()
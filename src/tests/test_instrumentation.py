@@ -0,0 +1,140 @@
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import unittest
+
+#  Enable unittest to find source code
+import sys
+sys.path.insert(0, '../../src/')
+
+#  Import module to test
+import instrumentation
+from instrumentation import (StackSampler, format_prometheus, instrument,
+                             write_metrics)
+
+
+@instrument(rows=len)
+def make_rows(num_rows):
+    return [[i] * 100 for i in range(num_rows)]
+
+
+@instrument("outer stage")
+def outer():
+    make_rows(1000)
+    time.sleep(0.01)
+
+
+class TestInstrumentation(unittest.TestCase):
+    """
+    METHODS
+    -------
+        test_records : Each call records its time and rows.
+        test_nestedPeaks : Peak memory of an inner stage counts for the outer.
+        test_prometheus : Calls of a stage are combined per metric.
+        test_capped : Only the most recent records are kept.
+        test_jsonLines : Records are written one per line.
+        test_sampler : Sampled stacks include the running function.
+    """
+
+    def setUp(self):
+        instrumentation.STAGE_METRICS.clear()
+
+    def test_records(self):
+        """Ensure a call records wall and CPU time, rows and rows per second."""
+
+        result = make_rows(10)
+        record = instrumentation.STAGE_METRICS[-1]
+
+        self.assertEqual(len(result), 10)
+        self.assertEqual((record["stage"], record["rows"]), ("make_rows", 10))
+        self.assertGreaterEqual(record["wall seconds"], 0)
+        self.assertIn("cpu seconds", record)
+        self.assertNotIn("peak memory bytes", record)
+
+    def test_nestedPeaks(self):
+        """Ensure the outer stage's peak is at least the inner stage's."""
+
+        tracemalloc.start()
+        try:
+            outer()
+        finally:
+            tracemalloc.stop()
+        inner, outer_record = instrumentation.STAGE_METRICS
+
+        self.assertEqual(outer_record["stage"], "outer stage")
+        self.assertGreater(inner["peak memory bytes"], 100 * 1000 * 8)
+        self.assertGreaterEqual(outer_record["peak memory bytes"],
+                                inner["peak memory bytes"])
+        self.assertGreater(outer_record["wall seconds"], outer_record["cpu seconds"])
+
+    def test_prometheus(self):
+        """Ensure repeated stages are summed, and peaks take the largest."""
+
+        records = [{"stage": "a", "wall seconds": 1.5, "cpu seconds": 1,
+                    "rows": 10, "peak memory bytes": 5},
+                   {"stage": "a", "wall seconds": 0.5, "cpu seconds": 0.5,
+                    "rows": 20, "peak memory bytes": 3}]
+        text = format_prometheus(records)
+
+        self.assertIn('page_views_stage_calls_total{stage="a"} 2\n', text)
+        self.assertIn('page_views_stage_wall_seconds_total{stage="a"} 2.0\n', text)
+        self.assertIn('page_views_stage_rows_total{stage="a"} 30\n', text)
+        self.assertIn('page_views_stage_peak_memory_bytes{stage="a"} 5\n', text)
+        self.assertIn("# TYPE page_views_stage_rows_total counter\n", text)
+        self.assertIn("# TYPE page_views_stage_peak_memory_bytes gauge\n", text)
+
+    def test_capped(self):
+        """Ensure a long-lived process keeps a bounded number of records."""
+
+        for _ in range(instrumentation.MAX_STAGE_METRICS + 5):
+            make_rows(0)
+
+        self.assertEqual(len(instrumentation.STAGE_METRICS),
+                         instrumentation.MAX_STAGE_METRICS)
+
+    def test_jsonLines(self):
+        """Ensure each record is written as a json object on its own line."""
+
+        make_rows(3)
+        make_rows(4)
+        handle, path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        write_metrics(path)
+
+        with open(path) as data:
+            records = [json.loads(line) for line in data]
+        self.assertEqual([record["rows"] for record in records], [3, 4])
+
+    def test_sampler(self):
+        """Ensure the sampled stacks end in the function being run."""
+
+        sampler = StackSampler(interval=0.001)
+        sampler.start()
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+        sampler.stop()
+
+        self.assertTrue(any(stack.endswith("test_instrumentation.py:test_sampler")
+                            for stack in sampler.stacks))
+
+
+def runTests():
+    test_classes = [TestInstrumentation]
+    load_tests = unittest.TestLoader()
+
+    test_list = []
+    for test in test_classes:
+        load_test_cases = load_tests.loadTestsFromTestCase(test)
+        test_list.append(load_test_cases)
+
+    test_suite = unittest.TestSuite(test_list)
+    run_test = unittest.TextTestRunner()
+    run_test.run(test_suite)
+
+
+if __name__ == "__main__":
+    runTests()
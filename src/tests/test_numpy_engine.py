@@ -0,0 +1,102 @@
+import importlib.util
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+#  Enable unittest to find source code
+import sys
+sys.path.insert(0, '../../src/')
+
+#  Import module to test
+import aggregate_page_views
+from aggregate_page_views import PageViewReader
+from stream_aggregator import StreamAggregator
+from page_view_columns import PageViewColumns
+import numpy_engine
+
+
+@unittest.skipIf(importlib.util.find_spec("numpy") is None,
+                 "NumPy is not installed")
+class TestNumpyEngine(unittest.TestCase):
+    """
+    METHODS
+    -------
+        test_parityCSV : NumPy and streaming engines agree on the sample file.
+        test_parityDictEngine : NumPy and dict engines agree on the
+                                session-grouped sample file.
+        test_parityEdgeCases : Engines agree on repeated searches and
+                               sessions without clicks.
+        test_parityTimeout : Engines agree on interleaved sessions that time out.
+    """
+
+    def assertParity(self, dataset, timeout=1800):
+        aggregator = StreamAggregator(timeout=timeout)
+        expected_output = aggregator.consume(dataset).summary_table()
+        columns = PageViewColumns.from_rows(dataset)
+        self.assertEqual(numpy_engine.aggregate_columns(columns, timeout),
+                         expected_output)
+
+    def test_parityCSV(self, csv_file='../../input/raw-data/page-views.csv'):
+        """Ensure both engines produce the same summary table."""
+
+        self.assertParity(list(PageViewReader(csv_file)))
+
+    def test_parityDictEngine(self, csv_file='../../input/raw-data/page-views.csv'):
+        """Ensure the NumPy engine matches the list-based dict engine."""
+
+        output_folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_folder)
+        with mock.patch.object(aggregate_page_views, "output_folder",
+                               output_folder + "/", create=True):
+            expected_output = aggregate_page_views.run_dict_engine(csv_file)
+
+        columns = PageViewColumns.from_rows(list(PageViewReader(csv_file)))
+        self.assertEqual(numpy_engine.aggregate_columns(columns), expected_output)
+
+    def test_parityEdgeCases(self):
+        """Ensure both engines treat repeated and empty sessions alike."""
+
+        dataset = [['5', '/repository/1', '/search?q=early', '9'],
+                   ['10', '/search?q=rock', '', '1'],
+                   ['14', '/repository/1', '/search?q=rock', '1'],
+                   ['20', '/search?q=salt', '', '2'],
+                   ['30', '/search?q=Rock', '', '3'],
+                   ['41', '/repository/2', '/search?q=rock', '3'],
+                   ['35', '/repository/3', '/search?q=rock', '3'],
+                   ['50', '/search?q=rock', '', '1'],
+                   ['52', '/repository/4', '/search?q=rock', '1'],
+                   ['53', '/repository/5', '/search?q=rock', '1']]
+        self.assertParity(dataset)
+
+    def test_parityTimeout(self):
+        """Ensure both engines close sessions after the same inactivity."""
+
+        dataset = [['100', '/search?q=rock', '', 'a'],
+                   ['101', '/search?q=salt', '', 'b'],
+                   ['120', '/repository/1', '/search?q=rock', 'a'],
+                   ['150', '/repository/2', '/search?q=salt', 'b'],
+                   ['200', '/repository/3', '/search?q=rock', 'a'],
+                   ['205', '/repository/4', '/search?q=salt', 'b'],
+                   ['210', '/search?q=rock', '', 'b'],
+                   ['220', '/repository/5', '/search?q=rock', 'b'],
+                   ['400', '/repository/6', '/search?q=rock', 'b']]
+        self.assertParity(dataset, timeout=60)
+
+
+def runTests():
+    test_classes = [TestNumpyEngine]
+    load_tests = unittest.TestLoader()
+
+    test_list = []
+    for test in test_classes:
+        load_test_cases = load_tests.loadTestsFromTestCase(test)
+        test_list.append(load_test_cases)
+
+    test_suite = unittest.TestSuite(test_list)
+    run_test = unittest.TextTestRunner()
+    run_test.run(test_suite)
+
+
+if __name__ == "__main__":
+    runTests()
@@ -0,0 +1,62 @@
+import unittest
+
+#  Enable unittest to find source code
+import sys
+sys.path.insert(0, '../../src/')
+
+#  Import module to test
+from aggregate_page_views import PageViewReader
+from stream_aggregator import StreamAggregator
+from page_view_columns import PageViewColumns
+
+
+class TestPageViewColumns(unittest.TestCase):
+    """
+    METHODS
+    -------
+        test_encoding : Repeated client ids and terms share a single code.
+        test_aggregate : Aggregating columns matches streaming the rows.
+    """
+
+    def test_encoding(self):
+        """Ensure strings are dictionary-encoded and referrers reduced."""
+
+        dataset = [['1496253932', '/search?q=millyrock', '', '1738'],
+                   ['1496253946', '/repository/1207', '/search?q=MillyRock!', '1738']]
+        columns = PageViewColumns.from_rows(dataset)
+
+        self.assertEqual(columns.terms, ['millyrock'])
+        self.assertEqual(columns.cids, ['1738'])
+        self.assertEqual(list(columns.timestamps), [1496253932, 1496253946])
+        self.assertEqual(list(columns.path_terms), [0, -1])
+        self.assertEqual(list(columns.is_search), [1, 0])
+        self.assertEqual(list(columns.referrer_terms), [-1, 0])
+        self.assertEqual(list(columns.positions), [0, 1])
+        self.assertEqual(columns.nbytes, 2 * 29)
+
+    def test_aggregate(self, csv_file='../../input/raw-data/page-views.csv'):
+        """Ensure aggregating the columns reproduces the streaming summary."""
+
+        expected_output = StreamAggregator().consume(
+            PageViewReader(csv_file)).summary_table()
+        columns = PageViewColumns.from_rows(PageViewReader(csv_file))
+
+        self.assertEqual(columns.aggregate().summary_table(), expected_output)
+
+
+def runTests():
+    test_classes = [TestPageViewColumns]
+    load_tests = unittest.TestLoader()
+
+    test_list = []
+    for test in test_classes:
+        load_test_cases = load_tests.loadTestsFromTestCase(test)
+        test_list.append(load_test_cases)
+
+    test_suite = unittest.TestSuite(test_list)
+    run_test = unittest.TextTestRunner()
+    run_test.run(test_suite)
+
+
+if __name__ == "__main__":
+    runTests()
@@ -0,0 +1,139 @@
+import csv
+import gzip
+import os
+import tempfile
+import unittest
+
+#  Enable unittest to find source code
+import sys
+sys.path.insert(0, '../../src/')
+
+#  Import module to test
+from page_view_reader import PageViewReader
+from write_to_csv import write_to_csv
+
+
+class TestPageViewReader(unittest.TestCase):
+    """
+    METHODS
+    -------
+        test_typedRows : Timestamps are integers and invalid rows are counted.
+        test_blockSizes : Rows split across blocks are read whole.
+        test_quotedFallback : Quoted fields are read with the csv module.
+        test_matchesCsvReader : The real input matches csv.reader.
+        test_gzipInput : Multi-member gzip files are read whole.
+        test_stopEarly : Reading can stop before a compressed file ends.
+        test_compressedOutput : Csv output is compressed by its suffix.
+    """
+
+    def write_file(self, content):
+        handle, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(handle, "wb") as data:
+            data.write(content.encode("utf-8"))
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_typedRows(self):
+        """Ensure rows are typed and rows with missing data are rejected."""
+
+        path = self.write_file("1,/search?q=a,,x\r\n"
+                               ",/search?q=b,,y\n"
+                               "2,/repo,/search?q=a,\n"
+                               "abc,/repo,,z\n"
+                               "3,/repo,/search?q=a,x")
+        page_views = PageViewReader(path)
+        rows = list(page_views)
+
+        self.assertEqual(rows, [[1, '/search?q=a', '', 'x'],
+                                [3, '/repo', '/search?q=a', 'x']])
+        self.assertEqual((page_views.rows_read, page_views.rejected), (5, 3))
+
+    def test_blockSizes(self):
+        """Ensure tiny blocks give the same rows as a single block."""
+
+        path = self.write_file("".join("{},/search?q=é{},,c{}\n".format(i, i, i)
+                                       for i in range(50)))
+
+        self.assertEqual(list(PageViewReader(path, block_size=7)),
+                         list(PageViewReader(path)))
+
+    def test_quotedFallback(self):
+        """Ensure quoted fields holding commas and newlines are parsed."""
+
+        path = self.write_file('1,/search?q=a,,x\n'
+                               '2,"/search?q=b,c",,y\n'
+                               '3,/repo,"/search?q=b,\nc",y\n')
+        page_views = PageViewReader(path, block_size=20)
+
+        self.assertEqual(list(page_views),
+                         [[1, '/search?q=a', '', 'x'],
+                          [2, '/search?q=b,c', '', 'y'],
+                          [3, '/repo', '/search?q=b,\nc', 'y']])
+        self.assertEqual(page_views.rows_read, 3)
+
+    def test_matchesCsvReader(self,
+                              csv_file='../../input/raw-data/page-views.csv'):
+        """Ensure the fast path agrees with csv.reader on the sample input."""
+
+        with open(csv_file, mode="r", encoding="utf-8") as data:
+            expected = [[int(row[0])] + row[1:] for row in csv.reader(data)]
+
+        self.assertEqual(list(PageViewReader(csv_file, block_size=4096)), expected)
+
+    def test_gzipInput(self,
+                       csv_file='../../input/raw-data/page-views.csv'):
+        """Ensure every member of a concatenated gzip file is read."""
+
+        with open(csv_file, mode="rb") as data:
+            lines = data.readlines()
+        gzip_file = self.write_file("") + ".gz"
+        self.addCleanup(os.remove, gzip_file)
+        with open(gzip_file, mode="wb") as output_data:
+            output_data.write(gzip.compress(b"".join(lines[:1000])))
+            output_data.write(gzip.compress(b"".join(lines[1000:])))
+
+        self.assertEqual(list(PageViewReader(gzip_file, block_size=4096)),
+                         list(PageViewReader(csv_file)))
+
+    def test_stopEarly(self):
+        """Ensure the decompression thread stops when reading stops."""
+
+        gzip_file = self.write_file("") + ".gz"
+        self.addCleanup(os.remove, gzip_file)
+        with gzip.open(gzip_file, mode="wt") as output_data:
+            output_data.writelines("{},/search?q=a,,c\n".format(i)
+                                   for i in range(20000))
+
+        rows = iter(PageViewReader(gzip_file, block_size=64))
+        self.assertEqual(next(rows), [0, '/search?q=a', '', 'c'])
+        rows.close()
+
+    def test_compressedOutput(self):
+        """Ensure write_to_csv gzips a file whose name ends in .gz."""
+
+        output_folder = tempfile.mkdtemp()
+        output_file = os.path.join(output_folder, "summary.csv.gz")
+        self.addCleanup(os.rmdir, output_folder)
+        self.addCleanup(os.remove, output_file)
+        write_to_csv("summary.csv.gz", output_folder + "/", [["crop", 21]])
+
+        with gzip.open(output_file, mode="rt") as data:
+            self.assertEqual(list(csv.reader(data)), [["crop", "21"]])
+
+
+def runTests():
+    test_classes = [TestPageViewReader]
+    load_tests = unittest.TestLoader()
+
+    test_list = []
+    for test in test_classes:
+        load_test_cases = load_tests.loadTestsFromTestCase(test)
+        test_list.append(load_test_cases)
+
+    test_suite = unittest.TestSuite(test_list)
+    run_test = unittest.TextTestRunner()
+    run_test.run(test_suite)
+
+
+if __name__ == "__main__":
+    runTests()
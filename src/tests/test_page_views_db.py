@@ -0,0 +1,133 @@
+import os
+import tempfile
+import unittest
+
+#  Enable unittest to find source code
+import sys
+sys.path.insert(0, '../../src/')
+
+#  Import module to test
+import page_views_insights
+from page_views_db import (average_session_time, connect, load_page_views,
+                           query_summary, top_queries)
+from page_view_reader import PageViewReader
+from stream_aggregator import StreamAggregator
+from page_views_insights import find_top_results
+
+
+class TestPageViewsDB(unittest.TestCase):
+    """
+    METHODS
+    -------
+        test_summary : The summary table matches the stream engine.
+        test_insights : Indexed queries answer the insight questions.
+        test_queryPlans : Rankings and lookups are read through indexes.
+        test_rowQueries : Clicks reference the query of their session.
+    """
+
+    def setUp(self):
+        temp_folder = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_folder.cleanup)
+        self.db_file = os.path.join(temp_folder.name, "page-views.sqlite")
+        self.csv_file = '../../input/raw-data/page-views.csv'
+
+    def load(self, rows):
+        csv_file = self.db_file.replace(".sqlite", ".csv")
+        with open(csv_file, mode="w") as output_data:
+            output_data.writelines(",".join(row) + "\n" for row in rows)
+        load_page_views(self.db_file, csv_file, batch_size=2)
+        connection = connect(self.db_file, read_only=True)
+        self.addCleanup(connection.close)
+        return connection
+
+    def test_summary(self):
+        """Ensure every query's summary row equals the stream engine's."""
+
+        self.assertEqual(load_page_views(self.db_file, self.csv_file,
+                                         batch_size=1000), 3465)
+        connection = connect(self.db_file, read_only=True)
+        self.addCleanup(connection.close)
+        summary = StreamAggregator().consume(PageViewReader(self.csv_file)).summary_table()
+
+        for term, values in summary.items():
+            self.assertEqual(query_summary(connection, term), values)
+        self.assertIsNone(query_summary(connection, "no such query"))
+
+    def test_insights(self):
+        """Ensure the rankings and average match those of the summary table."""
+
+        load_page_views(self.db_file, self.csv_file)
+        connection = connect(self.db_file, read_only=True)
+        self.addCleanup(connection.close)
+        summary = StreamAggregator().consume(PageViewReader(self.csv_file)).summary_table()
+
+        self.assertEqual(top_queries(connection, "num_queries", 5),
+                         find_top_results(summary, 5, "num queries"))
+        self.assertEqual(top_queries(connection, "results_clicked", 5),
+                         find_top_results(summary, 5, "results clicked"))
+        self.assertAlmostEqual(
+            average_session_time(connection),
+            sum(values["total time"] for values in summary.values()) /
+            sum(values["results clicked"] for values in summary.values()))
+
+        page_views_insights.N = 5
+        self.assertEqual(page_views_insights.pull_db_insights(self.db_file)[1],
+                         find_top_results(summary, 5, "num queries"))
+
+    def test_queryPlans(self):
+        """Ensure the insight and drill-down queries do not scan tables."""
+
+        load_page_views(self.db_file, self.csv_file)
+        connection = connect(self.db_file, read_only=True)
+        self.addCleanup(connection.close)
+
+        def plan(sql):
+            return " ".join(row[-1] for row in
+                            connection.execute("EXPLAIN QUERY PLAN " + sql))
+
+        self.assertIn("USING COVERING INDEX summary_num_queries", plan(
+            "SELECT query, num_queries FROM summary "
+            "ORDER BY num_queries DESC, query LIMIT 5"))
+        self.assertIn("USING INDEX page_views_query", plan(
+            "SELECT * FROM page_views WHERE query_id = 1"))
+        self.assertIn("USING INDEX page_views_cid_time", plan(
+            "SELECT * FROM page_views WHERE cid_id = 1 ORDER BY timestamp"))
+
+    def test_rowQueries(self):
+        """Ensure clicks reference their session's query, and orphans none."""
+
+        connection = self.load([['10', '/search?q=salt', '', 'a'],
+                                ['11', '/repository/1', '/search?q=salt', 'a'],
+                                ['12', '/repository/2', '/search?q=rock', 'b'],
+                                ['13', '/search?q=Rock', '', 'b'],
+                                ['14', '/repository/3', '/search?q=Rock', 'b']])
+
+        rows = connection.execute(
+            "SELECT view_id, query, cid FROM page_views "
+            "LEFT JOIN queries USING (query_id) JOIN clients USING (cid_id) "
+            "ORDER BY view_id").fetchall()
+        self.assertEqual(rows, [(1, 'salt', 'a'), (2, 'salt', 'a'), (3, None, 'b'),
+                                (4, 'rock', 'b'), (5, 'rock', 'b')])
+        self.assertEqual(connection.execute(
+            "SELECT query, cid, start_time, clicks, total_time FROM sessions "
+            "JOIN queries USING (query_id) JOIN clients USING (cid_id) "
+            "ORDER BY session_id").fetchall(),
+            [('salt', 'a', 10, 1, 1), ('rock', 'b', 13, 1, 1)])
+
+
+def runTests():
+    test_classes = [TestPageViewsDB]
+    load_tests = unittest.TestLoader()
+
+    test_list = []
+    for test in test_classes:
+        load_test_cases = load_tests.loadTestsFromTestCase(test)
+        test_list.append(load_test_cases)
+
+    test_suite = unittest.TestSuite(test_list)
+    run_test = unittest.TextTestRunner()
+    run_test.run(test_suite)
+
+
+if __name__ == "__main__":
+    runTests()
@@ -0,0 +1,64 @@
+import unittest
+
+#  Enable unittest to find source code
+import sys
+sys.path.insert(0, '../../src/')
+
+#  Import module to test
+from page_views_insights import TopK, find_top_rankings, find_top_results
+
+
+class TestTopResults(unittest.TestCase):
+    """
+    METHODS
+    -------
+        test_topK : Only the best N values are kept, best first.
+        test_ties : Equal values are ordered by term.
+        test_rankings : Several keys are ranked in a single pass.
+    """
+
+    def test_topK(self):
+        """Ensure the heap keeps the largest values in descending order."""
+
+        top = TopK(3)
+        for term, value in [('a', 4), ('b', 9), ('c', 1), ('d', 7), ('e', 5)]:
+            top.push(term, value)
+
+        self.assertEqual(top.results(), [('b', 9), ('d', 7), ('e', 5)])
+
+    def test_ties(self):
+        """Ensure ties are broken by term, in ascending order."""
+
+        dictionary = {'zeta': {'count': 2}, 'beta': {'count': 2},
+                      'alpha': {'count': 2}, 'gamma': {'count': 3}}
+        top = find_top_results(dictionary, 3, 'count')
+
+        self.assertEqual(top, [('gamma', 3), ('alpha', 2), ('beta', 2)])
+
+    def test_rankings(self):
+        """Ensure every key is ranked from one iteration of the rows."""
+
+        rows = iter([('a', {'x': 1, 'y': 6}), ('b', {'x': 3, 'y': 2}),
+                     ('c', {'x': 2, 'y': 4})])
+        rankings = find_top_rankings(rows, 2, ['x', 'y'])
+
+        self.assertEqual(rankings['x'], [('b', 3), ('c', 2)])
+        self.assertEqual(rankings['y'], [('a', 6), ('c', 4)])
+
+
+def runTests():
+    test_classes = [TestTopResults]
+    load_tests = unittest.TestLoader()
+
+    test_list = []
+    for test in test_classes:
+        load_test_cases = load_tests.loadTestsFromTestCase(test)
+        test_list.append(load_test_cases)
+
+    test_suite = unittest.TestSuite(test_list)
+    run_test = unittest.TextTestRunner()
+    run_test.run(test_suite)
+
+
+if __name__ == "__main__":
+    runTests()
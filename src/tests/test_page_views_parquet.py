@@ -0,0 +1,121 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+
+#  Enable unittest to find source code
+import sys
+sys.path.insert(0, '../../src/')
+
+#  Import module to test
+import page_views_insights
+import page_views_parquet
+from page_views_parquet import (ParquetPageViewReader, write_page_views_parquet,
+                                write_summary_parquet)
+from page_view_reader import PageViewReader
+from stream_aggregator import StreamAggregator
+from write_to_csv import write_to_csv
+from summary_binary import FIELDS
+
+
+@unittest.skipIf(importlib.util.find_spec("pyarrow") is None,
+                 "pyarrow is not installed")
+class TestPageViewsParquet(unittest.TestCase):
+    """
+    METHODS
+    -------
+        test_summaryTypes : The summary has a dictionary-encoded query and
+                            typed columns, in row groups.
+        test_insights : Parquet and csv summaries give the same insights.
+        test_pageViews : Raw page views round trip, skipping invalid rows.
+        test_timeRange : Row groups outside a time range are skipped.
+    """
+
+    def setUp(self):
+        temp_folder = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_folder.cleanup)
+        self.output_folder = temp_folder.name + "/"
+        self.csv_file = '../../input/raw-data/page-views.csv'
+
+    def summary_table(self):
+        return StreamAggregator().consume(PageViewReader(self.csv_file)).summary_table()
+
+    def test_summaryTypes(self):
+        """Ensure the query column is dictionary-encoded and counts are integers."""
+
+        output_file = self.output_folder + "summary.parquet"
+        summary = self.summary_table()
+        write_summary_parquet(summary, output_file, row_group_size=30)
+
+        parquet_file = page_views_parquet.pq.ParquetFile(output_file)
+        table = parquet_file.read()
+        self.assertEqual(parquet_file.metadata.num_row_groups, 4)
+        self.assertTrue(page_views_parquet.pa.types.is_dictionary(
+            table.schema.field("query").type))
+        self.assertEqual(str(table.schema.field("num queries").type), "int64")
+        self.assertEqual(table.column("query").to_pylist(), sorted(summary))
+        row = table.slice(0, 1).to_pylist()[0]
+        self.assertEqual([row[field] for field in FIELDS],
+                         [summary[row["query"]][field] for field in FIELDS])
+        self.assertEqual(os.listdir(self.output_folder), ["summary.parquet"])
+
+    def test_insights(self):
+        """Ensure the column projection gives the same answers as the csv."""
+
+        summary = self.summary_table()
+        write_summary_parquet(summary, self.output_folder + "summary.parquet",
+                              row_group_size=30)
+        write_to_csv("summary.csv", self.output_folder,
+                     [[term] + [summary[term][field] for field in
+                                ["num queries", "total time", "num users",
+                                 "results clicked"]] for term in sorted(summary)])
+        page_views_insights.N = 5
+
+        self.assertEqual(
+            page_views_insights.pull_parquet_insights(self.output_folder + "summary.parquet"),
+            page_views_insights.pull_csv_insights(self.output_folder + "summary.csv"))
+
+    def test_pageViews(self):
+        """Ensure rows read back equal the rows written, without invalid ones."""
+
+        rows = [[10, '/search?q=salt', '', 'a'],
+                [11, '/repository/1', '/search?q=salt', 'a'],
+                [12, '', '', 'b'],
+                [13, '/search?q=rock', '', '']]
+        output_file = self.output_folder + "page-views.parquet"
+        self.assertEqual(write_page_views_parquet(rows, output_file), 4)
+
+        page_views = ParquetPageViewReader(output_file)
+        self.assertEqual(list(page_views), rows[:2])
+        self.assertEqual((page_views.rows_read, page_views.accepted), (4, 2))
+
+    def test_timeRange(self):
+        """Ensure only row groups overlapping the range are read."""
+
+        rows = [[timestamp, '/search?q=salt', '', 'a'] for timestamp in range(100)]
+        output_file = self.output_folder + "page-views.parquet"
+        write_page_views_parquet(rows, output_file, row_group_size=10)
+
+        page_views = ParquetPageViewReader(output_file, since=25, until=42)
+        parquet_file = page_views_parquet.pq.ParquetFile(output_file)
+        self.assertEqual(page_views.row_groups(parquet_file), [2, 3, 4])
+        self.assertEqual([row[0] for row in page_views], list(range(25, 42)))
+        self.assertEqual(page_views.rows_read, 17)
+
+
+def runTests():
+    test_classes = [TestPageViewsParquet]
+    load_tests = unittest.TestLoader()
+
+    test_list = []
+    for test in test_classes:
+        load_test_cases = load_tests.loadTestsFromTestCase(test)
+        test_list.append(load_test_cases)
+
+    test_suite = unittest.TestSuite(test_list)
+    run_test = unittest.TextTestRunner()
+    run_test.run(test_suite)
+
+
+if __name__ == "__main__":
+    runTests()
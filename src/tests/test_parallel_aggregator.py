@@ -0,0 +1,63 @@
+import unittest
+
+#  Enable unittest to find source code
+import sys
+sys.path.insert(0, '../../src/')
+
+#  Import module to test
+from aggregate_page_views import PageViewReader
+from stream_aggregator import StreamAggregator
+from parallel_aggregator import find_line_ranges, parallel_aggregate
+
+
+class TestParallelAggregator(unittest.TestCase):
+    """
+    METHODS
+    -------
+        test_lineRanges : Byte ranges cover the file and start on new lines.
+        test_matchesSinglePass : Sharded aggregation matches a single pass.
+    """
+
+    csv_file = '../../input/raw-data/page-views.csv'
+
+    def test_lineRanges(self):
+        """Ensure ranges are contiguous and aligned to line boundaries."""
+
+        ranges = find_line_ranges(self.csv_file, 4)
+        with open(self.csv_file, mode='rb') as data:
+            content = data.read()
+
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], len(content))
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(content[start - 1:start], b'\n')
+
+    def test_matchesSinglePass(self):
+        """Ensure merged partial results equal the single-pass summary."""
+
+        page_views = PageViewReader(self.csv_file)
+        expected_output = StreamAggregator().consume(page_views).summary_table()
+
+        aggregator, rows_read, accepted, _ = parallel_aggregate(self.csv_file, 3)
+        self.assertEqual(aggregator.summary_table(), expected_output)
+        self.assertEqual((rows_read, accepted),
+                         (page_views.rows_read, page_views.accepted))
+
+
+def runTests():
+    test_classes = [TestParallelAggregator]
+    load_tests = unittest.TestLoader()
+
+    test_list = []
+    for test in test_classes:
+        load_test_cases = load_tests.loadTestsFromTestCase(test)
+        test_list.append(load_test_cases)
+
+    test_suite = unittest.TestSuite(test_list)
+    run_test = unittest.TextTestRunner()
+    run_test.run(test_suite)
+
+
+if __name__ == "__main__":
+    runTests()
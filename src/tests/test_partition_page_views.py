@@ -0,0 +1,161 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+#  Enable unittest to find source code
+import sys
+sys.path.insert(0, '../../src/')
+
+#  Import module to test
+from partition_page_views import (PartitionIndex, TimeRangeReader,
+                                  parse_time, partition_file)
+
+
+#  Two hours of page views, out of order across the hour boundary
+PAGE_VIEWS = ("3600,/search?q=b,,y\n"
+              "10,/search?q=a,,x\n"
+              "20,/repo,/search?q=a,x\n"
+              "3700,/repo,/search?q=b,y\n"
+              "30,/search?q=b,,z\n")
+
+
+class TestPartitionPageViews(unittest.TestCase):
+    """
+    METHODS
+    -------
+        test_parseTime : Timestamps and UTC dates are parsed.
+        test_partitionFile : Rows are written to hourly partitions.
+        test_indexRoundTrip : The index is saved and loaded.
+        test_selectQuery : Partitions are selected by time and query.
+        test_timeRange : Only rows inside the range are read.
+        test_unpartitioned : Input files are read without partitions.
+        test_otherSource : Files missing from the index are read directly.
+        test_interruptedRun : A rerun after a crash does not duplicate rows.
+    """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.csv_file = os.path.join(self.folder, "page-views.csv")
+        with open(self.csv_file, mode="w") as data:
+            data.write(PAGE_VIEWS)
+        self.partition_folder = os.path.join(self.folder, "partitions")
+
+    def partition(self):
+        index = PartitionIndex.load(self.partition_folder, "hour")
+        partition_file(self.csv_file, index)
+        index.save()
+        return index
+
+    def test_parseTime(self):
+        """Ensure timestamps and dates give the same UNIX time."""
+
+        self.assertEqual(parse_time("1496250000"), 1496250000)
+        self.assertEqual(parse_time("2017-05-31T17:00"), 1496250000)
+        self.assertEqual(parse_time("1970-01-02"), 86400)
+
+    def test_partitionFile(self):
+        """Ensure each row lands in the partition of its hour."""
+
+        index = self.partition()
+
+        self.assertEqual(sorted(index.partitions),
+                         ["page-views-1970010100.csv", "page-views-1970010101.csv"])
+        first = index.partitions["page-views-1970010100.csv"]
+        self.assertEqual((first["first"], first["last"], first["rows"]), (10, 30, 3))
+        with open(os.path.join(self.partition_folder,
+                               "page-views-1970010101.csv")) as data:
+            self.assertEqual(data.read(), "3600,/search?q=b,,y\n"
+                                          "3700,/repo,/search?q=b,y\n")
+
+    def test_indexRoundTrip(self):
+        """Ensure a saved index loads back, and rejects other granularities."""
+
+        index = self.partition()
+        loaded = PartitionIndex.load(self.partition_folder)
+
+        self.assertEqual(loaded.partitions, index.partitions)
+        self.assertEqual(loaded.sources, ["page-views.csv"])
+        with self.assertRaises(ValueError):
+            PartitionIndex.load(self.partition_folder, "day")
+
+    def test_selectQuery(self):
+        """Ensure partitions outside the range or without the query are skipped."""
+
+        index = self.partition()
+
+        self.assertEqual(len(index.select()), 2)
+        self.assertEqual(len(index.select(since=3600)), 1)
+        self.assertEqual(len(index.select(until=3600)), 1)
+        self.assertEqual(len(index.select(query="a")), 1)
+        self.assertEqual(index.select(query="missing"), [])
+
+    def test_timeRange(self):
+        """Ensure rows are filtered to since <= timestamp < until."""
+
+        self.partition()
+        page_views = TimeRangeReader(since=20, until=3650,
+                                     partition_folder=self.partition_folder)
+
+        self.assertEqual([row[0] for row in page_views], [20, 30, 3600])
+        self.assertEqual((page_views.rows_read, page_views.skipped), (3, 2))
+
+    def test_unpartitioned(self):
+        """Ensure the input file is read when there is no partition index."""
+
+        page_views = TimeRangeReader(self.csv_file, since=3600,
+                                     partition_folder=self.partition_folder)
+
+        self.assertEqual([row[0] for row in page_views], [3600, 3700])
+        with self.assertRaises(FileNotFoundError):
+            list(TimeRangeReader(since=0, partition_folder=self.partition_folder))
+
+    def test_otherSource(self):
+        """Ensure an input file that was not partitioned is not left out."""
+
+        self.partition()
+        other_file = os.path.join(self.folder, "other-page-views.csv")
+        with open(other_file, mode="w") as data:
+            data.write("5000,/search?q=c,,z\n")
+        page_views = TimeRangeReader(other_file, since=3600,
+                                     partition_folder=self.partition_folder)
+
+        self.assertEqual([row[0] for row in page_views], [5000])
+
+    def test_interruptedRun(self):
+        """Ensure rows appended after the index was last saved are dropped."""
+
+        self.partition()
+        index = PartitionIndex.load(self.partition_folder)
+        index.sources.clear()
+        partition_file(self.csv_file, index)
+
+        #  The run stopped before saving, and the file is partitioned again
+        index = PartitionIndex.load(self.partition_folder)
+        index.sources.clear()
+        partition_file(self.csv_file, index)
+        index.save()
+
+        page_views = TimeRangeReader(partition_folder=self.partition_folder)
+        self.assertEqual([row[0] for row in page_views],
+                         [10, 20, 30, 10, 20, 30, 3600, 3700, 3600, 3700])
+        self.assertEqual(index.partitions["page-views-1970010100.csv"]["rows"], 6)
+
+
+def runTests():
+    test_classes = [TestPartitionPageViews]
+    load_tests = unittest.TestLoader()
+
+    test_list = []
+    for test in test_classes:
+        load_test_cases = load_tests.loadTestsFromTestCase(test)
+        test_list.append(load_test_cases)
+
+    test_suite = unittest.TestSuite(test_list)
+    run_test = unittest.TextTestRunner()
+    run_test.run(test_suite)
+
+
+if __name__ == "__main__":
+    runTests()
@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+#  Enable unittest to find source code
+import sys
+sys.path.insert(0, '../../src/')
+
+#  Import module to test
+from query_index import QueryIndex, build_query_index
+from page_view_reader import PageViewReader
+from stream_aggregator import StreamAggregator
+
+
+#  Client y's second search closes its first session, and the click by z
+#  arrives after the timeout, so it is not credited
+PAGE_VIEWS = ("10,/search?q=a,,x\n"
+              "12,/search?q=b,,y\n"
+              "15,/repo,/search?q=a,x\n"
+              "20,/repo,/search?q=b,y\n"
+              "25,/search?q=a,,y\n"
+              "26,/repo,/search?q=a,y\n"
+              "30,/search?q=A!,/search?q=a,x\n"
+              "40,/search?q=b,,z\n"
+              "5000,/repo,/search?q=b,z\n")
+
+
+class TestQueryIndex(unittest.TestCase):
+    """
+    METHODS
+    -------
+        test_matchesSummary : Lookups match the summary table.
+        test_sessions : Sessions are rebuilt from the indexed rows.
+        test_missingTerm : Unknown terms have no sessions.
+        test_staleIndex : The index is rebuilt when the input changes.
+    """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        self.csv_file = os.path.join(self.folder, "page-views.csv")
+        with open(self.csv_file, mode="w") as data:
+            data.write(PAGE_VIEWS)
+        self.index_file = os.path.join(self.folder, "page-views.qidx")
+
+    def test_matchesSummary(self):
+        """Ensure each term's lookup matches its row of the summary table."""
+
+        summary = StreamAggregator(timeout=60).consume(
+            PageViewReader(self.csv_file)).summary_table()
+        build_query_index(self.csv_file, self.index_file, timeout=60)
+
+        with QueryIndex(self.index_file, self.csv_file) as index:
+            self.assertEqual(len(index), 2)
+            for term, row in summary.items():
+                self.assertEqual(index.lookup(term)["summary"], row)
+
+    def test_sessions(self):
+        """Ensure clicks are credited to the sessions they belong to."""
+
+        with QueryIndex.open(self.csv_file, self.index_file, timeout=60) as index:
+            self.assertEqual(index.lookup("a")["sessions"],
+                             [["x", 10, 2, 20], ["y", 25, 1, 1]])
+            self.assertEqual(index.lookup("b")["sessions"],
+                             [["y", 12, 1, 8], ["z", 40, 0, 0]])
+
+    def test_missingTerm(self):
+        """Ensure a term that was never searched has no summary."""
+
+        with QueryIndex.open(self.csv_file, self.index_file) as index:
+            self.assertEqual(index.lookup("c"), {"summary": None, "sessions": []})
+
+    def test_staleIndex(self):
+        """Ensure a changed input file or timeout is indexed again."""
+
+        QueryIndex.open(self.csv_file, self.index_file).close()
+        with open(self.csv_file, mode="a") as data:
+            data.write("6000,/search?q=c,,w\n")
+        os.utime(self.csv_file, ns=(time.time_ns(), time.time_ns() + 10**9))
+
+        with QueryIndex.open(self.csv_file, self.index_file) as index:
+            self.assertEqual(len(index.lookup("c")["sessions"]), 1)
+        with QueryIndex(self.index_file, self.csv_file) as index:
+            self.assertFalse(index.is_current(timeout=60))
+
+
+def runTests():
+    test_classes = [TestQueryIndex]
+    load_tests = unittest.TestLoader()
+
+    test_list = []
+    for test in test_classes:
+        load_test_cases = load_tests.loadTestsFromTestCase(test)
+        test_list.append(load_test_cases)
+
+    test_suite = unittest.TestSuite(test_list)
+    run_test = unittest.TextTestRunner()
+    run_test.run(test_suite)
+
+
+if __name__ == "__main__":
+    runTests()
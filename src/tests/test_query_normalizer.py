@@ -0,0 +1,60 @@
+import unittest
+
+#  Enable unittest to find source code
+import sys
+sys.path.insert(0, '../../src/')
+
+#  Import module to test
+from query_normalizer import QueryNormalizer
+
+
+class TestQueryNormalizer(unittest.TestCase):
+    """
+    METHODS
+    -------
+        test_queryString : Pull the search term out of a full query string.
+        test_decoding : Percent-encoded characters and "+" are decoded.
+        test_cacheStats : Repeated paths are served from the cache.
+    """
+
+    def test_queryString(self):
+        """Ensure only the "q" parameter is used as the search term."""
+
+        normalize = QueryNormalizer()
+        self.assertEqual(normalize('/search?q=GeoPhysics!&page=2'), 'geophysics')
+        self.assertEqual(normalize('/search?type=code&q=geophysics'), 'geophysics')
+
+    def test_decoding(self):
+        """Ensure percent-encoding and "+" decode to the same term."""
+
+        normalize = QueryNormalizer()
+        self.assertEqual(normalize('/search?q=rock%20salt'), 'rock salt')
+        self.assertEqual(normalize('/search?q=Rock+Salt%21'), 'rock salt')
+
+    def test_cacheStats(self):
+        """Ensure cache hits and misses are counted."""
+
+        normalize = QueryNormalizer(maxsize=2)
+        for path in ['/search?q=a', '/search?q=a', '/search?q=b', '/search?q=a']:
+            normalize(path)
+        info = normalize.cache_info()
+        self.assertEqual((info.hits, info.misses), (2, 2))
+        self.assertEqual(normalize.hit_rate, 0.5)
+
+
+def runTests():
+    test_classes = [TestQueryNormalizer]
+    load_tests = unittest.TestLoader()
+
+    test_list = []
+    for test in test_classes:
+        load_test_cases = load_tests.loadTestsFromTestCase(test)
+        test_list.append(load_test_cases)
+
+    test_suite = unittest.TestSuite(test_list)
+    run_test = unittest.TextTestRunner()
+    run_test.run(test_suite)
+
+
+if __name__ == "__main__":
+    runTests()
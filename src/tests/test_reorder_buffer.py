@@ -0,0 +1,56 @@
+import unittest
+
+#  Enable unittest to find source code
+import sys
+sys.path.insert(0, '../../src/')
+
+#  Import module to test
+from reorder_buffer import ReorderBuffer
+
+
+class TestReorderBuffer(unittest.TestCase):
+    """
+    METHODS
+    -------
+        test_reorder : Slightly late rows are emitted in timestamp order.
+        test_lateRows : Rows behind the watermark are diverted and counted.
+    """
+
+    def test_reorder(self):
+        """Ensure rows within the allowed lateness come out sorted."""
+
+        rows = [['10', 'a'], ['12', 'b'], ['11', 'c'], ['15', 'd'], ['13', 'e']]
+        reorder_buffer = ReorderBuffer(max_lateness=3)
+        output = [row[1] for row in reorder_buffer.reorder(rows)]
+
+        self.assertEqual(output, ['a', 'c', 'b', 'e', 'd'])
+        self.assertEqual(reorder_buffer.late, 0)
+        self.assertLessEqual(reorder_buffer.max_buffered, 4)
+
+    def test_lateRows(self):
+        """Ensure rows arriving behind the watermark are not emitted."""
+
+        rows = [['10', 'a'], ['20', 'b'], ['12', 'c'], ['19', 'd']]
+        reorder_buffer = ReorderBuffer(max_lateness=5)
+        output = [row[1] for row in reorder_buffer.reorder(rows)]
+
+        self.assertEqual(output, ['a', 'd', 'b'])
+        self.assertEqual(reorder_buffer.late_rows, [['12', 'c']])
+
+
+def runTests():
+    test_classes = [TestReorderBuffer]
+    load_tests = unittest.TestLoader()
+
+    test_list = []
+    for test in test_classes:
+        load_test_cases = load_tests.loadTestsFromTestCase(test)
+        test_list.append(load_test_cases)
+
+    test_suite = unittest.TestSuite(test_list)
+    run_test = unittest.TextTestRunner()
+    run_test.run(test_suite)
+
+
+if __name__ == "__main__":
+    runTests()
@@ -1,11 +1,14 @@
+import os
+import tempfile
 import unittest
+from unittest import mock
 
 #  Enable unittest to find source code
 import sys
 sys.path.insert(0, '../../src/')
 
 #  Import module to test
-from retrieve_csv import retrive_csv_file
+from retrieve_csv import retrive_csv_file, MappedFile, TimestampIndex
 
 
 class TestRetrieveFunction(unittest.TestCase):
@@ -48,8 +51,84 @@ class TestRetrieveFunction(unittest.TestCase):
         self.assertEqual(check_assert.exception.code, 1)
 
 
+class TestMappedFile(unittest.TestCase):
+    """
+    METHODS
+    -------
+        test_blocks : Blocks and ranges are line-aligned and cover the file.
+        test_timestampIndex : Only blocks overlapping a time range are read.
+        test_savedIndex : The index is saved and rebuilt once the file changes.
+        test_emptyFile : An empty file maps to no blocks.
+    """
+
+    def write_file(self, content):
+        handle, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(handle, "wb") as data:
+            data.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_blocks(self):
+        """Ensure every block and range ends on a line boundary."""
+
+        content = b"".join(b"%d,/search?q=x,,c\n" % i for i in range(100))
+        with MappedFile(self.write_file(content)) as mapped:
+            blocks = [(offset, view.tobytes()) for offset, view
+                      in mapped.blocks(block_size=50)]
+            ranges = mapped.line_ranges(4)
+            lines = list(mapped.lines(*ranges[1]))
+
+        self.assertEqual(b"".join(block for _, block in blocks), content)
+        self.assertTrue(all(block.endswith(b"\n") for _, block in blocks))
+        self.assertEqual(len(ranges), 4)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], len(content))
+        self.assertTrue(all(content[end - 1:end] == b"\n" for _, end in ranges))
+        self.assertEqual("".join(lines).encode(), content[slice(*ranges[1])])
+
+    def test_timestampIndex(self):
+        """Ensure a time range is read from the blocks that may hold it."""
+
+        content = b"".join(b"%d,/search?q=x,,c\n" % (1000 + i) for i in range(100))
+        with MappedFile(self.write_file(content)) as mapped:
+            index = TimestampIndex.build(mapped, stride=200)
+            ranges = index.ranges(since=1040, until=1050)
+            selected = b"".join(mapped.buffer[start:end] for start, end in ranges)
+
+        timestamps = [int(line.split(b",")[0]) for line in selected.splitlines()]
+        self.assertEqual(len(ranges), 1)
+        self.assertTrue(set(range(1040, 1050)) <= set(timestamps))
+        self.assertLess(len(timestamps), 30)
+        self.assertEqual(index.ranges(), [(0, len(content))])
+
+    def test_savedIndex(self):
+        """Ensure a saved index is reused until the file's size changes."""
+
+        content = b"".join(b"%d,/search?q=x,,c\n" % (1000 + i) for i in range(100))
+        path = self.write_file(content)
+        self.addCleanup(os.remove, path + ".tsidx")
+        built = TimestampIndex.open(path, stride=200)
+        self.assertTrue(os.path.isfile(path + ".tsidx"))
+
+        with mock.patch.object(TimestampIndex, "build", side_effect=AssertionError):
+            self.assertEqual(TimestampIndex.open(path, stride=200).entries,
+                             built.entries)
+
+        with open(path, mode="ab") as data:
+            data.write(b"5000,/search?q=y,,d\n")
+        rebuilt = TimestampIndex.open(path, stride=200)
+        self.assertEqual(rebuilt.entries[-1][3], 5000)
+
+    def test_emptyFile(self):
+        """Ensure an empty file can be opened without mapping it."""
+
+        with MappedFile(self.write_file(b"")) as mapped:
+            self.assertEqual(list(mapped.blocks()), [])
+            self.assertEqual(mapped.line_ranges(4), [])
+
+
 def runTests():
-    test_classes = [TestRetrieveFunction]
+    test_classes = [TestRetrieveFunction, TestMappedFile]
     load_tests = unittest.TestLoader()
 
     test_list = []
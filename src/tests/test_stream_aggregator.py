@@ -0,0 +1,123 @@
+import unittest
+
+#  Enable unittest to find source code
+import sys
+sys.path.insert(0, '../../src/')
+
+#  Import module to test
+from collections import Counter
+from aggregate_page_views import (PageViewReader, validate_data, clean_query,
+                                  find_unique_attributes, create_dictionary,
+                                  aggregated_dictionary)
+from stream_aggregator import SessionAggregator, StreamAggregator, aggregate_rows
+
+
+class TestStreamAggregator(unittest.TestCase):
+    """
+    METHODS
+    -------
+        test_singleSession : Aggregate one search session.
+        test_matchesDictPipeline : Streaming totals match the list-based pipeline.
+        test_interleavedSessions : Clicks are credited to their own client's search.
+        test_repeatedSearch : A repeated search by a client adds a new session.
+        test_sessionTimeout : Clicks after the inactivity timeout are not credited,
+                              and idle sessions are evicted.
+        test_abstractHooks : Session builders must define the hooks.
+    """
+
+    def test_singleSession(self):
+        """Validate totals and averages for a single session."""
+
+        dataset = [['1496253932', '/search?q=millyrock', '', '1738'],
+                   ['1496253946', '/repository/1207', '/search?q=millyrock', '1738'],
+                   ['1496253950', '/repository/1208', '/search?q=millyrock', '1738']]
+
+        summary_table = aggregate_rows(dataset, clean_query).summary_table()
+        expected_output = {'millyrock': {"num queries": 1,
+                                         "total time": 18,
+                                         "num users": 1,
+                                         "results clicked": 2,
+                                         "av clicks per user": 2.0,
+                                         "av time per click": 9.0}}
+        self.assertEqual(summary_table, expected_output)
+
+    def test_matchesDictPipeline(self,
+                                 csv_file='../../input/raw-data/page-views.csv'):
+        """Ensure streaming aggregation reproduces the list-based summary."""
+
+        dataset = validate_data(csv_file)
+        terms, unique_terms = find_unique_attributes(dataset, 1)
+        query_table = create_dictionary(dataset, unique_terms)
+        expected_output = aggregated_dictionary(query_table, Counter(terms),
+                                                unique_terms)
+
+        aggregator = StreamAggregator(clean_query)
+        aggregator.consume(PageViewReader(csv_file))
+
+        self.assertEqual(aggregator.summary_table(), expected_output)
+
+    def test_interleavedSessions(self):
+        """Ensure interleaved sessions keep their own clicks."""
+
+        dataset = [['100', '/search?q=rock', '', 'a'],
+                   ['101', '/search?q=salt', '', 'b'],
+                   ['110', '/repository/1', '/search?q=rock', 'a'],
+                   ['115', '/repository/2', '/search?q=salt', 'b'],
+                   ['130', '/repository/3', '/search?q=rock', 'a']]
+
+        summary_table = aggregate_rows(dataset).summary_table()
+        self.assertEqual(summary_table['rock']['results clicked'], 2)
+        self.assertEqual(summary_table['rock']['total time'], 30)
+        self.assertEqual(summary_table['salt']['results clicked'], 1)
+        self.assertEqual(summary_table['salt']['total time'], 14)
+
+    def test_repeatedSearch(self):
+        """Ensure a second search of the same query is not overwritten."""
+
+        dataset = [['100', '/search?q=rock', '', 'a'],
+                   ['110', '/repository/1', '/search?q=rock', 'a'],
+                   ['200', '/search?q=rock', '', 'a'],
+                   ['205', '/repository/2', '/search?q=rock', 'a']]
+
+        summary = aggregate_rows(dataset).summary_table()['rock']
+        self.assertEqual(summary['num queries'], 2)
+        self.assertEqual(summary['num users'], 1)
+        self.assertEqual(summary['results clicked'], 2)
+        self.assertEqual(summary['total time'], 15)
+
+    def test_sessionTimeout(self):
+        """Ensure late clicks are not credited and idle sessions are evicted."""
+
+        aggregator = StreamAggregator(timeout=60)
+        aggregator.add('100', '/search?q=rock', '', 'a')
+        aggregator.add('150', '/repository/1', '/search?q=rock', 'a')
+        aggregator.add('300', '/search?q=salt', '', 'b')
+        self.assertEqual(aggregator.open_sessions, 1)
+
+        aggregator.add('301', '/repository/2', '/search?q=rock', 'a')
+        self.assertEqual(aggregator.orphan_clicks, 1)
+        self.assertEqual(aggregator.summary_table()['rock']['results clicked'], 1)
+
+    def test_abstractHooks(self):
+        """Ensure a session builder without counting hooks cannot be created."""
+
+        with self.assertRaises(TypeError):
+            SessionAggregator()
+
+
+def runTests():
+    test_classes = [TestStreamAggregator]
+    load_tests = unittest.TestLoader()
+
+    test_list = []
+    for test in test_classes:
+        load_test_cases = load_tests.loadTestsFromTestCase(test)
+        test_list.append(load_test_cases)
+
+    test_suite = unittest.TestSuite(test_list)
+    run_test = unittest.TextTestRunner()
+    run_test.run(test_suite)
+
+
+if __name__ == "__main__":
+    runTests()
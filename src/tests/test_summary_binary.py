@@ -0,0 +1,73 @@
+import unittest
+
+#  Enable unittest to find source code
+import os
+import sys
+import tempfile
+sys.path.insert(0, '../../src/')
+
+#  Import module to test
+from summary_binary import SummaryFile, write_summary_binary
+
+
+class TestSummaryBinary(unittest.TestCase):
+    """
+    METHODS
+    -------
+        test_roundTrip : A written summary reads back unchanged.
+        test_top : Top results are in descending order with ties in term order.
+    """
+
+    summary_table = {
+        'rock': {"num queries": 3, "total time": 40, "num users": 2,
+                 "results clicked": 5, "av clicks per user": 1.5,
+                 "av time per click": 8.0},
+        'géode': {"num queries": 7, "total time": 12, "num users": 7,
+                  "results clicked": 2, "av clicks per user": 0.25,
+                  "av time per click": 6.0},
+        'salt': {"num queries": 3, "total time": 9, "num users": 1,
+                 "results clicked": 1, "av clicks per user": 1.0,
+                 "av time per click": 9.0}}
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.filepath = os.path.join(self.folder.name, 'summary.bin')
+        write_summary_binary(self.summary_table, self.filepath)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_roundTrip(self):
+        """Ensure every field of every query reads back unchanged."""
+
+        with SummaryFile(self.filepath) as summary:
+            self.assertEqual(len(summary), 3)
+            self.assertEqual(summary.to_dict(), self.summary_table)
+            self.assertEqual(summary.column("num queries"), [7, 3, 3])
+
+    def test_top(self):
+        """Ensure top results match a full descending sort."""
+
+        with SummaryFile(self.filepath) as summary:
+            self.assertEqual(summary.top(2, "num queries"),
+                             [('géode', 7), ('rock', 3)])
+            self.assertEqual(summary.top(5, "results clicked"),
+                             [('rock', 5), ('géode', 2), ('salt', 1)])
+
+
+def runTests():
+    test_classes = [TestSummaryBinary]
+    load_tests = unittest.TestLoader()
+
+    test_list = []
+    for test in test_classes:
+        load_test_cases = load_tests.loadTestsFromTestCase(test)
+        test_list.append(load_test_cases)
+
+    test_suite = unittest.TestSuite(test_list)
+    run_test = unittest.TextTestRunner()
+    run_test.run(test_suite)
+
+
+if __name__ == "__main__":
+    runTests()
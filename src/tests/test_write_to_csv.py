@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+
+#  Enable unittest to find source code
+import sys
+sys.path.insert(0, '../../src/')
+
+#  Import module to test
+from write_to_csv import write_to_csv
+
+
+class WriteFailed(Exception):
+    pass
+
+
+class TestWriteToCsv(unittest.TestCase):
+    """
+    METHODS
+    -------
+        test_streamedRows : Rows from a generator are written in order.
+        test_sortedMerge : Spilled sorted runs give the same file as a sort.
+        test_failedWrite : A failed write keeps the old file and no temp file.
+    """
+
+    def setUp(self):
+        temp_folder = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_folder.cleanup)
+        self.output_folder = temp_folder.name + "/"
+
+    def read(self, output_filename):
+        with open(self.output_folder + output_filename) as data:
+            return data.read()
+
+    def test_streamedRows(self):
+        """Ensure a generator is written out without a temp file left over."""
+
+        write_to_csv("rows.csv", self.output_folder,
+                     ([term, count] for term, count in [("salt", 2), ("a,b", 1)]))
+
+        self.assertEqual(self.read("rows.csv"), 'salt,2\n"a,b",1\n')
+        self.assertEqual(os.listdir(self.output_folder), ["rows.csv"])
+
+    def test_sortedMerge(self):
+        """Ensure rows sorted through spilled runs match rows sorted in memory."""
+
+        rows = [["query{}".format((i * 7919) % 1000), i] for i in range(1000)]
+        write_to_csv("merged.csv", self.output_folder, iter(rows),
+                     sort_key=lambda row: row[0], memory_budget=1000)
+        write_to_csv("sorted.csv", self.output_folder,
+                     sorted(rows, key=lambda row: row[0]))
+
+        self.assertEqual(self.read("merged.csv"), self.read("sorted.csv"))
+        self.assertEqual(sorted(os.listdir(self.output_folder)),
+                         ["merged.csv", "sorted.csv"])
+
+    def test_failedWrite(self):
+        """Ensure readers still see the complete old file after a failure."""
+
+        def rows():
+            yield ["salt", 3]
+            raise WriteFailed()
+
+        write_to_csv("rows.csv", self.output_folder, [["rock", 1]])
+        with self.assertRaises(WriteFailed):
+            write_to_csv("rows.csv", self.output_folder, rows())
+
+        self.assertEqual(self.read("rows.csv"), "rock,1\n")
+        self.assertEqual(os.listdir(self.output_folder), ["rows.csv"])
+
+
+def runTests():
+    test_classes = [TestWriteToCsv]
+    load_tests = unittest.TestLoader()
+
+    test_list = []
+    for test in test_classes:
+        load_test_cases = load_tests.loadTestsFromTestCase(test)
+        test_list.append(load_test_cases)
+
+    test_suite = unittest.TestSuite(test_list)
+    run_test = unittest.TextTestRunner()
+    run_test.run(test_suite)
+
+
+if __name__ == "__main__":
+    runTests()
@@ -1,17 +1,38 @@
+import io
 import os
 import csv
 
+from atomic_file import atomic_output
+from retrieve_csv import compression_of, open_compressed
+from external_sort import external_sort
+
+#  Bytes buffered before each write to the output file
+BUFFER_SIZE = 2**20
+
 
 def write_to_csv(output_filename=None,
                  output_folder=None,
-                 output=None):
+                 output=None,
+                 sort_key=None,
+                 memory_budget=256 * 2**20):
     """
     Create and write to csv file. Store file in "./output".
+
+    Rows are streamed from any iterable through a large buffer into a
+    temporary file next to the destination, which is synced to disk and
+    then renamed over it, so readers only ever see a complete file.
     ARGUMENTS
     ---------
         filename : str
             e.g., 'report.csv'
-        data : object
+        data : iterable
+            Rows to write, e.g., a list or a generator.
+        sort_key : callable
+            If given, rows are written in this order, sorted with an
+            external merge sort that spills to disk beyond memory_budget
+            bytes. Rows spilled to disk are read back as strings.
+        memory_budget : int
+            Approximate bytes of rows held in memory while sorting.
     RETURNS
     -------
         None
@@ -26,19 +47,14 @@ def write_to_csv(output_filename=None,
     if os.path.isfile(output_file):
         print("This file already exists: {}".format(output_file))
         print("Overwriting.")
-        with open(output_file, 'w') as output_data:
-            writer = csv.writer(
-                output_data,
-            delimiter=',',
-            quotechar='"',
-            quoting=csv.QUOTE_MINIMAL
-            )
-            writer.writerows(output)
-            print("Check output folder for results.")
 
-    else:
-        #  write to output file
-        with open(output_file, 'w') as output_data:
+    if sort_key is not None:
+        output = external_sort(output, sort_key, memory_budget,
+                               temp_folder=os.path.dirname(output_file) or None)
+
+    #  write to output file, compressed if its name ends in .gz, .zst or .lz4
+    with atomic_output(output_file) as temp_file:
+        with open_output(temp_file) as output_data:
             writer = csv.writer(
                 output_data,
             delimiter=',',
@@ -46,4 +62,16 @@ def write_to_csv(output_filename=None,
             quoting=csv.QUOTE_MINIMAL
             )
             writer.writerows(output)
-            print("Check output folder for results.")
\ No newline at end of file
+    print("Check output folder for results.")
+
+
+def open_output(output_file):
+    """
+    Open an output file for text, compressing it by its suffix. Plain files
+    get a large buffer; compressors buffer their own output.
+    """
+
+    if compression_of(output_file) is None:
+        return open(output_file, 'w', buffering=BUFFER_SIZE)
+    return io.TextIOWrapper(open_compressed(output_file, mode="wb"),
+                            encoding="utf-8")